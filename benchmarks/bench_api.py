@@ -0,0 +1,90 @@
+"""
+API HTTP : écriture ligne par ligne contre lots, lecture complète contre 304, clients en parallèle.
+
+Lancement : python -m benchmarks.bench_api
+Démarre services.http_api sur un port libre avec une base temporaire d'un an
+(benchmarks.synthetic) et l'interroge avec urllib depuis CLIENTS threads.
+"""
+import json
+import logging
+import statistics
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+from db import database
+from services.http_api import ApiServer
+from utils import security
+from benchmarks.synthetic import PROFILES, build_database
+
+ROWS = 1000
+CLIENTS = 8
+REQUESTS = 400  # requêtes de lecture réparties entre les clients
+
+
+def call(base, method, path, body=None, headers=None):
+    request = urllib.request.Request(base + path, method=method, headers={"X-Profil": "1", **(headers or {})},
+                                     data=None if body is None else json.dumps(body).encode())
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def timed(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {count / elapsed:>10,.0f} /s   ({elapsed * 1000:.1f} ms)")
+
+
+def parallel(base, path, headers=None):
+    """Latences (ms) de REQUESTS lectures faites par CLIENTS threads"""
+    def one(_):
+        start = time.perf_counter()
+        status, _, _ = call(base, "GET", path, headers=headers)
+        assert status in (200, 304), status
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(CLIENTS) as pool:
+        return list(pool.map(one, range(REQUESTS)))
+
+
+def main():
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp, \
+            mock.patch.object(security, "KEY_FILE", Path(tmp) / "secret.key"), \
+            mock.patch.object(security, "_cipher", None):
+        path = Path(tmp) / "bench.db"
+        build_database(path, PROFILES["1y"])
+        with mock.patch.object(database, "DB_PATH", path):
+            server = ApiServer(("127.0.0.1", 0))
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base = f"http://127.0.0.1:{server.server_port}"
+
+            # Écritures______________________________________________________________________
+            timed("POST /tasks, une tâche par requête", ROWS,
+                  lambda: [call(base, "POST", "/tasks", {"title": f"une {i}"}) for i in range(ROWS)])
+            timed(f"POST /tasks, un lot de {ROWS}", ROWS,
+                  lambda: call(base, "POST", "/tasks", [{"title": f"lot {i}"} for i in range(ROWS)]))
+
+            # Lectures en parallèle : réponse complète puis 304______________________________
+            for path in ("/tasks/history?limit=200", "/moods", "/stats"):
+                _, headers, body = call(base, "GET", path)
+                full = parallel(base, path)
+                cached = parallel(base, path, {"If-None-Match": headers["ETag"]})
+                print(f"\n{path} ({len(body)} octets), {CLIENTS} clients")
+                print(f"  {'réponse complète':<24} médiane {statistics.median(full):7.2f} ms")
+                print(f"  {'If-None-Match -> 304':<24} médiane {statistics.median(cached):7.2f} ms")
+
+            server.shutdown()
+            server.server_close()
+            database.get_pool(path).close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Dashboard : coût d'un rerun complet par onglet ouvert, et d'un rerun partiel (fragment).
+
+Lancement : python -m benchmarks.bench_dashboard
+Lance main.py avec AppTest sur une base synthétique d'un an (benchmarks.synthetic),
+avec HELPDESK_PROFILE=1 : les durées et les requêtes SQL viennent de data/metrics.jsonl.
+1. Rerun complet avec chaque onglet ouvert : seul l'onglet ouvert est construit.
+2. Liste des tâches seule, comme le navigateur la relance (st.fragment) quand on coche
+   une case : un UPDATE et la relecture de la liste du jour (avec les habitudes du jour).
+"""
+import os
+
+os.environ["HELPDESK_PROFILE"] = "1"  # avant d'importer utils.profiling
+
+import json
+import logging
+import statistics
+import tempfile
+from pathlib import Path
+from benchmarks.synthetic import PROFILES, build_database
+
+ROOT = Path(__file__).resolve().parent.parent
+REPEAT = 20
+
+
+def task_list_app():
+    """Script AppTest : la liste des tâches du dashboard, seule, en fragment"""
+    import streamlit as st
+    from ui.components import fragment
+    from ui.layout import render_task_calendar
+
+    st.session_state.setdefault("selected_day", None)
+    fragment(render_task_calendar)()
+
+
+def last_report():
+    with open("data/metrics.jsonl", encoding="utf-8") as f:
+        return json.loads(f.readlines()[-1])
+
+
+def summary(label, reports):
+    """Médiane des durées et requêtes SQL du dernier rerun"""
+    sql = {name: stat["calls"] for name, stat in reports[-1]["spans"].items() if stat["kind"] == "sql"}
+    print(f"  {label:<32} {statistics.median(r['total_ms'] for r in reports):8.1f} ms"
+          f"   {sum(sql.values()):3d} requêtes SQL")
+    return sql
+
+
+def measure_tabs(at):
+    from ui.layout import DASHBOARD_TABS
+
+    print("Rerun complet, selon l'onglet ouvert")
+    for tab in DASHBOARD_TABS:
+        at.session_state["dashboard_tab"] = tab
+        reports = []
+        for _ in range(REPEAT):
+            at.run()
+            if at.exception:
+                raise RuntimeError(at.exception)
+            reports.append(last_report())
+        summary(tab, reports)
+
+
+def measure_fragment():
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_function(task_list_app, default_timeout=60)
+    at.session_state["user_id"] = 1
+    at.run()
+
+    print("\nListe des tâches relancée seule (fragment)")
+    reports = []
+    for _ in range(REPEAT):
+        at.run()
+        reports.append(last_report())
+    summary("rerun sans interaction", reports)
+
+    reports = []
+    for i in range(REPEAT):
+        box = at.checkbox[0]
+        (box.uncheck() if box.value else box.check()).run()
+        if at.exception:
+            raise RuntimeError(at.exception)
+        reports.append(last_report())
+    for name, calls in summary("cocher / décocher une tâche", reports).items():
+        print(f"      {calls} × {name}")
+
+
+def main():
+    from streamlit.testing.v1 import AppTest
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.symlink(ROOT / "assets", Path(tmp) / "assets")
+        cwd = os.getcwd()
+        os.chdir(tmp)  # data/ (base, clé, metrics.jsonl) et assets/ relatifs au dossier de lancement
+        try:
+            build_database(Path("data/journal.db"), PROFILES["1y"])
+            at = AppTest.from_file(str(ROOT / "main.py"), default_timeout=60)
+            at.run()
+            measure_tabs(at)
+            measure_fragment()
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Plan de requête et durée des recherches par jour, avant/après la migration v1.
+
+Lancement : python -m benchmarks.bench_day_index
+Crée une base temporaire de ROWS humeurs avec l'ancien schéma, mesure
+WHERE DATE(created_at) = ?, applique les migrations puis mesure WHERE day = ?.
+"""
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from db.database import open_connection
+from db.models import create_user_table, create_mood_table, create_tasks_table, create_notes_table, migrate
+from utils.dates import day_range
+
+ROWS = 300_000
+REPEAT = 50
+
+
+def fill(conn, rows=ROWS, seed=1):
+    rng = random.Random(seed)
+    start = datetime(2000, 1, 1)
+    conn.executemany(
+        "INSERT INTO mood (mood_value, emotion, created_at) VALUES (?, ?, ?)",
+        (
+            (rng.randint(1, 10), "calme", (start + timedelta(minutes=45 * i)).strftime("%Y-%m-%d %H:%M:%S"))
+            for i in range(rows)
+        )
+    )
+    conn.commit()
+
+
+def measure(conn, label, sql, params):
+    plan = " / ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        conn.execute(sql, params).fetchall()
+    elapsed = (time.perf_counter() - start) / REPEAT * 1000
+    print(f"{label:<28} {elapsed:8.3f} ms   {plan}")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = open_connection(Path(tmp) / "bench.db")
+        for create_table in (create_user_table, create_mood_table, create_tasks_table, create_notes_table):
+            create_table(conn.cursor())
+        fill(conn)
+        print(f"{ROWS} humeurs\n")
+
+        measure(conn, "avant : un jour", "SELECT * FROM mood WHERE DATE(created_at) = ?", ("2010-06-15",))
+        measure(conn, "avant : 30 jours",
+                "SELECT * FROM mood WHERE DATE(created_at) BETWEEN ? AND ?", ("2010-06-01", "2010-06-30"))
+
+        migrate(conn)
+
+        # La migration v8 a rattaché les humeurs au profil 1 : index (user_id, day)___________
+        measure(conn, "après : un jour", "SELECT * FROM mood WHERE user_id = 1 AND day = ?", ("2010-06-15",))
+        start, end = day_range(datetime(2010, 6, 1), datetime(2010, 6, 30))
+        measure(conn, "après : 30 jours", "SELECT * FROM mood WHERE user_id = 1 AND day BETWEEN ? AND ?", (start, end))
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
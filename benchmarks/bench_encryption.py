@@ -0,0 +1,79 @@
+"""
+Coût du chiffrement des champs : débit du chiffre/déchiffrement et surcoût des lectures.
+
+Lancement : python -m benchmarks.bench_encryption
+Compare la clé relue à chaque appel (ancien get_cipher) et la clé chargée une fois,
+puis mesure sur une base temporaire de ROWS notes : la migration par lots, une page
+d'historique et un export complet, en clair puis chiffrés.
+"""
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+from cryptography.fernet import Fernet
+from db import encryption
+from db.database import open_connection, set_current_user
+from db.models import create_user_table, create_mood_table, create_tasks_table, create_notes_table, migrate
+from services import export_service, mood_service
+from utils import security
+
+ROWS = 50_000
+VALUES = 5_000
+TEXT = "Journée plutôt calme, un peu de fatigue après le travail mais une belle balade le soir."
+
+
+def rate(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {count / elapsed:>12,.0f} /s   ({elapsed * 1000:.1f} ms)")
+
+
+def per_call(label, repeat, fn):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    print(f"{label:<40} {(time.perf_counter() - start) / repeat * 1000:>12.3f} ms")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        key_file = Path(tmp) / "secret.key"
+        with mock.patch.object(security, "KEY_FILE", key_file), mock.patch.object(security, "_cipher", None):
+            # Chiffrement seul________________________________________________________________
+            token = security.encrypt_value(TEXT)
+            rate("clé relue à chaque appel (déchiffrer)", VALUES,
+                 lambda: [Fernet(key_file.read_bytes()).decrypt(token[7:].encode()) for _ in range(VALUES)])
+            rate("clé en mémoire (chiffrer)", VALUES, lambda: [security.encrypt_value(TEXT) for _ in range(VALUES)])
+            rate("clé en mémoire (déchiffrer)", VALUES, lambda: [security.decrypt_value(token) for _ in range(VALUES)])
+            rate("valeur en clair (lecture)", VALUES, lambda: [security.decrypt_value(TEXT) for _ in range(VALUES)])
+
+            # Base de test______________________________________________________________________
+            conn = open_connection(Path(tmp) / "bench.db")
+            for create_table in (create_user_table, create_mood_table, create_tasks_table, create_notes_table):
+                create_table(conn.cursor())
+            migrate(conn)
+            user_id = conn.execute("INSERT INTO users (prenom) VALUES ('Bench')").lastrowid
+            conn.executemany("INSERT INTO notes (user_id, content) VALUES (?, ?)",
+                             ((user_id, f"{TEXT} {i}") for i in range(ROWS)))
+            set_current_user(user_id)
+            conn.commit()
+            print(f"\n{ROWS} notes\n")
+
+            history = mood_service.get_notes_history.__wrapped__
+            with mock.patch.object(mood_service, "get_connection", return_value=conn), \
+                    mock.patch.object(encryption, "get_connection", return_value=conn), \
+                    mock.patch.object(export_service, "get_connection", return_value=conn), \
+                    mock.patch.object(export_service, "DB_PATH", Path(tmp) / "bench.db"):
+                per_call("page d'historique (20), en clair", 200, lambda: history(20))
+                per_call("export Excel des notes, en clair", 1, lambda: export_service.build_excel(["Notes"]).close())
+
+                rate("migration par lots (lignes)", ROWS, lambda: encryption.encrypt_existing_rows(pause=0))
+
+                per_call("page d'historique (20), chiffrée", 200, lambda: history(20))
+                per_call("export Excel des notes, chiffré", 1, lambda: export_service.build_excel(["Notes"]).close())
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
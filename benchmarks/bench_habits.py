@@ -0,0 +1,88 @@
+"""
+Habitudes récurrentes : coût d'une case cochée et de la lecture des séries selon la profondeur
+de l'historique, comparé au recalcul complet des séries.
+
+Lancement : python -m benchmarks.bench_habits
+Pour chaque profondeur (YEARS), crée HABITS habitudes quotidiennes dont toutes les occurrences
+passées existent (cochées à DONE_RATE), puis mesure sans le cache de lecture :
+- cocher / décocher l'occurrence du jour (toggle_task, séries tenues à jour en temps constant) ;
+- relire séries et taux de toutes les habitudes (get_habit_summaries) ;
+- recalculer les séries d'une habitude depuis son historique (scan_streaks, à titre de comparaison) ;
+- créer les occurrences d'un jour jamais affiché (expand_habits), puis vérifier qu'il n'en
+  manque plus (ce que fait chaque affichage de la liste).
+"""
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
+from db import database
+from db.database import set_current_user
+from db.models import init_db, save_profile_to_db
+from services import habit_service
+
+YEARS = (1, 5, 10)
+HABITS = 20
+DONE_RATE = 0.85
+REPEAT = 200
+
+
+def build(conn, years, rng):
+    """HABITS habitudes commencées il y a `years` ans, avec leurs occurrences jusqu'à hier"""
+    start = date.today() - timedelta(days=365 * years)
+    days = [start + timedelta(days=i) for i in range((date.today() - start).days)]
+    for number in range(HABITS):
+        habit_id = habit_service.add_habit(f"Habitude {number}", start=start)
+        conn.executemany(
+            "INSERT INTO tasks (user_id, title, done, created_at, habit_id) VALUES (1, ?, ?, ?, ?)",
+            ((f"Habitude {number}", int(rng.random() < DONE_RATE), day.isoformat(), habit_id) for day in days)
+        )
+        rule = (start, 1, habit_service.ALL_DAYS)
+        streak_start, streak_end, length, older_best = habit_service.scan_streaks(conn, rule, habit_id)
+        conn.execute("""
+            UPDATE habits SET done_count = (SELECT COUNT(*) FROM tasks WHERE habit_id = ?1 AND done = 1),
+                   streak_start = ?2, streak_end = ?3, streak_len = ?4, older_best = ?5
+            WHERE id = ?1
+        """, (habit_id, streak_start and streak_start.isoformat(), streak_end and streak_end.isoformat(),
+              length, older_best))
+    conn.commit()
+    return start
+
+
+def measure(label, fn, repeat=REPEAT):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    print(f"  {label:<44} {elapsed:8.3f} ms")
+
+
+def main():
+    rng = random.Random(42)
+    today = date.today().isoformat()
+    for years in YEARS:
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(database, "DB_PATH", Path(tmp) / "bench.db"):
+            init_db()
+            conn = database.get_connection()
+            set_current_user(save_profile_to_db("Bench", "2000-01-01", []))
+            start = build(conn, years, rng)
+            rows = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+            print(f"\n{years} an(s) d'historique, {HABITS} habitudes, {rows} occurrences")
+
+            # Premier affichage du jour : les occurrences sont créées, puis plus rien ne manque____
+            measure("occurrences du jour créées", lambda i: habit_service.expand_habits(), repeat=1)
+            measure("occurrences du jour déjà créées (cache)", lambda i: habit_service.expand_habits())
+            task_id = conn.execute("SELECT id FROM tasks WHERE habit_id = 1 AND day = ?", (today,)).fetchone()[0]
+
+            measure("cocher / décocher l'occurrence du jour", lambda i: habit_service.toggle_task(task_id, i % 2 == 0))
+            measure("séries et taux des habitudes", lambda i: habit_service.get_habit_summaries.__wrapped__(today))
+            rule = (start, 1, habit_service.ALL_DAYS)
+            measure("recalcul complet des séries d'une habitude",
+                    lambda i: habit_service.scan_streaks(conn, rule, 1), repeat=20)
+            database.get_pool().release()
+            database.get_pool().close()
+
+
+if __name__ == "__main__":
+    main()
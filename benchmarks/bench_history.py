@@ -0,0 +1,71 @@
+"""
+Coût d'une page d'historique selon sa profondeur : OFFSET contre curseur (created_at, id).
+
+Lancement : python -m benchmarks.bench_history
+Crée une base temporaire de ROWS tâches et lit une page de PAGE_SIZE lignes
+au début, au milieu et à la fin de l'historique.
+"""
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
+from db.database import open_connection, set_current_user
+from db.models import create_user_table, create_mood_table, create_tasks_table, create_notes_table, migrate
+from services import habit_service
+
+ROWS = 300_000
+PAGE_SIZE = 20
+REPEAT = 50
+
+
+def fill(conn, rows=ROWS, seed=1):
+    rng = random.Random(seed)
+    start = date(2000, 1, 1)
+    user_id = conn.execute("INSERT INTO users (prenom) VALUES ('Bench')").lastrowid
+    conn.executemany(
+        "INSERT INTO tasks (user_id, title, done, created_at) VALUES (?, ?, ?, ?)",
+        ((user_id, f"tâche {i}", rng.randint(0, 1), (start + timedelta(days=i // 30)).isoformat()) for i in range(rows))
+    )
+    conn.commit()
+    return user_id
+
+
+def measure(label, fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    elapsed = (time.perf_counter() - start) / REPEAT * 1000
+    print(f"{label:<28} {elapsed:8.3f} ms")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = open_connection(Path(tmp) / "bench.db")
+        for create_table in (create_user_table, create_mood_table, create_tasks_table, create_notes_table):
+            create_table(conn.cursor())
+        migrate(conn)
+        set_current_user(fill(conn))
+        print(f"{ROWS} tâches, pages de {PAGE_SIZE}\n")
+
+        # Sans le cache de lecture : on mesure la requête elle-même_______________________
+        history = habit_service.get_task_history.__wrapped__
+        with mock.patch.object(habit_service, "get_connection", return_value=conn):
+            for depth in (0, ROWS // 2, ROWS - PAGE_SIZE):
+                offset_sql = """
+                    SELECT id, title, done, created_at FROM tasks WHERE user_id = 1
+                    ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?
+                """
+                measure(f"OFFSET {depth}", lambda: conn.execute(offset_sql, (PAGE_SIZE, depth)).fetchall())
+
+                before = None
+                if depth:
+                    last = conn.execute(offset_sql, (1, depth - 1)).fetchone()
+                    before = (last[-1], last[0])
+                measure(f"curseur, ligne {depth}", lambda: history(PAGE_SIZE, before))
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
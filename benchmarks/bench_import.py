@@ -0,0 +1,97 @@
+"""
+Import d'un historique de 10 ans : une ligne et un commit à la fois contre l'import par lots.
+
+Lancement : python -m benchmarks.bench_import
+Génère des fichiers CSV (humeurs, tâches, notes) sur YEARS années, les importe dans une base
+temporaire avec services.bulk_import, puis relance le même import (tout est doublon).
+L'ancienne méthode (save_mood / add_task / add_note) est mesurée sur SLOW_ROWS lignes.
+"""
+import csv
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+from db.database import open_connection, set_current_user
+from db.models import create_user_table, create_mood_table, create_tasks_table, create_notes_table, migrate
+from services import bulk_import, habit_service, mood_service
+from utils import security
+
+YEARS = 10
+MOODS_PER_DAY = 2
+TASKS_PER_DAY = 4
+NOTES_PER_DAY = 2
+SLOW_ROWS = 1000
+WORDS = ("calme", "fatigue", "travail", "balade", "sport", "famille", "lecture", "stress", "sommeil", "projet")
+
+
+def generate(directory):
+    """Fichiers CSV au format d'un autre suivi (dates françaises, humeur sur 5) ; renvoie {table: chemin}"""
+    rng = random.Random(42)
+    start = datetime.now() - timedelta(days=365 * YEARS)
+    files = {name: Path(directory) / f"{name}.csv" for name in ("mood", "tasks", "notes")}
+    with open(files["mood"], "w", newline="") as m, open(files["tasks"], "w", newline="") as t, \
+            open(files["notes"], "w", newline="") as n:
+        moods, tasks, notes = csv.writer(m, delimiter=";"), csv.writer(t), csv.writer(n)
+        moods.writerow(["Date", "Mood", "Feeling", "Activities", "Note"])
+        tasks.writerow(["date", "task", "completed"])
+        notes.writerow(["timestamp", "text"])
+        for day in range(365 * YEARS):
+            current = start + timedelta(days=day)
+            for i in range(MOODS_PER_DAY):
+                moods.writerow([(current + timedelta(hours=9 + 8 * i)).strftime("%d/%m/%Y %H:%M"), rng.randint(1, 5),
+                                rng.choice(WORDS), "|".join(rng.sample(WORDS, 2)),
+                                " ".join(rng.choices(WORDS, k=12))])
+            for i in range(TASKS_PER_DAY):
+                tasks.writerow([current.strftime("%Y-%m-%d"), f"Tâche {i} {rng.choice(WORDS)}", rng.choice(("yes", "no"))])
+            for i in range(NOTES_PER_DAY):
+                notes.writerow([(current + timedelta(hours=12 + i)).isoformat(timespec="seconds"),
+                                " ".join(rng.choices(WORDS, k=20))])
+    return files
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp, \
+            mock.patch.object(security, "KEY_FILE", Path(tmp) / "secret.key"), \
+            mock.patch.object(security, "_cipher", None):
+        files = generate(tmp)
+        conn = open_connection(Path(tmp) / "bench.db")
+        for create_table in (create_user_table, create_mood_table, create_tasks_table, create_notes_table):
+            create_table(conn.cursor())
+        migrate(conn)
+        set_current_user(conn.execute("INSERT INTO users (prenom) VALUES ('Bench')").lastrowid)
+
+        with mock.patch.object(bulk_import, "get_connection", return_value=conn), \
+                mock.patch.object(mood_service, "get_connection", return_value=conn), \
+                mock.patch.object(habit_service, "get_connection", return_value=conn):
+            # Ancienne méthode : une ligne, un commit_____________________________________________
+            start = time.perf_counter()
+            for i in range(SLOW_ROWS):
+                mood_service.save_mood(5, "calme", "sport", f"note {i}")
+            elapsed = time.perf_counter() - start
+            print(f"{'save_mood, une ligne par commit':<40} {SLOW_ROWS / elapsed:>10,.0f} lignes/s")
+            conn.execute("DELETE FROM mood")
+            conn.commit()
+
+            # Import par lots________________________________________________________________________
+            print(f"\nHistorique de {YEARS} ans\n")
+            total = 0.0
+            for table in ("mood", "tasks", "notes"):
+                report = bulk_import.import_file(files[table], table, scale=5)
+                total += report["seconds"]
+                print(f"{table:<8} {report['inserted']:>8} lignes en {report['seconds']:6.2f} s "
+                      f"({report['rows_per_second']:>8,.0f} lignes/s)")
+            print(f"{'total':<8} {'':>8}        {total:6.2f} s")
+
+            # Second passage : tout est reconnu comme doublon__________________________________________
+            print()
+            for table in ("mood", "tasks", "notes"):
+                report = bulk_import.import_file(files[table], table, scale=5)
+                print(f"{table:<8} réimport : {report['duplicates']} doublons, {report['inserted']} insérées "
+                      f"({report['rows_per_second']:,.0f} lignes/s)")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Latence de detect_distress selon la taille du lexique.
+
+Lancement : python -m benchmarks.bench_safety
+Compare l'automate compilé à l'ancienne recherche mot-clé par mot-clé :
+la première colonne doit rester stable quand le lexique grossit.
+"""
+import random
+import time
+from utils.safety import DistressDetector, load_lexicon, normalize_text
+
+MESSAGE = (
+    "Aujourd'hui j'ai eu une journée compliquée au travail, je me sens fatigué "
+    "et un peu découragé, mais j'ai quand même réussi à faire mes courses et à appeler ma soeur."
+)
+SIZES = [5, 50, 500, 5000]
+REPEAT = 2000
+
+
+def synthetic_lexicon(size, seed=42):
+    """Lexique réel complété par des expressions aléatoires de 2 à 4 mots"""
+    rng = random.Random(seed)
+    words = ["jamais", "plus", "envie", "tout", "rien", "seul", "fatigue", "vide",
+             "noir", "peur", "lourd", "bout", "fin", "perdu", "brise", "mal"]
+    lexicon = load_lexicon()
+    while len(lexicon) < size:
+        lexicon.append(" ".join(rng.choice(words) for _ in range(rng.randint(2, 4))) + " xx")
+    return lexicon[:size]
+
+
+def time_per_call(fn, repeat=REPEAT):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    print(f"{'lexique':>8} | {'automate (µs)':>14} | {'mot par mot (µs)':>17}")
+    for size in SIZES:
+        lexicon = synthetic_lexicon(size)
+        detector = DistressDetector(lexicon)
+        keywords = [normalize_text(k.rstrip("*")).strip() for k in lexicon]
+
+        def naive():
+            text = normalize_text(MESSAGE)
+            return any(k in text for k in keywords)
+
+        compiled = time_per_call(lambda: detector.matches(MESSAGE))
+        baseline = time_per_call(naive)
+        print(f"{size:>8} | {compiled:>14.1f} | {baseline:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Durée des recherches plein texte sur un journal de ROWS notes et humeurs.
+
+Lancement : python -m benchmarks.bench_search
+Crée une base temporaire, applique les migrations (index FTS5 rempli par les triggers)
+puis mesure, pour des mots plus ou moins fréquents, une première page, une page\nprofonde, une recherche filtrée par dates et le tri par pertinence.
+"""
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+from db.database import open_connection, set_current_user
+from db.models import create_user_table, create_mood_table, create_tasks_table, create_notes_table, migrate
+from services import search_service
+from services.search_service import RELEVANCE
+
+ROWS = 100_000
+REPEAT = 20
+VOCABULARY = 5000  # mots distincts, fréquences en loi de Zipf comme dans un vrai journal
+COMMON = ("sommeil", "fatigue", "sport", "travail", "famille", "anxieux", "calme", "balade",
+          "lecture", "médecin", "repas", "amis", "pluie", "soleil", "motivé", "rendez")
+
+
+def fill(conn, rows=ROWS, seed=1):
+    rng = random.Random(seed)
+    start = datetime(2015, 1, 1)
+    words = list(COMMON) + [f"mot{i}" for i in range(VOCABULARY - len(COMMON))]
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+
+    def text():
+        return " ".join(rng.choices(words, weights, k=rng.randint(5, 40)))
+
+    def when(i):
+        return (start + timedelta(minutes=60 * i)).strftime("%Y-%m-%d %H:%M:%S")
+
+    user_id = conn.execute("INSERT INTO users (prenom) VALUES ('Bench')").lastrowid
+    conn.executemany("INSERT INTO notes (user_id, content, created_at) VALUES (?, ?, ?)",
+                     ((user_id, text(), when(i)) for i in range(rows // 2)))
+    conn.executemany("INSERT INTO mood (user_id, mood_value, emotion, notes, created_at) VALUES (?, ?, ?, ?, ?)",
+                     ((user_id, rng.randint(1, 10), rng.choice(COMMON), text(), when(i)) for i in range(rows // 2)))
+    conn.commit()
+    return user_id
+
+
+def measure(label, fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / REPEAT * 1000
+    print(f"{label:<36} {elapsed:8.3f} ms")
+    return result
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = open_connection(Path(tmp) / "bench.db")
+        for create_table in (create_user_table, create_mood_table, create_tasks_table, create_notes_table):
+            create_table(conn.cursor())
+        migrate(conn)
+        set_current_user(fill(conn))
+        print(f"{ROWS} entrées\n")
+
+        # Sans le cache de lecture : on mesure la requête elle-même_______________________
+        search = search_service.search_journal.__wrapped__
+        with mock.patch.object(search_service, "get_connection", return_value=conn):
+            for word in ("mot1000", "mot100", "balade", "sommeil"):
+                count = conn.execute("SELECT COUNT(*) FROM journal_fts WHERE journal_fts MATCH ?",
+                                     (search_service.build_match_query(word),)).fetchone()[0]
+                print(f"\n'{word}' : {count} entrées")
+                _, cursor = measure("récents, 1re page", lambda: search(word))
+                for _ in range(50):
+                    cursor = search(word, after=cursor)[1] or cursor
+                measure("récents, 51e page", lambda: search(word, after=cursor))
+                measure("récents, un mois", lambda: search(word, "2018-03-01", "2018-03-31"))
+                measure("pertinence, 1re page", lambda: search(word, order=RELEVANCE))
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
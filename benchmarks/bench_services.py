@@ -0,0 +1,160 @@
+"""
+Temps des fonctions appelées à chaque affichage du dashboard, sur des journaux synthétiques.
+
+Lancement : python -m benchmarks.bench_services
+    python -m benchmarks.bench_services --profiles 1m 1y --note-words 80 --tasks-per-day 10
+    python -m benchmarks.bench_services --save-baseline     # nouvelle référence
+
+Pour chaque profil (voir benchmarks.synthetic), crée une base temporaire et mesure chaque
+fonction de HOT_FUNCTIONS à froid (caches vidés avant chaque appel) puis à chaud.
+Les résultats sont écrits dans benchmarks/results/ et comparés à benchmarks/baseline.json :
+le code de sortie est 1 si une fonction est plus lente que la référence au-delà de TOLERANCE.
+La référence dépend de la machine : la régénérer avec --save-baseline après un changement voulu.
+"""
+import argparse
+import json
+import logging
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+from db import database
+from db.cache import query_cache
+from services import export_service, habit_service, mood_service
+from utils import security
+from benchmarks.synthetic import PROFILES, TASKS_PER_DAY, NOTES_PER_DAY, NOTE_WORDS, SEED, build_database
+
+REPEAT = 5
+TOLERANCE = 0.5  # +50 % par rapport à la référence
+MIN_DELTA_MS = 2.0  # écart ignoré en dessous (bruit de mesure)
+RESULTS_DIR = Path(__file__).parent / "results"
+BASELINE = Path(__file__).parent / "baseline.json"
+
+HOT_FUNCTIONS = {
+    "get_today_tasks": habit_service.get_today_tasks,
+    "check_mood_logged_today": mood_service.check_mood_logged_today,
+    "get_mood_history": mood_service.get_mood_history,
+    "show_data_stats": export_service.show_data_stats,
+    "export_to_excel": export_service.export_to_excel,
+    "export_to_pdf": export_service.export_to_pdf,
+}
+
+
+def clear_caches():
+    query_cache.clear()
+    export_service.report_cache.clear()
+
+
+def measure(fn, repeat=REPEAT):
+    """(médiane à froid, médiane à chaud) en millisecondes"""
+    cold, warm = [], []
+    for _ in range(repeat):
+        clear_caches()
+        start = time.perf_counter()
+        fn()
+        cold.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        fn()
+        warm.append((time.perf_counter() - start) * 1000)
+    return statistics.median(cold), statistics.median(warm)
+
+
+def run_profile(directory, profile, options, repeat=REPEAT):
+    """Crée la base du profil et mesure toutes les fonctions ; renvoie (lignes, {fonction: temps})"""
+    path = Path(directory) / f"{profile}.db"
+    rows = build_database(path, PROFILES[profile], **options)
+    security._fresh.clear()  # les lectures doivent vraiment déchiffrer
+
+    timings = {}
+    with mock.patch.object(database, "DB_PATH", path), mock.patch.object(export_service, "DB_PATH", path):
+        for name, fn in HOT_FUNCTIONS.items():
+            cold, warm = measure(fn, repeat)
+            timings[name] = {"cold_ms": round(cold, 3), "warm_ms": round(warm, 3)}
+        database.get_pool(path).release()
+        database.get_pool(path).close()
+    return rows, timings
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Fonctions plus lentes que la référence : [(profil, fonction, référence, mesure)]"""
+    regressions = []
+    for profile, timings in results["results"].items():
+        reference = baseline.get("results", {}).get(profile, {})
+        for name, timing in timings.items():
+            if name not in reference:
+                continue
+            before, now = reference[name]["cold_ms"], timing["cold_ms"]
+            if now > before * (1 + tolerance) and now - before > MIN_DELTA_MS:
+                regressions.append((profile, name, before, now))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des services sur des journaux synthétiques")
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=list(PROFILES))
+    parser.add_argument("--tasks-per-day", type=int, default=TASKS_PER_DAY)
+    parser.add_argument("--notes-per-day", type=int, default=NOTES_PER_DAY)
+    parser.add_argument("--note-words", type=int, default=NOTE_WORDS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--output", type=Path, default=None, help="fichier de résultats JSON")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true", help="enregistre les résultats comme référence")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # avertissements de Streamlit hors de `streamlit run`
+    options = {"tasks_per_day": args.tasks_per_day, "notes_per_day": args.notes_per_day,
+               "note_words": args.note_words, "seed": args.seed}
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                    "platform": platform.platform()},
+        "options": options,
+        "rows": {},
+        "results": {},
+    }
+
+    # Une erreur d'export est affichée par st.error : ici elle doit interrompre la mesure_____
+    with tempfile.TemporaryDirectory() as tmp, \
+            mock.patch.object(security, "KEY_FILE", Path(tmp) / "secret.key"), \
+            mock.patch.object(security, "_cipher", None), \
+            mock.patch.object(export_service.st, "error", side_effect=RuntimeError):
+        for profile in args.profiles:
+            rows, timings = run_profile(tmp, profile, options, args.repeat)
+            results["rows"][profile], results["results"][profile] = rows, timings
+            print(f"\n{profile} : {rows}")
+            for name, timing in timings.items():
+                print(f"  {name:<26} {timing['cold_ms']:10.2f} ms à froid {timing['warm_ms']:10.3f} ms à chaud")
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = args.output or RESULTS_DIR / f"services_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"\nRésultats : {output}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+        print(f"Nouvelle référence : {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print("Pas de référence : lancer avec --save-baseline pour en créer une")
+        return
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("options") != options:
+        print(f"⚠️ Référence mesurée avec d'autres options : {baseline.get('options')}")
+
+    regressions = compare(results, baseline, args.tolerance)
+    for profile, name, before, now in regressions:
+        print(f"❌ {profile} {name} : {before:.2f} ms -> {now:.2f} ms (+{(now / before - 1) * 100:.0f} %)")
+    if regressions:
+        sys.exit(1)
+    print(f"✅ Aucune régression au-delà de {args.tolerance:.0%} par rapport à {args.baseline.name}")
+
+
+if __name__ == "__main__":
+    main()
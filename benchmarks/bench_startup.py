@@ -0,0 +1,131 @@
+"""
+Démarrage de l'application : temps d'import des modules de main.py et durée des reruns.
+
+Lancement : python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --budget-ms 200    # autre budget d'import
+
+1. Importe, dans un nouveau processus avec `python -X importtime`, les modules importés
+   par main.py (Streamlit est déjà chargé par `streamlit run` : il est importé avant et
+   n'est pas compté). Le code de sortie est 1 si le total dépasse IMPORT_BUDGET_MS ou si
+   une bibliothèque lourde (HEAVY_MODULES) est chargée dès le démarrage.
+2. Lance main.py avec AppTest sur une base temporaire : premier rerun (page d'accueil,
+   initialisation de la base), reruns suivants, puis premier affichage du dashboard.
+"""
+import argparse
+import ast
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+IMPORT_BUDGET_MS = 100.0
+HEAVY_MODULES = ("pandas", "numpy", "fpdf", "openpyxl", "matplotlib", "dateutil")
+REPEAT = 5
+RERUNS = 20
+
+
+def startup_modules(script=ROOT / "main.py"):
+    """Modules importés au niveau supérieur de main.py"""
+    modules = []
+    for node in ast.parse(script.read_text(encoding="utf-8")).body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return [module for module in modules if module.split(".")[0] != "streamlit"]
+
+
+def measure_imports(modules):
+    """(millisecondes, bibliothèques lourdes chargées) pour importer `modules` après Streamlit"""
+    code = (
+        "import sys, json, streamlit\n"
+        + "".join(f"import {module}\n" for module in modules)
+        + f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+
+    # Lignes « import time: propre | cumulé | nom » ; niveau 0 = nom sans retrait__________
+    total, counting = 0, False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or line.endswith("| package"):
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if name.startswith("  "):
+            continue
+        if name.strip() == "streamlit":
+            counting = True
+        elif counting:
+            total += int(cumulative)
+    return total / 1000, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_reruns(reruns=RERUNS):
+    """Durées (ms) : premier rerun, reruns suivants (médiane), premier affichage du dashboard"""
+    from streamlit.testing.v1 import AppTest
+
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.symlink(ROOT / "assets", Path(tmp) / "assets")
+        cwd = os.getcwd()
+        os.chdir(tmp)  # data/ et assets/ sont relatifs au dossier de lancement
+        try:
+            at = AppTest.from_file(str(ROOT / "main.py"), default_timeout=60)
+            start = time.perf_counter()
+            at.run()
+            timings["premier rerun"] = (time.perf_counter() - start) * 1000
+
+            durations = []
+            for _ in range(reruns):
+                start = time.perf_counter()
+                at.run()
+                durations.append((time.perf_counter() - start) * 1000)
+            timings["rerun suivant (médiane)"] = statistics.median(durations)
+
+            # Profil, introduction, humeur du jour : on arrive sur le dashboard_____________
+            at.text_input[0].input("Alex")
+            at.button[0].click().run()
+            at.button[0].click().run()
+            start = time.perf_counter()
+            at.button[0].click().run()
+            timings["premier dashboard"] = (time.perf_counter() - start) * 1000
+            if at.exception:
+                raise RuntimeError(at.exception)
+        finally:
+            os.chdir(cwd)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps de démarrage de Help-Desk")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--no-reruns", action="store_true", help="seulement le temps d'import")
+    args = parser.parse_args()
+
+    modules = startup_modules()
+    runs = [measure_imports(modules) for _ in range(args.repeat)]
+    import_ms = statistics.median(ms for ms, _ in runs)
+    heavy = runs[-1][1]
+    print(f"Imports de main.py ({len(modules)} modules) : {import_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"Bibliothèques lourdes chargées au démarrage : {', '.join(heavy) or 'aucune'}")
+
+    if not args.no_reruns:
+        logging.disable(logging.WARNING)
+        for label, ms in measure_reruns().items():
+            print(f"  {label:<26} {ms:8.1f} ms")
+
+    if import_ms > args.budget_ms or heavy:
+        print("❌ Démarrage hors budget")
+        sys.exit(1)
+    print("✅ Démarrage dans le budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Requêtes d'un profil quand la base contient de plus en plus de profils (migration v8).
+
+Lancement : python -m benchmarks.bench_users
+Ajoute des profils par paliers (USERS), chacun avec DAYS jours d'humeurs, de tâches et de
+notes, et mesure à chaque palier les requêtes du premier profil sans le cache de lecture.
+Avec les index (user_id, day) les temps doivent rester stables d'un palier à l'autre.
+"""
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
+from db import database
+from db.database import set_current_user
+from db.models import init_db
+from services import habit_service, mood_service, search_service, stats_service
+
+USERS = (1, 10, 100, 300)  # paliers
+DAYS = 365
+TASKS_PER_DAY = 5
+REPEAT = 50
+WORDS = ("calme", "fatigue", "travail", "balade", "sport", "famille", "lecture", "stress", "sommeil", "projet")
+
+
+def add_user(conn, number, rng):
+    """Un profil et DAYS jours de données jusqu'à aujourd'hui"""
+    user_id = conn.execute("INSERT INTO users (prenom) VALUES (?)", (f"Profil {number}",)).lastrowid
+    start = date.today() - timedelta(days=DAYS - 1)
+    days = [(start + timedelta(days=i)).isoformat() for i in range(DAYS)]
+
+    def text():
+        return " ".join(rng.choices(WORDS, k=12))
+
+    conn.executemany(
+        "INSERT INTO mood (user_id, mood_value, emotion, notes, created_at) VALUES (?, ?, ?, ?, ?)",
+        ((user_id, rng.randint(1, 10), rng.choice(WORDS), text(), f"{day} 20:00:00") for day in days)
+    )
+    conn.executemany(
+        "INSERT INTO tasks (user_id, title, done, created_at) VALUES (?, ?, ?, ?)",
+        ((user_id, f"Tâche {i}", rng.randint(0, 1), day) for day in days for i in range(TASKS_PER_DAY))
+    )
+    conn.executemany(
+        "INSERT INTO notes (user_id, content, created_at) VALUES (?, ?, ?)",
+        ((user_id, text(), f"{day} 12:00:00") for day in days)
+    )
+    conn.commit()
+
+
+def measure(label, fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    elapsed = (time.perf_counter() - start) / REPEAT * 1000
+    print(f"  {label:<28} {elapsed:8.3f} ms")
+
+
+def main():
+    rng = random.Random(42)
+    today = date.today().isoformat()
+    month_ago = (date.today() - timedelta(days=30)).isoformat()
+
+    # Sans le cache de lecture : on mesure les requêtes elles-mêmes_________________________
+    queries = {
+        "tâches du jour": lambda: habit_service.get_tasks_of_day.__wrapped__(today),
+        "historique des tâches": lambda: habit_service.get_task_history.__wrapped__(),
+        "humeur du jour": lambda: mood_service.get_mood_of_day.__wrapped__(today),
+        "statistiques sur 30 jours": lambda: stats_service.get_period_totals.__wrapped__(month_ago, today),
+        "courbe d'humeur sur un an": lambda: stats_service.get_daily_mood.__wrapped__(),
+        "recherche 'balade'": lambda: search_service.search_journal.__wrapped__("balade"),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp, mock.patch.object(database, "DB_PATH", Path(tmp) / "bench.db"):
+        init_db()
+        conn = database.get_connection()
+        count = 0
+        for target in USERS:
+            while count < target:
+                count += 1
+                add_user(conn, count, rng)
+            rows = conn.execute("SELECT (SELECT COUNT(*) FROM mood) + (SELECT COUNT(*) FROM tasks) "
+                                "+ (SELECT COUNT(*) FROM notes)").fetchone()[0]
+            print(f"\n{count} profils, {rows} lignes")
+            set_current_user(1)
+            for label, query in queries.items():
+                measure(label, query)
+        database.get_pool().release()
+        database.get_pool().close()
+
+
+if __name__ == "__main__":
+    main()
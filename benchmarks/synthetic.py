@@ -0,0 +1,108 @@
+"""
+Journaux synthétiques réalistes et reproductibles pour les benchmarks.
+
+Lancement : python -m benchmarks.synthetic data/synthetique.db --profile 1y
+La même graine donne toujours le même contenu ; les dates sont comptées à rebours
+depuis `end` (aujourd'hui par défaut) pour que les fonctions « du jour » aient des données.
+Les lignes passent par services.bulk_import : chiffrement, index de recherche et
+statistiques sont remplis comme dans une vraie base.
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from unittest import mock
+from db import database
+from db.database import set_current_user
+from db.models import init_db, save_profile_to_db
+from services.bulk_import import IMPORT_FIELDS, import_records
+
+PROFILES = {"1m": 30, "1y": 365, "10y": 3650}  # nombre de jours
+TASKS_PER_DAY = 5
+NOTES_PER_DAY = 1
+NOTE_WORDS = 40  # longueur moyenne d'une note
+SEED = 42
+
+VOCABULARY = 3000  # mots distincts, fréquences en loi de Zipf comme dans un vrai journal
+COMMON = ("sommeil", "fatigue", "sport", "travail", "famille", "anxieux", "calme", "balade",
+          "lecture", "médecin", "repas", "amis", "pluie", "soleil", "motivé", "rendez-vous")
+EMOTIONS = ("calme", "joie", "fatigue", "stress", "tristesse", "colère", "fierté", "ennui")
+TASKS = ("Marcher 20 minutes", "Boire de l'eau", "Lire", "Méditer", "Ranger le bureau",
+         "Appeler un ami", "Préparer le repas", "Prendre mon traitement", "Écrire 3 lignes")
+
+
+def generate(days, tasks_per_day=TASKS_PER_DAY, notes_per_day=NOTES_PER_DAY, note_words=NOTE_WORDS,
+             seed=SEED, end=None):
+    """{table: liste de dictionnaires} au format de IMPORT_FIELDS, sur `days` jours jusqu'à `end`"""
+    rng = random.Random(seed)
+    end = end or date.today()
+    words = list(COMMON) + [f"mot{i}" for i in range(VOCABULARY - len(COMMON))]
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+
+    def text(size):
+        return " ".join(rng.choices(words, weights, k=max(1, int(rng.gauss(size, size / 4)))))
+
+    records = {"mood": [], "tasks": [], "notes": []}
+    mood = 6.0
+    for offset in range(days - 1, -1, -1):
+        day = end - timedelta(days=offset)
+        evening = datetime(day.year, day.month, day.day, 20) + timedelta(minutes=rng.randint(0, 180))
+
+        # Humeur qui varie doucement d'un jour à l'autre___________________________________
+        mood = min(10.0, max(1.0, mood + rng.gauss(0, 1)))
+        records["mood"].append({
+            "mood_value": round(mood),
+            "emotion": rng.choice(EMOTIONS),
+            "motivation": text(6),
+            "tags": ", ".join(rng.sample(COMMON, 2)),
+            "notes": text(note_words),
+            "created_at": evening.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+        for i in range(tasks_per_day):
+            records["tasks"].append({
+                "title": f"{rng.choice(TASKS)} ({i + 1})",
+                "done": int(offset > 0 and rng.random() < 0.7),
+                "created_at": day.isoformat(),
+            })
+        for _ in range(notes_per_day):
+            written = datetime(day.year, day.month, day.day, rng.randint(7, 22), rng.randint(0, 59))
+            records["notes"].append({"content": text(note_words), "created_at": written.strftime("%Y-%m-%d %H:%M:%S")})
+    return records
+
+
+def build_database(path, days, **options):
+    """Crée une base synthétique au chemin donné (qui ne doit pas exister) ; renvoie {table: lignes}"""
+    path = Path(path)
+    if path.exists():
+        raise FileExistsError(f"{path} existe déjà")
+    counts = {}
+    with mock.patch.object(database, "DB_PATH", path):
+        init_db()
+        set_current_user(save_profile_to_db("Alex", "1990-01-01", ["TDAH", "sport"]))
+        for table, records in generate(days, **options).items():
+            identity = {field: field for field in IMPORT_FIELDS[table]}
+            counts[table] = import_records(records, table, identity)["inserted"]
+        database.get_pool(path).release()
+        database.get_pool(path).close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère une base de journal synthétique")
+    parser.add_argument("path", help="fichier .db à créer")
+    parser.add_argument("--profile", choices=list(PROFILES), default="1y")
+    parser.add_argument("--tasks-per-day", type=int, default=TASKS_PER_DAY)
+    parser.add_argument("--notes-per-day", type=int, default=NOTES_PER_DAY)
+    parser.add_argument("--note-words", type=int, default=NOTE_WORDS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = build_database(args.path, PROFILES[args.profile], tasks_per_day=args.tasks_per_day,
+                            notes_per_day=args.notes_per_day, note_words=args.note_words, seed=args.seed)
+    print(f"{args.path} : {counts} en {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
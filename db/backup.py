@@ -0,0 +1,262 @@
+"""
+Sauvegardes de la base pendant que l'application tourne (API de sauvegarde SQLite).
+
+La copie avance par paquets de PAGES_PER_STEP pages avec une courte pause entre deux,
+depuis une connexion à part qui garde la même lecture (WAL) jusqu'au bout : les écritures
+de l'application ne sont jamais bloquées et ne font pas recommencer la copie. Chaque
+sauvegarde est une copie complète de la base (pas de sauvegarde différentielle) :
+elle est vérifiée (PRAGMA integrity_check), compressée (gzip) puis chiffrée avec la clé
+de data/secret.key si demandé, en flux, sans jamais charger toute la base en mémoire.
+Les plus anciennes sont ensuite supprimées.
+
+Fichier chiffré : une suite de jetons Fernet (un par bloc de CHUNK_BYTES de la base
+compressée), un par ligne.
+
+Lancement :
+    python -m db.backup                      # une sauvegarde
+    python -m db.backup --list
+    python -m db.backup --verify FICHIER
+    python -m db.backup --restore FICHIER    # remplace le contenu de la base
+"""
+import argparse
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from db.database import open_connection, get_pool, DB_PATH
+from utils.security import get_cipher
+
+BACKUP_DIR = DB_PATH.parent / "backups"
+PAGES_PER_STEP = 256  # pages copiées à la fois (1 Mo avec des pages de 4 Ko)
+STEP_PAUSE = 0.005  # secondes entre deux paquets
+KEEP = 7  # sauvegardes gardées
+INTERVAL = 24 * 3600  # secondes entre deux sauvegardes automatiques
+CHECK_EVERY = 600  # secondes entre deux vérifications du planificateur
+ENCRYPT = True
+CHUNK_BYTES = 4 * 1024 * 1024  # taille des blocs chiffrés un à un
+
+SUFFIX = ".db.gz"
+ENCRYPTED_SUFFIX = ".db.gz.enc"
+
+# Avancement de la sauvegarde en cours, lu par l'interface____________________________________
+_status = {"state": "idle", "step": "", "progress": 0.0, "last": None, "error": None}
+_lock = threading.Lock()
+
+
+def _set_status(**values):
+    with _lock:
+        _status.update(values)
+
+
+def get_status() -> dict:
+    with _lock:
+        return dict(_status)
+
+
+def list_backups(backup_dir=None):
+    """Sauvegardes existantes, de la plus récente à la plus ancienne"""
+    backup_dir = Path(backup_dir or BACKUP_DIR)
+    if not backup_dir.exists():
+        return []
+    files = [p for p in backup_dir.iterdir() if p.name.endswith((SUFFIX, ENCRYPTED_SUFFIX))]
+    return sorted(files, key=lambda p: p.stat().st_mtime, reverse=True)
+
+
+def _integrity_check(path):
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        conn.close()
+    if result != "ok":
+        raise sqlite3.DatabaseError(f"Sauvegarde corrompue ({path.name}) : {result}")
+
+
+def create_backup(backup_dir=None, encrypt=ENCRYPT, keep=KEEP, pages=PAGES_PER_STEP, pause=STEP_PAUSE):
+    """Copie la base, la vérifie, la compresse et la chiffre ; renvoie le chemin de la sauvegarde"""
+    backup_dir = Path(backup_dir or BACKUP_DIR)
+    backup_dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+    stamp, suffix = f"journal_{datetime.now():%Y%m%d_%H%M%S}", ENCRYPTED_SUFFIX if encrypt else SUFFIX
+    target, n = backup_dir / (stamp + suffix), 1
+    while target.exists():
+        n += 1
+        target = backup_dir / f"{stamp}_{n}{suffix}"
+
+    _set_status(state="running", step="copie", progress=0.0, error=None)
+    with tempfile.TemporaryDirectory(dir=backup_dir) as tmp:
+        copy = Path(tmp) / "journal.db"
+        try:
+            def progress(_, remaining, total):
+                _set_status(progress=(total - remaining) / total if total else 1.0)
+
+            # Copie page par page dans une transaction de lecture ouverte d'avance : la base est
+            # copiée telle qu'au BEGIN. Sans elle, chaque écriture d'une autre connexion entre
+            # deux paquets fait repartir la copie de zéro (et une base très active ne finit jamais)
+            source, snapshot = open_connection(), sqlite3.connect(copy)
+            try:
+                source.execute("BEGIN")
+                source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+                source.backup(snapshot, pages=pages, progress=progress, sleep=pause)
+                snapshot.execute("PRAGMA journal_mode=DELETE")  # fichier autonome, sans WAL
+            finally:
+                snapshot.close()
+                source.close()
+
+            _set_status(step="vérification")
+            _integrity_check(copy)
+
+            _set_status(step="compression")
+            compressed = Path(tmp) / "journal.db.gz"
+            with open(copy, "rb") as source, gzip.open(compressed, "wb", compresslevel=6) as output:
+                shutil.copyfileobj(source, output, CHUNK_BYTES)
+
+            # Écriture atomique, fichier lisible par le propriétaire seul____________________
+            partial = target.with_name(target.name + ".part")
+            fd = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as output, open(compressed, "rb") as source:
+                if encrypt:
+                    _set_status(step="chiffrement")
+                    cipher = get_cipher()
+                    while chunk := source.read(CHUNK_BYTES):
+                        output.write(cipher.encrypt(chunk) + b"\n")
+                else:
+                    shutil.copyfileobj(source, output, CHUNK_BYTES)
+            partial.replace(target)
+        except Exception as e:
+            _set_status(state="error", error=str(e))
+            raise
+
+    for old in list_backups(backup_dir)[keep:]:
+        old.unlink()
+
+    _set_status(state="done", step="", progress=1.0, last=str(target))
+    return target
+
+
+def _extract(path, directory):
+    """Déchiffre (si besoin) et décompresse une sauvegarde dans un dossier ; renvoie le fichier .db"""
+    compressed = Path(path)
+    if str(path).endswith(ENCRYPTED_SUFFIX):
+        compressed = Path(directory) / "journal.db.gz"
+        cipher = get_cipher()
+        with open(path, "rb") as source, open(compressed, "wb") as output:
+            for token in source:
+                output.write(cipher.decrypt(token.rstrip(b"\n")))
+    copy = Path(directory) / "journal.db"
+    with gzip.open(compressed, "rb") as source, open(copy, "wb") as output:
+        shutil.copyfileobj(source, output, CHUNK_BYTES)
+    return copy
+
+
+def verify_backup(path):
+    """Vérifie qu'une sauvegarde se lit et que la base est intègre ; lève une exception sinon"""
+    with tempfile.TemporaryDirectory(dir=Path(path).parent) as tmp:
+        _integrity_check(_extract(path, tmp))
+
+
+def restore_backup(path):
+    """
+    Remplace le contenu de la base par celui d'une sauvegarde vérifiée.
+    La sauvegarde est préparée à part (extraite, migrée) puis copiée en une seule étape de
+    l'API de sauvegarde, donc une seule transaction d'écriture : les autres connexions (pool,
+    threads de sauvegarde et de chiffrement) attendent busy_timeout puis voient la base
+    restaurée, jamais un mélange des deux, et restent valides.
+    """
+    from db.cache import query_cache
+    from db.models import migrate
+
+    with tempfile.TemporaryDirectory(dir=Path(path).parent) as tmp:
+        copy = _extract(path, tmp)
+        _integrity_check(copy)
+
+        target, restored = open_connection(), open_connection(copy)
+        try:
+            # Sauvegarde d'une ancienne version du schéma : on la met à jour avant la copie_____
+            migrate(restored)
+
+            # Les caches ne doivent pas reconnaître un ancien numéro de version_________________
+            version = target.execute("SELECT version FROM data_version WHERE id = 1").fetchone()[0]
+            with restored:
+                restored.execute("UPDATE data_version SET version = MAX(version, ?) + 1 WHERE id = 1", (version,))
+
+            restored.backup(target)
+        finally:
+            restored.close()
+            target.close()
+
+    # Les connexions inutilisées du pool se referment, les autres relisent la base restaurée____
+    get_pool().close()
+    query_cache.clear()
+
+
+def start_backup(**options):
+    """Lance une sauvegarde dans un thread de fond ; False si une sauvegarde est déjà en cours"""
+    with _lock:
+        if _status["state"] == "running":
+            return False
+        _status.update(state="running", step="attente", progress=0.0, error=None)
+
+    def run():
+        try:
+            create_backup(**options)
+        except Exception:
+            pass  # erreur déjà dans _status
+
+    threading.Thread(target=run, name="backup", daemon=True).start()
+    return True
+
+
+_scheduler_started = False
+
+
+def start_backup_scheduler(interval=INTERVAL):
+    """Sauvegarde automatique si la dernière a plus de `interval` secondes (une fois par processus)"""
+    global _scheduler_started
+    with _lock:
+        if _scheduler_started:
+            return
+        _scheduler_started = True
+
+    def run():
+        while True:
+            backups = list_backups()
+            if not backups or time.time() - backups[0].stat().st_mtime > interval:
+                start_backup()
+            time.sleep(CHECK_EVERY)
+
+    threading.Thread(target=run, name="backup-scheduler", daemon=True).start()
+
+
+def main():
+    from db.models import init_db
+
+    parser = argparse.ArgumentParser(description="Sauvegardes de la base Help-Desk")
+    parser.add_argument("--list", action="store_true", help="liste les sauvegardes")
+    parser.add_argument("--verify", metavar="FICHIER", help="vérifie une sauvegarde")
+    parser.add_argument("--restore", metavar="FICHIER", help="restaure une sauvegarde")
+    parser.add_argument("--no-encrypt", action="store_true", help="sauvegarde non chiffrée")
+    args = parser.parse_args()
+
+    init_db()
+    if args.list:
+        for path in list_backups():
+            print(f"{path}  {path.stat().st_size / 1024:.0f} Ko")
+    elif args.verify:
+        verify_backup(args.verify)
+        print("Sauvegarde intègre")
+    elif args.restore:
+        restore_backup(args.restore)
+        print("Base restaurée")
+    else:
+        start = time.perf_counter()
+        path = create_backup(encrypt=not args.no_encrypt)
+        print(f"{path} ({path.stat().st_size / 1024:.0f} Ko) en {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
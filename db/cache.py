@@ -0,0 +1,106 @@
+"""
+Cache de lecture partagé par les fonctions de services/.
+
+Chaque résultat est associé au numéro de version de la base (table data_version,
+incrémentée par trigger à chaque écriture) et à celui du profil actif (user_data_version,
+incrémentée à chaque écriture dans ses données). Une écriture faite par n'importe
+quelle session ou n'importe quel processus change ce numéro : les résultats
+mis en cache avant deviennent invalides sans qu'on ait à les vider à la main.
+Les écritures d'un profil n'invalident pas les résultats des autres.
+"""
+import functools
+import pickle
+import threading
+from collections import OrderedDict
+from db.database import get_connection, get_pool, current_user_id
+
+MAX_BYTES = 32 * 1024 * 1024  # mémoire max occupée par les résultats en cache
+
+
+def data_version(conn=None, user_id=None) -> tuple:
+    """Version courante des données : (base, profil) ; 0 pour le profil si user_id est None"""
+    conn = conn or get_connection()
+    row = conn.execute("""
+        SELECT (SELECT version FROM data_version WHERE id = 1),
+               (SELECT version FROM user_data_version WHERE user_id = ?)
+    """, (user_id,)).fetchone()
+    return row[0] or 0, row[1] or 0
+
+
+class QueryCache:
+    """Cache LRU borné en taille ; une entrée n'est valable que pour une version"""
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # clé -> (version, valeur, taille)
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, version, value):
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[2]
+            self._entries[key] = (version, value, size)
+            self.size += size
+            # Éviction des résultats les moins récemment utilisés____________________________
+            while self.size > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self.size}
+
+
+query_cache = QueryCache()
+
+
+def cached_query(fn=None, *, cache=None, keep=None):
+    """
+    Décorateur pour les fonctions de lecture : le résultat est réutilisé tant que
+    la base n'a pas changé. Les résultats sont propres au profil actif et partagés
+    entre ses sessions : ne pas les modifier.
+    cache : instance de QueryCache à utiliser (query_cache par défaut).
+    keep : keep(résultat) -> bool ; un résultat pour lequel elle renvoie False n'est pas gardé.
+    """
+    if fn is None:
+        return functools.partial(cached_query, cache=cache, keep=keep)
+
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        store = cache or query_cache
+        user_id = current_user_id(required=False)
+        key = (str(get_pool().path), user_id, name, args, tuple(sorted(kwargs.items())))
+        version = data_version(user_id=user_id)
+        found, value = store.get(key, version)
+        if found:
+            return value
+        value = fn(*args, **kwargs)
+        if keep is None or keep(value):
+            store.put(key, version, value)
+        return value
+
+    return wrapper
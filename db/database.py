@@ -1,19 +1,163 @@
 import sqlite3
+import queue
+import threading
+import weakref
 from pathlib import Path
 import os
+from utils.profiling import CONNECTION_FACTORY
+from utils.security import decrypt_value
 
 DB_PATH = Path("data/journal.db")
 
-def get_connection():
-    """Crée et retourne une connexion à la base de données"""
+POOL_SIZE = 8  # connexions ouvertes au maximum (une par thread actif)
+POOL_TIMEOUT = 30  # secondes d'attente max d'une connexion libre
+BUSY_TIMEOUT_MS = 5000  # attente si un autre processus écrit
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KB = 16 * 1024
+CACHED_STATEMENTS = 256  # requêtes préparées gardées par connexion (128 par défaut)
+
+PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    f"PRAGMA mmap_size={MMAP_SIZE}",
+    f"PRAGMA cache_size=-{CACHE_SIZE_KB}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA secure_delete=ON",  # pages libérées mises à zéro (texte de l'index de recherche)
+)
+
+
+def open_connection(path=None):
+    """Ouvre une nouvelle connexion configurée (hors pool)"""
+    path = Path(path or DB_PATH)
+
     # Crée le dossier data s'il n'existe pas_______________________________________________________
-    DB_PATH.parent.mkdir(exist_ok=True, mode=0o700)
+    path.parent.mkdir(exist_ok=True, mode=0o700)
+    is_new = not path.exists()
 
-    # Créer la connexion
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    # check_same_thread=False : le pool garantit qu'un seul thread utilise la connexion à la fois
+    # (CONNECTION_FACTORY mesure chaque requête si HELPDESK_PROFILE=1, voir utils.profiling)
+    conn = sqlite3.connect(path, check_same_thread=False, cached_statements=CACHED_STATEMENTS,
+                           factory=CONNECTION_FACTORY)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+
+    # WAL est gardé dans le fichier : on ne le demande que s'il manque. Changer de mode demande
+    # un verrou exclusif, qu'une base neuve ouverte par plusieurs processus n'obtient pas toujours
+    if conn.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+        conn.execute("PRAGMA journal_mode=WAL")
+
+    # Les triggers de l'index de recherche lisent le texte déchiffré_______________________________
+    conn.create_function("decrypt_field", 1, decrypt_value, deterministic=True)
 
     # Définir les permissions du fichier de base de données (lecture/écriture propriétaire uniquement)__
-    if os.path.exists(DB_PATH):
-        os.chmod(DB_PATH, 0o600)
+    if is_new:
+        os.chmod(path, 0o600)
+
+    return conn
+
+
+class _Lease:
+    """Connexion prêtée à un thread ; rendue au pool quand le thread se termine"""
+
+    def __init__(self, pool, conn):
+        self.conn = conn
+        self._finalizer = weakref.finalize(self, pool._release, conn)
+
+    def release(self):
+        self._finalizer()
+
+
+class ConnectionPool:
+    """
+    Pool borné de connexions SQLite, une par thread.
+    Chaque thread (rerun Streamlit, worker, API...) réutilise toujours la même
+    connexion ; elle revient dans le pool à la fin du thread.
+    """
+
+    def __init__(self, path=DB_PATH, size=POOL_SIZE):
+        self.path = Path(path)
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._local = threading.local()
+
+    def get(self):
+        lease = getattr(self._local, "lease", None)
+        if lease is None:
+            lease = _Lease(self, self._acquire())
+            self._local.lease = lease
+        return lease.conn
+
+    def release(self):
+        """Rend tout de suite la connexion du thread courant"""
+        lease = getattr(self._local, "lease", None)
+        if lease is not None:
+            self._local.lease = None
+            lease.release()
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=POOL_TIMEOUT):
+            raise sqlite3.OperationalError("Aucune connexion disponible dans le pool")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return open_connection(self.path)
+            except BaseException:
+                self._slots.release()
+                raise
+
+    def _release(self, conn):
+        # Une transaction laissée ouverte ne doit pas suivre la connexion__________________
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+        self._slots.release()
+
+    def close(self):
+        """Ferme les connexions inutilisées"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=None) -> ConnectionPool:
+    path = Path(path or DB_PATH)
+    with _pools_lock:
+        if path not in _pools:
+            _pools[path] = ConnectionPool(path)
+        return _pools[path]
+
+
+def get_connection():
+    """Retourne la connexion du thread courant (ne pas la fermer)"""
+    return get_pool().get()
+
+
+def release_connection():
+    """Rend la connexion du thread courant au pool (threads de fond de longue durée)"""
+    get_pool().release()
+
+
+#Profil actif_________________________________________________________________________________
+# Les services ne lisent et n'écrivent que les données du profil actif du thread :
+# main.py le fixe à chaque rerun, les outils en ligne de commande avec --user.
+_session = threading.local()
+
+
+def set_current_user(user_id):
+    """Fixe le profil actif du thread courant (None : aucun)"""
+    _session.user_id = user_id
+
 
-    return conn
\ No newline at end of file
+def current_user_id(required=True):
+    """Profil actif du thread ; LookupError s'il n'y en a pas (sauf required=False)"""
+    user_id = getattr(_session, "user_id", None)
+    if user_id is None and required:
+        raise LookupError("Aucun profil actif (voir set_current_user)")
+    return user_id
@@ -0,0 +1,119 @@
+"""
+Chiffrement des champs sensibles encore enregistrés en clair (notes, ressentis des humeurs).
+
+Les lignes sont traitées par lots de BATCH_SIZE, chacun dans une courte transaction :
+l'application reste utilisable pendant la migration. Une migration interrompue reprend
+où elle s'était arrêtée, les valeurs déjà chiffrées étant reconnues à leur forme (préfixe
+suivi d'un jeton base64, voir utils.security).
+
+Lancement : automatiquement au démarrage de l'application (thread de fond), ou
+    python -m db.encryption
+"""
+import threading
+import time
+from db.database import get_connection, release_connection
+from db.models import ENCRYPTED_COLUMNS
+from utils.security import ENCRYPTED_PREFIX, encrypt_value, is_encrypted
+
+BATCH_SIZE = 500
+PAUSE = 0.05  # secondes entre deux lots, pour laisser passer les écritures de l'application
+
+# Forme d'une valeur chiffrée, vérifiable en SQL : le préfixe puis seulement des caractères base64
+ENCRYPTED_GLOB = f"{ENCRYPTED_PREFIX}*"
+NOT_TOKEN_GLOB = f"{ENCRYPTED_PREFIX}*[^A-Za-z0-9_=-]*"
+
+
+def _plaintext_condition(columns):
+    """
+    Condition SQL : au moins une colonne non vide qui n'a pas la forme d'une valeur chiffrée
+    (un texte saisi avant le chiffrement peut commencer par le préfixe)
+    """
+    return " OR ".join(
+        f"({column} <> '' AND ({column} NOT GLOB ? OR {column} GLOB ?))" for column in columns
+    )
+
+
+def pending_rows(conn=None) -> dict:
+    """Nombre de lignes encore en clair, par table"""
+    conn = conn or get_connection()
+    counts = {}
+    for table, columns in ENCRYPTED_COLUMNS.items():
+        globs = (ENCRYPTED_GLOB, NOT_TOKEN_GLOB) * len(columns)
+        counts[table] = conn.execute(
+            f"SELECT COUNT(*) FROM {table} WHERE {_plaintext_condition(columns)}", globs
+        ).fetchone()[0]
+    return counts
+
+
+def encrypt_table(conn, table, batch_size=BATCH_SIZE, pause=PAUSE) -> int:
+    """Chiffre les lignes en clair d'une table, lot par lot ; renvoie le nombre de lignes traitées"""
+    columns = ENCRYPTED_COLUMNS[table]
+    globs = (ENCRYPTED_GLOB, NOT_TOKEN_GLOB) * len(columns)
+
+    # La ligne n'est réécrite que si elle n'a pas changé depuis sa lecture___________________
+    update = f"""
+        UPDATE {table} SET {", ".join(f"{column} = ?" for column in columns)}
+        WHERE id = ? AND {" AND ".join(f"{column} IS ?" for column in columns)}
+    """
+
+    last_id, done = 0, 0
+    while True:
+        rows = conn.execute(f"""
+            SELECT id, {", ".join(columns)} FROM {table}
+            WHERE id > ? AND ({_plaintext_condition(columns)})
+            ORDER BY id
+            LIMIT ?
+        """, (last_id, *globs, batch_size)).fetchall()
+        if not rows:
+            return done
+
+        # Les autres colonnes de la ligne peuvent être déjà chiffrées_________________________
+        encrypted = [(row[0], *(v if is_encrypted(v) else encrypt_value(v) for v in row[1:])) for row in rows]
+        with conn:
+            conn.executemany(update, [(*new[1:], new[0], *old[1:]) for old, new in zip(rows, encrypted)])
+
+        done += len(rows)
+        last_id = rows[-1][0]
+        if pause:
+            time.sleep(pause)
+
+
+def encrypt_existing_rows(batch_size=BATCH_SIZE, pause=PAUSE) -> dict:
+    """Chiffre toutes les valeurs encore en clair ; renvoie le nombre de lignes traitées par table"""
+    conn = get_connection()
+    return {table: encrypt_table(conn, table, batch_size, pause) for table in ENCRYPTED_COLUMNS}
+
+
+_started = False
+_started_lock = threading.Lock()
+
+
+def start_background_encryption():
+    """Lance la migration dans un thread de fond, une seule fois par processus"""
+    global _started
+    with _started_lock:
+        if _started:
+            return
+        _started = True
+
+    def run():
+        try:
+            encrypt_existing_rows()
+        finally:
+            release_connection()
+
+    threading.Thread(target=run, name="encryption", daemon=True).start()
+
+
+def main():
+    from db.models import init_db
+
+    init_db()
+    print(f"En clair avant : {pending_rows()}")
+    start = time.perf_counter()
+    done = encrypt_existing_rows(pause=0)
+    print(f"Chiffrées : {done} en {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
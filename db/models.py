@@ -1,17 +1,70 @@
-from db.database import get_connection
+import threading
+from db.database import get_connection, get_pool, open_connection
+
+_initialized = set()  # bases déjà initialisées dans ce processus : (chemin, inode)
+_initialized_lock = threading.Lock()
+
 
 def init_db():
-    """Initialise toutes les tables si elles n'existent pas déjà."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    """
+    Initialise toutes les tables si elles n'existent pas déjà.
+    Ne fait le travail qu'une fois par base et par processus : les reruns suivants
+    ne coûtent qu'un stat() du fichier (un fichier remplacé est réinitialisé).
+    """
+    path = get_pool().path
+    key = (path, path.stat().st_ino) if path.exists() else None
+    if key in _initialized:
+        return
+    with _initialized_lock:
+        _init_tables()
+        _initialized.add((path, path.stat().st_ino))
 
-    create_user_table(cursor)
-    create_mood_table(cursor)
-    create_tasks_table(cursor)
-    create_notes_table(cursor)
 
-    conn.commit()
-    conn.close()
+def _init_tables():
+    """
+    Tables de base puis migrations, sur une connexion dédiée en mode autocommit :
+    chaque étape est une transaction BEGIN IMMEDIATE explicite (voir migrate), ce qui
+    sérialise l'initialisation entre processus (plusieurs onglets, API, sauvegarde).
+    """
+    conn = open_connection(get_pool().path)
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.cursor()
+            create_user_table(cursor)
+            create_mood_table(cursor)
+            create_tasks_table(cursor)
+            create_notes_table(cursor)
+            create_chat_cache_table(cursor)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        migrate(conn)
+    finally:
+        conn.close()
+
+
+# Colonnes chiffrées (voir utils.security et db.encryption)___________________________________
+ENCRYPTED_COLUMNS = {
+    "mood": ("emotion", "motivation", "notes"),
+    "notes": ("content",),
+}
+
+
+def encrypted_positions(table, columns) -> set:
+    """Positions des colonnes chiffrées dans une liste de colonnes lues"""
+    encrypted = ENCRYPTED_COLUMNS.get(table, ())
+    return {i for i, column in enumerate(columns) if column in encrypted}
+
+# Colonnes exportées par table (la colonne générée day n'en fait pas partie)____________________
+TABLE_COLUMNS = {
+    "mood": ("id", "mood_value", "emotion", "motivation", "tags", "notes", "created_at"),
+    "tasks": ("id", "title", "done", "created_at"),
+    "notes": ("id", "content", "created_at"),
+    "users": ("id", "prenom", "birth_date", "tags", "tdah", "created_at"),
+}
 
 
 def create_user_table(cursor):
@@ -66,8 +119,831 @@ def create_notes_table(cursor):
     """)
 
 
+def create_chat_cache_table(cursor):
+    """Crée la table chat_cache (réponses de l'IA réutilisables)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chat_cache (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL,
+            hits INTEGER DEFAULT 0
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_cache_last_used ON chat_cache(last_used)")
+
+
+#Migrations du schéma________________________________________________________________________
+# Chaque migration s'applique une seule fois ; la version courante est stockée dans
+# PRAGMA user_version. Pour faire évoluer le schéma, ajouter une fonction en fin de liste.
+
+def migration_day_columns(cursor):
+    """v1 : colonne day (AAAA-MM-JJ) indexée sur mood, tasks et notes"""
+    for table in ("mood", "tasks", "notes"):
+        # Colonne générée virtuelle : rien à remplir, elle suit toujours created_at____
+        cursor.execute(f"""
+            ALTER TABLE {table}
+            ADD COLUMN day TEXT GENERATED ALWAYS AS (substr(created_at, 1, 10)) VIRTUAL
+        """)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_day ON {table}(day)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_created_at ON {table}(created_at)")
+
+
+def migration_stats_tables(cursor):
+    """v2 : statistiques par jour et globales, tenues à jour par des triggers"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            day TEXT PRIMARY KEY,
+            mood_count INTEGER NOT NULL DEFAULT 0,
+            mood_sum INTEGER NOT NULL DEFAULT 0,
+            mood_min INTEGER,
+            mood_max INTEGER,
+            task_count INTEGER NOT NULL DEFAULT 0,
+            task_done INTEGER NOT NULL DEFAULT 0,
+            note_count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stats_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            mood_count INTEGER NOT NULL DEFAULT 0,
+            mood_sum INTEGER NOT NULL DEFAULT 0,
+            mood_min INTEGER,
+            mood_max INTEGER,
+            task_count INTEGER NOT NULL DEFAULT 0,
+            task_done INTEGER NOT NULL DEFAULT 0,
+            note_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    # Remplissage à partir des données existantes_______________________________________
+    cursor.execute("""
+        INSERT INTO daily_stats (day, mood_count, mood_sum, mood_min, mood_max, task_count, task_done, note_count)
+        SELECT day, SUM(mc), SUM(ms), MIN(mmin), MAX(mmax), SUM(tc), SUM(td), SUM(nc)
+        FROM (
+            SELECT day, COUNT(*) AS mc, SUM(mood_value) AS ms, MIN(mood_value) AS mmin, MAX(mood_value) AS mmax,
+                   0 AS tc, 0 AS td, 0 AS nc
+            FROM mood GROUP BY day
+            UNION ALL
+            SELECT day, 0, 0, NULL, NULL, COUNT(*), SUM(done), 0 FROM tasks GROUP BY day
+            UNION ALL
+            SELECT day, 0, 0, NULL, NULL, 0, 0, COUNT(*) FROM notes GROUP BY day
+        )
+        WHERE day IS NOT NULL
+        GROUP BY day
+    """)
+    cursor.execute("""
+        INSERT INTO stats_totals (id, mood_count, mood_sum, mood_min, mood_max, task_count, task_done, note_count)
+        SELECT 1, COALESCE(SUM(mood_count), 0), COALESCE(SUM(mood_sum), 0), MIN(mood_min), MAX(mood_max),
+               COALESCE(SUM(task_count), 0), COALESCE(SUM(task_done), 0), COALESCE(SUM(note_count), 0)
+        FROM daily_stats
+    """)
+
+    # Humeurs : compte et somme ajustés, min/max recalculés sur le jour (index day)______
+    recompute_mood_day = """
+        UPDATE daily_stats SET
+            mood_min = (SELECT MIN(mood_value) FROM mood WHERE day = {row}.day),
+            mood_max = (SELECT MAX(mood_value) FROM mood WHERE day = {row}.day)
+        WHERE day = {row}.day;
+    """
+    recompute_mood_totals = """
+        UPDATE stats_totals SET
+            mood_min = (SELECT MIN(mood_min) FROM daily_stats),
+            mood_max = (SELECT MAX(mood_max) FROM daily_stats);
+    """
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_mood_insert AFTER INSERT ON mood BEGIN
+            INSERT OR IGNORE INTO daily_stats (day) VALUES (NEW.day);
+            UPDATE daily_stats SET
+                mood_count = mood_count + 1,
+                mood_sum = mood_sum + NEW.mood_value,
+                mood_min = MIN(COALESCE(mood_min, NEW.mood_value), NEW.mood_value),
+                mood_max = MAX(COALESCE(mood_max, NEW.mood_value), NEW.mood_value)
+            WHERE day = NEW.day;
+            UPDATE stats_totals SET
+                mood_count = mood_count + 1,
+                mood_sum = mood_sum + NEW.mood_value,
+                mood_min = MIN(COALESCE(mood_min, NEW.mood_value), NEW.mood_value),
+                mood_max = MAX(COALESCE(mood_max, NEW.mood_value), NEW.mood_value);
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_mood_delete AFTER DELETE ON mood BEGIN
+            UPDATE daily_stats SET mood_count = mood_count - 1, mood_sum = mood_sum - OLD.mood_value
+            WHERE day = OLD.day;
+            {recompute_mood_day.format(row="OLD")}
+            UPDATE stats_totals SET mood_count = mood_count - 1, mood_sum = mood_sum - OLD.mood_value;
+            {recompute_mood_totals}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_mood_update AFTER UPDATE OF mood_value, created_at ON mood BEGIN
+            UPDATE daily_stats SET mood_count = mood_count - 1, mood_sum = mood_sum - OLD.mood_value
+            WHERE day = OLD.day;
+            INSERT OR IGNORE INTO daily_stats (day) VALUES (NEW.day);
+            UPDATE daily_stats SET mood_count = mood_count + 1, mood_sum = mood_sum + NEW.mood_value
+            WHERE day = NEW.day;
+            {recompute_mood_day.format(row="OLD")}
+            {recompute_mood_day.format(row="NEW")}
+            UPDATE stats_totals SET mood_sum = mood_sum - OLD.mood_value + NEW.mood_value;
+            {recompute_mood_totals}
+        END
+    """)
+
+    # Tâches et notes : simples compteurs_______________________________________________
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_insert AFTER INSERT ON tasks BEGIN
+            INSERT OR IGNORE INTO daily_stats (day) VALUES (NEW.day);
+            UPDATE daily_stats SET task_count = task_count + 1, task_done = task_done + NEW.done
+            WHERE day = NEW.day;
+            UPDATE stats_totals SET task_count = task_count + 1, task_done = task_done + NEW.done;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_delete AFTER DELETE ON tasks BEGIN
+            UPDATE daily_stats SET task_count = task_count - 1, task_done = task_done - OLD.done
+            WHERE day = OLD.day;
+            UPDATE stats_totals SET task_count = task_count - 1, task_done = task_done - OLD.done;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_update AFTER UPDATE OF done, created_at ON tasks BEGIN
+            UPDATE daily_stats SET task_count = task_count - 1, task_done = task_done - OLD.done
+            WHERE day = OLD.day;
+            INSERT OR IGNORE INTO daily_stats (day) VALUES (NEW.day);
+            UPDATE daily_stats SET task_count = task_count + 1, task_done = task_done + NEW.done
+            WHERE day = NEW.day;
+            UPDATE stats_totals SET task_done = task_done - OLD.done + NEW.done;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_notes_insert AFTER INSERT ON notes BEGIN
+            INSERT OR IGNORE INTO daily_stats (day) VALUES (NEW.day);
+            UPDATE daily_stats SET note_count = note_count + 1 WHERE day = NEW.day;
+            UPDATE stats_totals SET note_count = note_count + 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_notes_delete AFTER DELETE ON notes BEGIN
+            UPDATE daily_stats SET note_count = note_count - 1 WHERE day = OLD.day;
+            UPDATE stats_totals SET note_count = note_count - 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_notes_update AFTER UPDATE OF created_at ON notes BEGIN
+            UPDATE daily_stats SET note_count = note_count - 1 WHERE day = OLD.day;
+            INSERT OR IGNORE INTO daily_stats (day) VALUES (NEW.day);
+            UPDATE daily_stats SET note_count = note_count + 1 WHERE day = NEW.day;
+        END
+    """)
+
+
+def migration_data_version(cursor):
+    """v3 : compteur incrémenté à chaque écriture, pour invalider les caches de lecture"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)")
+    for table in ("users", "mood", "tasks", "notes"):
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version AFTER {event} ON {table} BEGIN
+                    UPDATE data_version SET version = version + 1 WHERE id = 1;
+                END
+            """)
+
+
+def migration_change_log(cursor):
+    """v4 : journal des lignes modifiées et points de reprise des exports incrémentaux"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS export_watermarks (
+            table_name TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL,
+            exported_at TEXT NOT NULL
+        )
+    """)
+    for table in ("mood", "tasks", "notes"):
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_log AFTER {event} ON {table} BEGIN
+                    INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', {row}.id, '{event.lower()}');
+                END
+            """)
+
+
+# Rowid des entrées du journal_fts : date en secondes dans les bits de poids fort, puis l'id
+# (JOURNAL_ID_BITS bits) et le type (0 = note, 1 = humeur). L'ordre des rowid est donc l'ordre
+# chronologique et une période correspond à un intervalle de rowid. Une date illisible est
+# remplacée par le début du jour (colonne day) ; sans jour non plus, l'entrée est refusée.
+JOURNAL_ID_BITS = 30
+JOURNAL_DATE_SHIFT = JOURNAL_ID_BITS + 1
+JOURNAL_EPOCH = "COALESCE(unixepoch({row}.created_at), unixepoch({row}.day))"
+JOURNAL_ROWID = f"(({JOURNAL_EPOCH} << {JOURNAL_DATE_SHIFT}) | ({{row}}.id << 1) | {{kind}})"
+JOURNAL_UNINDEXABLE = (
+    f"{JOURNAL_EPOCH} IS NULL OR {JOURNAL_EPOCH} >= (1 << {63 - JOURNAL_DATE_SHIFT}) "
+    f"OR {{row}}.id >= (1 << {JOURNAL_ID_BITS})"
+)
+
+
+def migration_search_index(cursor):
+    """v5 : index plein texte (FTS5) des notes et des humeurs, dans une seule table"""
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS journal_fts USING fts5(
+            content, emotion, motivation, created_at UNINDEXED, entry_id UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+
+    # Remplissage à partir des données existantes_______________________________________
+    cursor.execute(f"""
+        INSERT INTO journal_fts (rowid, content, emotion, motivation, created_at, entry_id)
+        SELECT {JOURNAL_ROWID.format(row="notes", kind=0)}, COALESCE(content, ''), '', '', created_at, id
+        FROM notes
+    """)
+    cursor.execute(f"""
+        INSERT INTO journal_fts (rowid, content, emotion, motivation, created_at, entry_id)
+        SELECT {JOURNAL_ROWID.format(row="mood", kind=1)}, COALESCE(notes, ''), COALESCE(emotion, ''),
+               COALESCE(motivation, ''), created_at, id
+        FROM mood
+    """)
+
+    # Synchronisation_________________________________________________________________
+    insert_note = f"""
+        INSERT INTO journal_fts (rowid, content, emotion, motivation, created_at, entry_id)
+        VALUES ({JOURNAL_ROWID.format(row="NEW", kind=0)}, COALESCE(NEW.content, ''), '', '', NEW.created_at, NEW.id);
+    """
+    insert_mood = f"""
+        INSERT INTO journal_fts (rowid, content, emotion, motivation, created_at, entry_id)
+        VALUES ({JOURNAL_ROWID.format(row="NEW", kind=1)}, COALESCE(NEW.notes, ''), COALESCE(NEW.emotion, ''),
+                COALESCE(NEW.motivation, ''), NEW.created_at, NEW.id);
+    """
+    for table, kind, insert, columns in (
+        ("notes", 0, insert_note, "content, created_at"),
+        ("mood", 1, insert_mood, "notes, emotion, motivation, created_at"),
+    ):
+        old_rowid = JOURNAL_ROWID.format(row="OLD", kind=kind)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_insert_fts AFTER INSERT ON {table} BEGIN
+                {insert}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_delete_fts AFTER DELETE ON {table} BEGIN
+                DELETE FROM journal_fts WHERE rowid = {old_rowid};
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_update_fts AFTER UPDATE OF {columns} ON {table} BEGIN
+                DELETE FROM journal_fts WHERE rowid = {old_rowid};
+                {insert}
+            END
+        """)
+
+
+def migration_encrypted_fields(cursor):
+    """
+    v6 : prise en charge des champs chiffrés (ENCRYPTED_COLUMNS).
+    L'index de recherche ne garde plus de copie du texte : il est alimenté avec le texte
+    déchiffré (fonction SQL decrypt_field, voir open_connection) et les extraits sont
+    construits à partir des lignes déchiffrées (services.search_service).
+    Chiffrer une ligne existante ne la fait pas passer pour modifiée.
+    """
+    for table in ("notes", "mood"):
+        for event in ("insert", "delete", "update"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{event}_fts")
+    cursor.execute("DROP TABLE IF EXISTS journal_fts")
+    cursor.execute("""
+        CREATE VIRTUAL TABLE journal_fts USING fts5(
+            content, emotion, motivation,
+            content = '',
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+
+    # Valeurs indexées : identiques à l'ajout et à la suppression (obligatoire sans contenu)___
+    values = {
+        "notes": "COALESCE(decrypt_field({row}.content), ''), '', ''",
+        "mood": "COALESCE(decrypt_field({row}.notes), ''), COALESCE(decrypt_field({row}.emotion), ''), "
+                "COALESCE(decrypt_field({row}.motivation), '')",
+    }
+    for table, kind in (("notes", 0), ("mood", 1)):
+        new_values, old_values = values[table].format(row="NEW"), values[table].format(row="OLD")
+        new_rowid = JOURNAL_ROWID.format(row="NEW", kind=kind)
+        old_rowid = JOURNAL_ROWID.format(row="OLD", kind=kind)
+        changed = " OR ".join(
+            f"decrypt_field(OLD.{column}) IS NOT decrypt_field(NEW.{column})" for column in ENCRYPTED_COLUMNS[table]
+        )
+
+        cursor.execute(f"""
+            INSERT INTO journal_fts (rowid, content, emotion, motivation)
+            SELECT {JOURNAL_ROWID.format(row=table, kind=kind)}, {values[table].format(row=table)}
+            FROM {table}
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER trg_{table}_insert_fts AFTER INSERT ON {table} BEGIN
+                INSERT INTO journal_fts (rowid, content, emotion, motivation) VALUES ({new_rowid}, {new_values});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER trg_{table}_delete_fts AFTER DELETE ON {table} BEGIN
+                INSERT INTO journal_fts (journal_fts, rowid, content, emotion, motivation)
+                VALUES ('delete', {old_rowid}, {old_values});
+            END
+        """)
+        # Chiffrer une ligne ne change pas le texte : l'index n'est pas touché_________________
+        cursor.execute(f"""
+            CREATE TRIGGER trg_{table}_update_fts AFTER UPDATE ON {table}
+            WHEN OLD.created_at IS NOT NEW.created_at OR {changed}
+            BEGIN
+                INSERT INTO journal_fts (journal_fts, rowid, content, emotion, motivation)
+                VALUES ('delete', {old_rowid}, {old_values});
+                INSERT INTO journal_fts (rowid, content, emotion, motivation) VALUES ({new_rowid}, {new_values});
+            END
+        """)
+
+        # Journal des changements (v4) : seulement si une valeur déchiffrée change____________
+        modified = " OR ".join(
+            f"decrypt_field(OLD.{column}) IS NOT decrypt_field(NEW.{column})" if column in ENCRYPTED_COLUMNS[table]
+            else f"OLD.{column} IS NOT NEW.{column}"
+            for column in TABLE_COLUMNS[table]
+        )
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_update_log")
+        cursor.execute(f"""
+            CREATE TRIGGER trg_{table}_update_log AFTER UPDATE ON {table} WHEN {modified} BEGIN
+                INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', NEW.id, 'update');
+            END
+        """)
+
+
+def migration_import_hashes(cursor):
+    """
+    v7 : empreintes des lignes importées (services.bulk_import), pour ne pas importer
+    deux fois la même entrée. L'empreinte est calculée sur les valeurs en clair.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS import_hashes (
+            hash BLOB PRIMARY KEY,
+            table_name TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+
+# Tables dont chaque ligne appartient à un profil (migration v8)______________________________
+USER_TABLES = ("mood", "tasks", "notes")
+
+
+def create_journal_index(cursor, detail="column"):
+    """
+    Index de recherche journal_fts (sans contenu : content = '') et ses triggers, rempli à
+    partir des notes et des humeurs déchiffrées. La colonne owner ('u<id>') limite la recherche
+    à un profil. detail = 'column' (v11) : l'index ne garde que les mots de chaque entrée et
+    leur colonne, sans leur position (pas de recherche de phrase exacte).
+    """
+    cursor.execute(f"""
+        CREATE VIRTUAL TABLE journal_fts USING fts5(
+            content, emotion, motivation, owner,
+            content = '',
+            detail = {detail},
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    values = {
+        "notes": "COALESCE(decrypt_field({row}.content), ''), '', '', 'u' || {row}.user_id",
+        "mood": "COALESCE(decrypt_field({row}.notes), ''), COALESCE(decrypt_field({row}.emotion), ''), "
+                "COALESCE(decrypt_field({row}.motivation), ''), 'u' || {row}.user_id",
+    }
+    columns = "content, emotion, motivation, owner"
+    for table, kind in (("notes", 0), ("mood", 1)):
+        new_values, old_values = values[table].format(row="NEW"), values[table].format(row="OLD")
+        new_rowid = JOURNAL_ROWID.format(row="NEW", kind=kind)
+        old_rowid = JOURNAL_ROWID.format(row="OLD", kind=kind)
+        changed = " OR ".join(
+            f"decrypt_field(OLD.{column}) IS NOT decrypt_field(NEW.{column})" for column in ENCRYPTED_COLUMNS[table]
+        )
+        cursor.execute(f"""
+            INSERT INTO journal_fts (rowid, {columns})
+            SELECT {JOURNAL_ROWID.format(row=table, kind=kind)}, {values[table].format(row=table)}
+            FROM {table}
+        """)
+        # Une entrée sans date utilisable (ou d'id trop grand) n'aurait pas de rowid : refusée___
+        reject = (f"SELECT RAISE(ABORT, 'journal_fts : date illisible ou id trop grand pour {table}') "
+                  f"WHERE {JOURNAL_UNINDEXABLE.format(row='NEW')};")
+        cursor.execute(f"""
+            CREATE TRIGGER trg_{table}_insert_fts AFTER INSERT ON {table} BEGIN
+                {reject}
+                INSERT INTO journal_fts (rowid, {columns}) VALUES ({new_rowid}, {new_values});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER trg_{table}_delete_fts AFTER DELETE ON {table} BEGIN
+                INSERT INTO journal_fts (journal_fts, rowid, {columns}) VALUES ('delete', {old_rowid}, {old_values});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER trg_{table}_update_fts AFTER UPDATE ON {table}
+            WHEN OLD.created_at IS NOT NEW.created_at OR OLD.user_id IS NOT NEW.user_id OR {changed}
+            BEGIN
+                {reject}
+                INSERT INTO journal_fts (journal_fts, rowid, {columns}) VALUES ('delete', {old_rowid}, {old_values});
+                INSERT INTO journal_fts (rowid, {columns}) VALUES ({new_rowid}, {new_values});
+            END
+        """)
+
+
+def migration_user_partitioning(cursor):
+    """
+    v8 : plusieurs profils dans une même base. mood, tasks et notes reçoivent une colonne
+    user_id (index (user_id, day) et (user_id, created_at)) ; statistiques, version des
+    données, journal des changements, points de reprise des exports, empreintes d'import
+    et index de recherche sont séparés par profil. Les lignes existantes vont au dernier profil créé (celui que
+    l'application affichait jusqu'ici).
+    """
+    # Propriétaire des données existantes_________________________________________________
+    has_rows = any(cursor.execute(f"SELECT EXISTS(SELECT 1 FROM {t})").fetchone()[0] for t in USER_TABLES)
+    if has_rows and cursor.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
+        cursor.execute("INSERT INTO users (prenom, tags) VALUES ('Moi', '')")
+    owner = cursor.execute("SELECT MAX(id) FROM users").fetchone()[0]
+
+    # Anciennes statistiques et anciens triggers (recréés par profil plus bas)________________
+    for table in USER_TABLES:
+        for event in ("insert", "delete", "update"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{event}")
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{event}_fts")
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{event}_log")
+    cursor.execute("DROP TABLE IF EXISTS daily_stats")
+    cursor.execute("DROP TABLE IF EXISTS stats_totals")
+    cursor.execute("DROP TABLE IF EXISTS journal_fts")
+
+    for table in USER_TABLES:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN user_id INTEGER REFERENCES users(id)")
+        cursor.execute(f"UPDATE {table} SET user_id = ?", (owner,))
+        cursor.execute(f"DROP INDEX IF EXISTS idx_{table}_day")
+        cursor.execute(f"DROP INDEX IF EXISTS idx_{table}_created_at")
+        cursor.execute(f"CREATE INDEX idx_{table}_user_day ON {table}(user_id, day)")
+        cursor.execute(f"CREATE INDEX idx_{table}_user_created_at ON {table}(user_id, created_at)")
+        # Une ligne sans profil serait visible de personne : refusée_____________________
+        for event in ("INSERT", "UPDATE OF user_id"):
+            cursor.execute(f"""
+                CREATE TRIGGER trg_{table}_{event.split()[0].lower()}_user BEFORE {event} ON {table}
+                WHEN NEW.user_id IS NULL BEGIN
+                    SELECT RAISE(ABORT, 'user_id obligatoire sur {table}');
+                END
+            """)
+
+    # Statistiques par profil et par jour_________________________________________________
+    stat_columns = """
+            mood_count INTEGER NOT NULL DEFAULT 0,
+            mood_sum INTEGER NOT NULL DEFAULT 0,
+            mood_min INTEGER,
+            mood_max INTEGER,
+            task_count INTEGER NOT NULL DEFAULT 0,
+            task_done INTEGER NOT NULL DEFAULT 0,
+            note_count INTEGER NOT NULL DEFAULT 0
+    """
+    cursor.execute(f"""
+        CREATE TABLE daily_stats (
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            {stat_columns},
+            PRIMARY KEY (user_id, day)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute(f"CREATE TABLE stats_totals (user_id INTEGER PRIMARY KEY, {stat_columns})")
+    cursor.execute("""
+        INSERT INTO daily_stats (user_id, day, mood_count, mood_sum, mood_min, mood_max, task_count, task_done, note_count)
+        SELECT user_id, day, SUM(mc), SUM(ms), MIN(mmin), MAX(mmax), SUM(tc), SUM(td), SUM(nc)
+        FROM (
+            SELECT user_id, day, COUNT(*) AS mc, SUM(mood_value) AS ms, MIN(mood_value) AS mmin,
+                   MAX(mood_value) AS mmax, 0 AS tc, 0 AS td, 0 AS nc
+            FROM mood GROUP BY user_id, day
+            UNION ALL
+            SELECT user_id, day, 0, 0, NULL, NULL, COUNT(*), SUM(done), 0 FROM tasks GROUP BY user_id, day
+            UNION ALL
+            SELECT user_id, day, 0, 0, NULL, NULL, 0, 0, COUNT(*) FROM notes GROUP BY user_id, day
+        )
+        WHERE day IS NOT NULL
+        GROUP BY user_id, day
+    """)
+    cursor.execute("""
+        INSERT INTO stats_totals (user_id, mood_count, mood_sum, mood_min, mood_max, task_count, task_done, note_count)
+        SELECT user_id, SUM(mood_count), SUM(mood_sum), MIN(mood_min), MAX(mood_max),
+               SUM(task_count), SUM(task_done), SUM(note_count)
+        FROM daily_stats GROUP BY user_id
+    """)
+
+    # Mêmes triggers qu'en v2, chaque mise à jour limitée au profil de la ligne______________
+    def add(row, sets, day=True):
+        where = f"user_id = {row}.user_id" + (f" AND day = {row}.day" if day else "")
+        target = "daily_stats" if day else "stats_totals"
+        create = (f"INSERT OR IGNORE INTO daily_stats (user_id, day) VALUES ({row}.user_id, {row}.day);" if day
+                  else f"INSERT OR IGNORE INTO stats_totals (user_id) VALUES ({row}.user_id);")
+        return f"{create}\n UPDATE {target} SET {sets} WHERE {where};"
+
+    def remove(row, sets, day=True):
+        where = f"user_id = {row}.user_id" + (f" AND day = {row}.day" if day else "")
+        return f"UPDATE {'daily_stats' if day else 'stats_totals'} SET {sets} WHERE {where};"
+
+    def recompute_mood(row):
+        return f"""
+            UPDATE daily_stats SET
+                mood_min = (SELECT MIN(mood_value) FROM mood WHERE user_id = {row}.user_id AND day = {row}.day),
+                mood_max = (SELECT MAX(mood_value) FROM mood WHERE user_id = {row}.user_id AND day = {row}.day)
+            WHERE user_id = {row}.user_id AND day = {row}.day;
+            UPDATE stats_totals SET
+                mood_min = (SELECT MIN(mood_min) FROM daily_stats WHERE user_id = {row}.user_id),
+                mood_max = (SELECT MAX(mood_max) FROM daily_stats WHERE user_id = {row}.user_id)
+            WHERE user_id = {row}.user_id;
+        """
+
+    mood_in = ("mood_count = mood_count + 1, mood_sum = mood_sum + NEW.mood_value, "
+               "mood_min = MIN(COALESCE(mood_min, NEW.mood_value), NEW.mood_value), "
+               "mood_max = MAX(COALESCE(mood_max, NEW.mood_value), NEW.mood_value)")
+    mood_out = "mood_count = mood_count - 1, mood_sum = mood_sum - OLD.mood_value"
+    task_in = "task_count = task_count + 1, task_done = task_done + NEW.done"
+    task_out = "task_count = task_count - 1, task_done = task_done - OLD.done"
+    note_in, note_out = "note_count = note_count + 1", "note_count = note_count - 1"
+
+    triggers = {
+        "mood": (add("NEW", mood_in) + add("NEW", mood_in, day=False),
+                 remove("OLD", mood_out) + remove("OLD", mood_out, day=False) + recompute_mood("OLD"),
+                 "mood_value, created_at, user_id"),
+        "tasks": (add("NEW", task_in) + add("NEW", task_in, day=False),
+                  remove("OLD", task_out) + remove("OLD", task_out, day=False),
+                  "done, created_at, user_id"),
+        "notes": (add("NEW", note_in) + add("NEW", note_in, day=False),
+                  remove("OLD", note_out) + remove("OLD", note_out, day=False),
+                  "created_at, user_id"),
+    }
+    for table, (insert, delete, watched) in triggers.items():
+        update = delete + insert + (recompute_mood("NEW") if table == "mood" else "")
+        cursor.execute(f"CREATE TRIGGER trg_{table}_insert AFTER INSERT ON {table} BEGIN {insert} END")
+        cursor.execute(f"CREATE TRIGGER trg_{table}_delete AFTER DELETE ON {table} BEGIN {delete} END")
+        cursor.execute(f"CREATE TRIGGER trg_{table}_update AFTER UPDATE OF {watched} ON {table} BEGIN {update} END")
+
+    # Index de recherche : colonne owner ('u<id>') pour ne chercher que dans un profil________
+    create_journal_index(cursor, detail="full")
+
+    # Version des données par profil : une écriture n'invalide que les caches de son profil___
+    cursor.execute("CREATE TABLE user_data_version (user_id INTEGER PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)")
+    bump = """
+        INSERT INTO user_data_version (user_id, version) VALUES ({row}.user_id, 1)
+        ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+    """
+    for table in USER_TABLES:
+        for event in ("insert", "update", "delete"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{event}_version")
+        cursor.execute(f"CREATE TRIGGER trg_{table}_insert_version AFTER INSERT ON {table} BEGIN {bump.format(row='NEW')} END")
+        cursor.execute(f"CREATE TRIGGER trg_{table}_delete_version AFTER DELETE ON {table} BEGIN {bump.format(row='OLD')} END")
+        cursor.execute(f"""
+            CREATE TRIGGER trg_{table}_update_version AFTER UPDATE ON {table} BEGIN
+                {bump.format(row='NEW')}
+                UPDATE user_data_version SET version = version + 1
+                WHERE user_id = OLD.user_id AND OLD.user_id IS NOT NEW.user_id;
+            END
+        """)
+
+    # Journal des changements et points de reprise par profil__________________________________
+    cursor.execute("ALTER TABLE change_log ADD COLUMN user_id INTEGER")
+    cursor.execute("UPDATE change_log SET user_id = ?", (owner,))
+    cursor.execute("CREATE INDEX idx_change_log_user ON change_log(user_id, table_name, seq)")
+    for table in USER_TABLES:
+        modified = " OR ".join(
+            f"decrypt_field(OLD.{column}) IS NOT decrypt_field(NEW.{column})" if column in ENCRYPTED_COLUMNS.get(table, ())
+            else f"OLD.{column} IS NOT NEW.{column}"
+            for column in TABLE_COLUMNS[table]
+        )
+        for event, row, when in (("INSERT", "NEW", ""), ("DELETE", "OLD", ""), ("UPDATE", "NEW", f"WHEN {modified}")):
+            cursor.execute(f"""
+                CREATE TRIGGER trg_{table}_{event.lower()}_log AFTER {event} ON {table} {when} BEGIN
+                    INSERT INTO change_log (table_name, row_id, op, user_id)
+                    VALUES ('{table}', {row}.id, '{event.lower()}', {row}.user_id);
+                END
+            """)
+
+    cursor.execute("ALTER TABLE export_watermarks RENAME TO export_watermarks_v7")
+    cursor.execute("""
+        CREATE TABLE export_watermarks (
+            user_id INTEGER NOT NULL,
+            table_name TEXT NOT NULL,
+            last_seq INTEGER NOT NULL,
+            exported_at TEXT NOT NULL,
+            PRIMARY KEY (user_id, table_name)
+        ) WITHOUT ROWID
+    """)
+    if owner is not None:
+        cursor.execute("""
+            INSERT INTO export_watermarks (user_id, table_name, last_seq, exported_at)
+            SELECT ?, table_name, last_seq, exported_at FROM export_watermarks_v7
+        """, (owner,))
+    cursor.execute("DROP TABLE export_watermarks_v7")
+
+    # Empreintes d'import : la même ligne peut être importée par deux profils_________________
+    cursor.execute("ALTER TABLE import_hashes RENAME TO import_hashes_v7")
+    cursor.execute("""
+        CREATE TABLE import_hashes (
+            user_id INTEGER NOT NULL,
+            hash BLOB NOT NULL,
+            table_name TEXT NOT NULL,
+            PRIMARY KEY (user_id, hash)
+        ) WITHOUT ROWID
+    """)
+    if owner is not None:
+        cursor.execute("""
+            INSERT INTO import_hashes (user_id, hash, table_name)
+            SELECT ?, hash, table_name FROM import_hashes_v7
+        """, (owner,))
+    cursor.execute("DROP TABLE import_hashes_v7")
+
+
+def migration_habits(cursor):
+    """
+    v9 : habitudes récurrentes. Une habitude décrit un rythme (tous les N jours, ou certains
+    jours de la semaine) ; ses occurrences sont des lignes de tasks (habit_id, une par jour au
+    plus), créées seulement quand le jour est affiché (voir services.habit_service).
+    Séries et nombre d'occurrences faites sont tenus à jour par toggle_task.
+    """
+    cursor.execute("""
+        CREATE TABLE habits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            title TEXT NOT NULL,
+            interval INTEGER NOT NULL DEFAULT 1 CHECK (interval >= 1),
+            weekdays INTEGER NOT NULL DEFAULT 127 CHECK (weekdays BETWEEN 1 AND 127),
+            start_day TEXT NOT NULL,
+            end_day TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            done_count INTEGER NOT NULL DEFAULT 0,
+            streak_start TEXT,
+            streak_end TEXT,
+            streak_len INTEGER NOT NULL DEFAULT 0,
+            older_best INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("CREATE INDEX idx_habits_user ON habits(user_id, end_day)")
+
+    cursor.execute("ALTER TABLE tasks ADD COLUMN habit_id INTEGER REFERENCES habits(id)")
+    cursor.execute("CREATE UNIQUE INDEX idx_tasks_habit_day ON tasks(habit_id, day) WHERE habit_id IS NOT NULL")
+
+    # Créer ou archiver une habitude change les tâches affichées : invalide le cache du profil_
+    bump = """
+        INSERT INTO user_data_version (user_id, version) VALUES ({row}.user_id, 1)
+        ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+    """
+    for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        cursor.execute(f"""
+            CREATE TRIGGER trg_habits_{event.lower()}_version AFTER {event} ON habits BEGIN
+                {bump.format(row=row)}
+            END
+        """)
+
+
+def migration_api_requests(cursor):
+    """
+    v10 : réponses des écritures de l'API envoyées avec un en-tête Idempotency-Key
+    (services.http_api). status NULL : requête en cours. Purgées après quelques heures.
+    """
+    cursor.execute("""
+        CREATE TABLE api_requests (
+            user_id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            fingerprint BLOB NOT NULL,
+            status INTEGER,
+            response TEXT,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, key)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX idx_api_requests_created_at ON api_requests(created_at)")
+
+
+def drop_journal_index(cursor):
+    """Supprime journal_fts et ses triggers ; les pages libérées sont mises à zéro"""
+    cursor.execute("PRAGMA secure_delete = ON")
+    for table in ("notes", "mood"):
+        for event in ("insert", "delete", "update"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{event}_fts")
+    cursor.execute("DROP TABLE IF EXISTS journal_fts")
+
+
+def migration_search_detail(cursor):
+    """
+    v11 : l'index de recherche ne garde plus la position des mots (detail = column, voir
+    create_journal_index). Les pages libérées par l'ancien index sont mises à zéro
+    (secure_delete), sinon elles garderaient les mots et leur ordre dans le fichier.
+    """
+    drop_journal_index(cursor)
+    create_journal_index(cursor)
+
+
+def migration_search_rowid(cursor):
+    """
+    v12 : rowid de l'index de recherche avec l'id complet (il n'en gardait que 20 bits : deux
+    entrées créées la même seconde pouvaient avoir le même rowid) et sans date 0 pour une date
+    illisible (voir JOURNAL_ROWID). Une entrée qu'on ne peut pas indexer arrête la migration.
+    """
+    for table in ("notes", "mood"):
+        ids = [row[0] for row in cursor.execute(
+            f"SELECT id FROM {table} WHERE {JOURNAL_UNINDEXABLE.format(row=table)} LIMIT 10"
+        )]
+        if ids:
+            raise ValueError(f"{table} : created_at illisible ou id trop grand (id {', '.join(map(str, ids))})")
+    drop_journal_index(cursor)
+    create_journal_index(cursor)
+
+
+def migration_change_log_exporters(cursor):
+    """
+    v13 : le journal des changements ne note plus que les écritures des profils qui utilisent
+    l'export incrémental (une ligne dans export_watermarks pour la table). Pour les autres, le
+    premier export contiendra tout : leurs lignes du journal ne servaient à rien et sont purgées.
+    """
+    cursor.execute("""
+        DELETE FROM change_log WHERE NOT EXISTS (
+            SELECT 1 FROM export_watermarks w WHERE w.user_id = change_log.user_id AND w.table_name = change_log.table_name
+        )
+    """)
+    for table in USER_TABLES:
+        modified = " OR ".join(
+            f"decrypt_field(OLD.{column}) IS NOT decrypt_field(NEW.{column})" if column in ENCRYPTED_COLUMNS.get(table, ())
+            else f"OLD.{column} IS NOT NEW.{column}"
+            for column in TABLE_COLUMNS[table]
+        )
+        for event, row, when in (("INSERT", "NEW", ""), ("DELETE", "OLD", ""), ("UPDATE", "NEW", f"({modified}) AND")):
+            exported = f"EXISTS (SELECT 1 FROM export_watermarks WHERE user_id = {row}.user_id AND table_name = '{table}')"
+            cursor.execute(f"DROP TRIGGER trg_{table}_{event.lower()}_log")
+            cursor.execute(f"""
+                CREATE TRIGGER trg_{table}_{event.lower()}_log AFTER {event} ON {table} WHEN {when} {exported} BEGIN
+                    INSERT INTO change_log (table_name, row_id, op, user_id)
+                    VALUES ('{table}', {row}.id, '{event.lower()}', {row}.user_id);
+                END
+            """)
+
+
+MIGRATIONS = [
+    migration_day_columns,
+    migration_stats_tables,
+    migration_data_version,
+    migration_change_log,
+    migration_search_index,
+    migration_encrypted_fields,
+    migration_import_hashes,
+    migration_user_partitioning,
+    migration_habits,
+    migration_api_requests,
+    migration_search_detail,
+    migration_search_rowid,
+    migration_change_log_exporters,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(conn):
+    """
+    Applique les migrations manquantes, chacune dans une seule transaction d'écriture.
+    sqlite3 valide seul les CREATE/ALTER/DROP hors transaction explicite : la connexion passe
+    en autocommit le temps des migrations et chaque étape fait BEGIN IMMEDIATE (verrou
+    d'écriture pris, les autres processus attendent busy_timeout), relit user_version (un
+    autre processus a pu migrer entre-temps), migre, écrit la version puis COMMIT.
+    Une migration qui échoue est annulée en entier, schéma et version compris.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    if conn.in_transaction:
+        conn.commit()
+    isolation_level, conn.isolation_level = conn.isolation_level, None
+    try:
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] < number:
+                    migration(conn.cursor())
+                    conn.execute(f"PRAGMA user_version = {number}")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+    finally:
+        conn.isolation_level = isolation_level
+
+
 def save_profile_to_db(prenom, birth_date, tags):
-    """Sauvegarde le profil utilisateur"""
+    """Sauvegarde un nouveau profil utilisateur ; renvoie son identifiant"""
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("""
@@ -75,16 +951,21 @@ def save_profile_to_db(prenom, birth_date, tags):
         VALUES (?, ?, ?)
     """, (prenom, birth_date, ",".join(tags)))
     conn.commit()
-    conn.close()
+    return cursor.lastrowid
+
+
+def list_profiles():
+    """Profils existants [(id, prenom)], du plus ancien au plus récent"""
+    conn = get_connection()
+    return conn.execute("SELECT id, prenom FROM users ORDER BY id").fetchall()
 
 
-def load_profile_from_db():
-    """Charge le dernier profil créé"""
+def load_profile_from_db(user_id):
+    """Charge le profil donné"""
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT prenom, birth_date, tags FROM users ORDER BY id DESC LIMIT 1")
+    cursor.execute("SELECT prenom, birth_date, tags FROM users WHERE id = ?", (user_id,))
     row = cursor.fetchone()
-    conn.close()
     if row:
         prenom, birth_date, tags = row
         return {
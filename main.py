@@ -1,9 +1,16 @@
 import streamlit as st
-from pathlib import Path
-from db.models import init_db, load_profile_from_db
-from db.database import get_connection
+from db.models import init_db, load_profile_from_db, list_profiles
+from db.database import set_current_user
+from db.encryption import start_background_encryption
+from db.backup import start_backup_scheduler
 from services.mood_service import check_mood_logged_today
+from services.chat_ai import start_warm_up, ollama_state
+from utils.profiling import begin_rerun, end_rerun
+from services.profiling_service import render_profiling_panel
+from ui.components import apply_theme
 from ui.layout import (
+    render_profile_picker,
+    select_profile,
     render_profile_page,
     render_intro_page,
     render_home_page,
@@ -20,100 +27,156 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# ________________________________________
-# Initialisation de la base de données
-# ________________________________________
-# Créer le dossier data s'il n'existe pas
-Path("data").mkdir(exist_ok=True)
+# Mesure du rerun (seulement avec HELPDESK_PROFILE=1, voir utils/profiling.py)__________________
+begin_rerun()
 
-# Initialiser les tables____________________
-init_db()
+try:
+    # ________________________________________
+    # Initialisation de la base de données
+    # ________________________________________
+    # Tables et migrations une fois par processus (le dossier data est créé avec la base)_____
+    init_db()
 
-# Connexion à la base______________________
-if "conn" not in st.session_state:
-    st.session_state.conn = get_connection()
+    # Chiffre par petits lots les anciennes entrées encore en clair (une fois par processus)_______
+    start_background_encryption()
 
-# ________________________________________
-# Initialisation du session_state
-# _______________________________________
-defaults = {
-    "profile_created": False,
-    "profile": None,
-    "intro_done": False,
-    "mood_logged_today": False,
-    "selected_day": None
-}
-
-for key, value in defaults.items():
-    if key not in st.session_state:
-        st.session_state[key] = value
+    # Sauvegarde automatique quotidienne (thread de fond, une fois par processus)___________________
+    start_backup_scheduler()
 
-# _______________________________________
-# Charger le profil existant depuis la DB
-# _______________________________________
-if not st.session_state.profile_created:
-    profile = load_profile_from_db()
-    if profile:
-        st.session_state.profile = profile
-        st.session_state.profile_created = True
-        st.session_state.intro_done = True  # Si le profil existe, intro est déjà passée__________________
-
-# _____________________________________________________
-# Vérifier si l'humeur a été enregistrée aujourd'hui
-# _____________________________________________________
-if st.session_state.profile_created and not st.session_state.mood_logged_today:
-    if check_mood_logged_today():
-        st.session_state.mood_logged_today = True
+    # ________________________________________
+    # Préchargement du modèle IA (une fois par processus, en arrière-plan)
+    # ________________________________________
+    start_warm_up()
 
-# _______________________________________
-# Chargement du thème CSS (optionnel)
-# ________________________________________
-css_file = Path("assets/theme.css")
-if css_file.exists():
-    with open(css_file) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+    # ________________________________________
+    # Initialisation du session_state
+    # _______________________________________
+    defaults = {
+        "user_id": None,
+        "new_profile": False,
+        "pick_profile": False,
+        "profile_created": False,
+        "profile": None,
+        "intro_done": False,
+        "mood_logged_today": False,
+        "selected_day": None
+    }
 
-# ________________________________________
-# Sidebar avec navigation et infos
-# _______________________________________
-with st.sidebar:
-    st.title("💙 Help-Desk")
-    st.markdown("---")
-    
-    if st.session_state.profile_created and st.session_state.profile:
-        st.markdown(f"**Connecté en tant que :**  \n{st.session_state.profile['prenom']}")
-        
-        if st.session_state.profile.get('tags'):
-            st.markdown("**Tags :**")
-            for tag in st.session_state.profile['tags']:
-                st.markdown(f"- {tag}")
-        
+    for key, value in defaults.items():
+        if key not in st.session_state:
+            st.session_state[key] = value
+
+    # _______________________________________
+    # Profil actif de la session
+    # _______________________________________
+    # Toutes les lectures et écritures des services portent sur ce profil (voir db.database)___
+    profiles = list_profiles() if st.session_state.user_id is None else None
+    if st.session_state.user_id is None and not (st.session_state.new_profile or st.session_state.pick_profile):
+        known = {str(user_id) for user_id, _ in profiles}
+        requested = st.query_params.get("profil")
+        if requested in known:
+            select_profile(int(requested))
+        elif len(profiles) == 1:
+            select_profile(profiles[0][0])  # un seul profil : pas de choix à faire______________
+    set_current_user(st.session_state.user_id)
+
+    # _______________________________________
+    # Charger le profil existant depuis la DB
+    # _______________________________________
+    if st.session_state.user_id is not None and not st.session_state.profile_created:
+        profile = load_profile_from_db(st.session_state.user_id)
+        if profile:
+            st.session_state.profile = profile
+            st.session_state.profile_created = True
+            st.session_state.intro_done = True  # Si le profil existe, intro est déjà passée__________________
+
+    # _____________________________________________________
+    # Vérifier si l'humeur a été enregistrée aujourd'hui
+    # _____________________________________________________
+    if st.session_state.profile_created and not st.session_state.mood_logged_today:
+        if check_mood_logged_today():
+            st.session_state.mood_logged_today = True
+
+    # _______________________________________
+    # Chargement du thème CSS (optionnel, lu une fois par processus)
+    # ________________________________________
+    apply_theme()
+
+    # ________________________________________
+    # Sidebar avec navigation et infos
+    # _______________________________________
+    with st.sidebar:
+        st.title("💙 Help-Desk")
         st.markdown("---")
-        
-        # Bouton pour recommencer le parcours____________________________
-        if st.button("🔄 Recommencer"):
-            st.session_state.mood_logged_today = False
-            st.rerun()
-    
-    st.markdown("---")
-    st.caption("💡 Ton compagnon du quotidien")
-    st.caption("🔒 Tes données sont stockées localement et protégées")
 
-# ________________________________________
-# Navigation principale
-# _______________________________________
-if not st.session_state.profile_created or not st.session_state.profile:
-    # Étape 1 : Création du profil___________________________________
-    render_profile_page()
+        if st.session_state.profile_created and st.session_state.profile:
+            st.markdown(f"**Connecté en tant que :**  \n{st.session_state.profile['prenom']}")
+
+            if st.session_state.profile.get('tags'):
+                st.markdown("**Tags :**")
+                for tag in st.session_state.profile['tags']:
+                    st.markdown(f"- {tag}")
+
+            st.markdown("---")
 
-elif not st.session_state.intro_done:
-    # Étape 2 : Introduction________________________________________
-    render_intro_page()
+            # Bouton pour recommencer le parcours____________________________
+            if st.button("🔄 Recommencer"):
+                st.session_state.mood_logged_today = False
+                st.rerun()
+
+            # Changer de profil (plusieurs personnes sur la même base)_________________________
+            if st.button("👥 Changer de profil"):
+                for key, value in defaults.items():
+                    st.session_state[key] = value
+                st.session_state.pick_profile = True
+                st.query_params.pop("profil", None)
+                st.rerun()
+
+        # État du chat IA (vérifié au plus une fois par minute)__________________________
+        ai_state = ollama_state()
+        if ai_state == "warm":
+            st.caption("🟢 Mathi est prête à discuter")
+        elif ai_state == "warming":
+            st.caption("🟡 Mathi se réveille...")
+        elif ai_state == "cold":
+            st.caption("⚪ Mathi est en veille (1re réponse plus lente)")
+        else:
+            st.caption("🔴 Chat IA indisponible (Ollama non lancé)")
+
+        st.markdown("---")
+        st.caption("💡 Ton compagnon du quotidien")
+        st.caption("🔒 Tes données sont stockées localement et protégées")
 
-elif not st.session_state.mood_logged_today:
-    # Étape 3 : Humeur du jour________________________________________
-    render_home_page()
+    # ________________________________________
+    # Navigation principale
+    # _______________________________________
+    if st.session_state.user_id is None and profiles and not st.session_state.new_profile:
+        # Étape 0 : Choix du profil______________________________________
+        render_profile_picker(profiles)
 
-else:
-    # Étape 4 : Dashboard principal___________________________________
-    render_dashboard()
\ No newline at end of file
+    elif not st.session_state.profile_created or not st.session_state.profile:
+        # Étape 1 : Création du profil___________________________________
+        render_profile_page()
+
+    elif not st.session_state.intro_done:
+        # Étape 2 : Introduction________________________________________
+        render_intro_page()
+
+    elif not st.session_state.mood_logged_today:
+        # Étape 3 : Humeur du jour________________________________________
+        render_home_page()
+
+    else:
+        # Étape 4 : Dashboard principal___________________________________
+        render_dashboard()
+
+except BaseException as e:
+    # st.rerun(), st.stop() (exceptions de contrôle de Streamlit) ou erreur : le rerun est clos quand même,
+    # sinon il resterait ouvert et les fragments relancés seuls ne seraient plus mesurés_____________
+    end_rerun(interrupted=type(e).__name__)
+    raise
+
+# ________________________________________
+# Profilage du rerun (HELPDESK_PROFILE=1)
+# ________________________________________
+render_profiling_panel(end_rerun())
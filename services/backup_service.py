@@ -0,0 +1,49 @@
+import streamlit as st
+from datetime import datetime
+from db.backup import start_backup, get_status, list_backups, KEEP
+from utils.profiling import profiled
+
+POLL_INTERVAL = 0.5  # secondes entre deux lectures de l'avancement
+
+
+@profiled
+def render_backup_section():
+    """Sauvegardes restaurables de la base (voir db/backup.py)"""
+    st.header("💾 Sauvegardes")
+    st.markdown(f"""
+    Une copie complète de ta base est faite automatiquement chaque jour, compressée et chiffrée.
+    Les {KEEP} dernières sont gardées dans `data/backups/`.
+    """)
+
+    if st.button("💾 Sauvegarder maintenant", disabled=get_status()["state"] == "running"):
+        start_backup()
+
+    if get_status()["state"] == "running":
+        st.fragment(render_backup_progress, run_every=POLL_INTERVAL)()
+    else:
+        render_backup_progress()
+
+    backups = list_backups()
+    if backups:
+        for path in backups:
+            saved = datetime.fromtimestamp(path.stat().st_mtime)
+            st.caption(f"🗂️ {saved:%d/%m/%Y %H:%M} · {path.name} · {path.stat().st_size / 1024:.0f} Ko")
+        st.caption("Pour revenir à une sauvegarde : `python -m db.backup --restore data/backups/<fichier>`")
+    else:
+        st.info("Pas encore de sauvegarde")
+
+
+@profiled
+def render_backup_progress():
+    """Avancement de la sauvegarde en cours (relu périodiquement)"""
+    status = get_status()
+    if status["state"] == "running":
+        st.progress(status["progress"], text=f"Sauvegarde en cours : {status['step']}...")
+    elif status["state"] == "error":
+        st.error(f"❌ Échec de la sauvegarde : {status['error']}")
+    elif status["state"] == "done":
+        st.success("✅ Sauvegarde terminée et vérifiée")
+        # Fin de la sauvegarde : on rafraîchit la liste une fois__________________________
+        if st.session_state.get("backup_shown") != status["last"]:
+            st.session_state.backup_shown = status["last"]
+            st.rerun()
@@ -0,0 +1,384 @@
+"""
+Import en masse depuis un autre journal ou suivi d'humeur (CSV, Excel, JSON).
+
+Le fichier est lu ligne par ligne, les colonnes sont associées à celles de mood, tasks ou
+notes (IMPORT_FIELDS), puis les lignes sont insérées par lots de BATCH_SIZE avec executemany,
+un lot par transaction. Les triggers existants tiennent à jour l'index de recherche, les
+statistiques et le journal des changements.
+
+Les lignes sont rattachées au profil actif. Chaque ligne importée laisse une empreinte par
+profil (table import_hashes, migrations v7 et v8) : relancer le même import, ou un fichier
+qui recoupe le précédent, n'ajoute pas de doublons.
+
+Lancement :
+    python -m services.bulk_import FICHIER --table mood --user 1
+    python -m services.bulk_import daylio.csv --user 1 --table mood --map created_at=full_date --map mood_value=mood --scale 5
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import math
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+from dateutil import parser as date_parser
+from db.database import get_connection, current_user_id, set_current_user
+from db.models import init_db, encrypted_positions
+from utils.security import encrypt_rows
+
+BATCH_SIZE = 5000  # lignes par transaction
+MOOD_MAX = 10  # échelle de mood_value dans l'application
+
+# Colonnes remplies par l'import, par table (created_at est facultatif : maintenant par défaut)_
+IMPORT_FIELDS = {
+    "mood": ("mood_value", "emotion", "motivation", "tags", "notes", "created_at"),
+    "tasks": ("title", "done", "created_at"),
+    "notes": ("content", "created_at"),
+}
+REQUIRED_FIELDS = {"mood": "mood_value", "tasks": "title", "notes": "content"}
+
+# Noms de colonnes reconnus automatiquement (en minuscules)___________________________________
+ALIASES = {
+    "created_at": ("created_at", "date", "full_date", "datetime", "timestamp", "jour", "day"),
+    "mood_value": ("mood_value", "mood", "humeur", "rating", "score", "note_humeur"),
+    "emotion": ("emotion", "émotion", "feeling", "feelings", "ressenti"),
+    "motivation": ("motivation", "energy", "énergie", "energie"),
+    "tags": ("tags", "activities", "activités", "activites", "labels"),
+    "notes": ("notes", "note", "note_title", "comment", "commentaire", "journal"),
+    "title": ("title", "titre", "task", "tâche", "tache", "name", "nom", "habit"),
+    "done": ("done", "fait", "completed", "complete", "status", "statut", "checked"),
+    "content": ("content", "contenu", "text", "texte", "note", "notes", "body", "entry"),
+}
+TRUE_VALUES = {"1", "true", "vrai", "oui", "yes", "y", "x", "done", "fait", "completed", "✅", "✓"}
+
+# Formats de date essayés avant dateutil (lent) ; le dernier reconnu est essayé en premier_____
+DATE_FORMATS = (
+    "%d/%m/%Y %H:%M", "%d/%m/%Y %H:%M:%S", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y",
+    "%Y/%m/%d %H:%M", "%Y/%m/%d", "%d/%m/%y", "%B %d, %Y", "%d %B %Y",
+)
+
+SOURCE_TYPES = {".csv": "csv", ".tsv": "csv", ".txt": "csv", ".xlsx": "excel", ".json": "json", ".jsonl": "jsonl"}
+
+
+#Lecture des fichiers_______________________________________________________________________
+def _open_text(source):
+    """Flux texte sur un chemin ou un fichier binaire (upload Streamlit)"""
+    if isinstance(source, (str, Path)):
+        return open(source, encoding="utf-8-sig", newline="")
+    source.seek(0)
+    return io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+
+
+def _read_csv(source):
+    stream = _open_text(source)
+    sample = stream.read(8192)
+    stream.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(stream, dialect)
+    try:
+        headers = [h.strip() for h in next(reader, [])]
+        yield headers
+        for row in reader:
+            if any(row):
+                yield dict(zip(headers, row))
+    finally:
+        if isinstance(source, (str, Path)):
+            stream.close()
+        else:
+            stream.detach()  # ne ferme pas le fichier d'origine
+
+
+def _read_excel(source):
+    from openpyxl import load_workbook
+
+    if not isinstance(source, (str, Path)):
+        source.seek(0)
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = [str(h).strip() if h is not None else "" for h in next(rows, ())]
+        yield headers
+        for row in rows:
+            if any(v is not None for v in row):
+                yield dict(zip(headers, row))
+    finally:
+        workbook.close()
+
+
+def _read_jsonl(source):
+    stream = _open_text(source)
+    try:
+        first = None
+        for line in stream:
+            if line.strip():
+                record = json.loads(line)
+                if first is None:
+                    first = record
+                    yield list(record)
+                yield record
+    finally:
+        if isinstance(source, (str, Path)):
+            stream.close()
+        else:
+            stream.detach()
+
+
+def _read_json(source):
+    """Tableau d'objets, ou objet dont une clé contient ce tableau (chargé en entier)"""
+    stream = _open_text(source)
+    try:
+        data = json.load(stream)
+    finally:
+        if isinstance(source, (str, Path)):
+            stream.close()
+        else:
+            stream.detach()
+    if isinstance(data, dict):
+        data = next((v for v in data.values() if isinstance(v, list)), [])
+    records = [r for r in data if isinstance(r, dict)]
+    yield list(records[0]) if records else []
+    yield from records
+
+
+READERS = {"csv": _read_csv, "excel": _read_excel, "json": _read_json, "jsonl": _read_jsonl}
+
+
+def read_records(source, name=None):
+    """
+    (en-têtes, itérateur de dictionnaires colonne -> valeur) pour un fichier source.
+    source : chemin ou fichier binaire ; name sert à deviner le format (extension).
+    """
+    suffix = Path(name or str(source)).suffix.lower()
+    if suffix not in SOURCE_TYPES:
+        raise ValueError(f"Format non pris en charge : {suffix or name} (CSV, Excel .xlsx, JSON ou JSONL)")
+    records = READERS[SOURCE_TYPES[suffix]](source)
+    headers = next(records, [])
+    return headers, records
+
+
+def guess_mapping(headers, table) -> dict:
+    """Association colonne de l'application -> colonne du fichier, d'après les noms connus"""
+    lowered = {str(h).strip().lower(): h for h in headers}
+    mapping = {}
+    for field in IMPORT_FIELDS[table]:
+        source = next((lowered[a] for a in ALIASES.get(field, (field,)) if a in lowered), None)
+        if source is not None and source not in mapping.values():
+            mapping[field] = source
+    return mapping
+
+
+#Conversion des valeurs______________________________________________________________________
+def _parse_text_date(text, formats):
+    """Date écrite en texte ; formats : liste réordonnée pour garder en tête le format reconnu"""
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    for i, fmt in enumerate(formats):
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if i:
+            formats.insert(0, formats.pop(i))
+        return parsed
+    try:
+        return date_parser.parse(text, dayfirst=True)
+    except (ValueError, OverflowError):
+        return None
+
+
+def _parse_datetime(value, day_only, formats):
+    """Date du fichier -> texte au format de created_at ; None si illisible"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, date):
+        parsed = datetime(value.year, value.month, value.day)
+    elif isinstance(value, (int, float)):
+        try:
+            parsed = datetime.fromtimestamp(value / 1000 if value > 1e11 else value, timezone.utc)  # secondes ou ms
+        except (ValueError, OverflowError, OSError):  # NaN, infini, hors des dates représentables
+            return None
+    else:
+        parsed = _parse_text_date(str(value).strip(), formats)
+        if parsed is None:
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)  # created_at est en UTC (CURRENT_TIMESTAMP)
+    return parsed.strftime("%Y-%m-%d" if day_only else "%Y-%m-%d %H:%M:%S")
+
+
+def _parse_mood(value, scale):
+    """Note d'humeur ramenée sur l'échelle de l'application (1 à MOOD_MAX) ; None si illisible"""
+    try:
+        mood = float(str(value).replace(",", ".").strip())
+    except ValueError:
+        return None
+    if not math.isfinite(mood):  # "nan", "inf" : float() les accepte
+        return None
+    return min(MOOD_MAX, max(1, round(mood * MOOD_MAX / scale)))
+
+
+def _text(value):
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        value = ", ".join(str(v) for v in value)
+    text = str(value).strip()
+    return text or None
+
+
+def normalize_record(record, table, mapping, scale=MOOD_MAX, now=None, formats=None):
+    """Valeurs à insérer (dans l'ordre de IMPORT_FIELDS) ; None si la ligne est inutilisable"""
+    now = now or datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    formats = list(DATE_FORMATS) if formats is None else formats
+    values = []
+    for field in IMPORT_FIELDS[table]:
+        raw = record.get(mapping[field]) if field in mapping else None
+        if field == "created_at":
+            value = _parse_datetime(raw, table == "tasks", formats)
+            if value is None:
+                if raw not in (None, ""):
+                    return None
+                value = now[:10] if table == "tasks" else now
+        elif field == "mood_value":
+            value = _parse_mood(raw, scale) if raw not in (None, "") else None
+        elif field == "done":
+            value = int(str(raw).strip().lower() in TRUE_VALUES) if raw is not None else 0
+        else:
+            value = _text(raw)
+        values.append(value)
+
+    if values[IMPORT_FIELDS[table].index(REQUIRED_FIELDS[table])] is None:
+        return None
+    return tuple(values)
+
+
+def row_hash(table, values) -> bytes:
+    """Empreinte d'une ligne en clair (le chiffrement donne un texte différent à chaque fois)"""
+    return hashlib.sha256(repr((table, *values)).encode()).digest()[:16]
+
+
+#Insertion par lots__________________________________________________________________________
+def _insert_batch(conn, user_id, table, batch, positions, dedupe=True):
+    """
+    Insère les lignes du lot absentes des empreintes du profil ; renvoie le nombre insérées.
+    dedupe=False : toutes les lignes, sans empreintes (les empreintes du lot sont None).
+    """
+    columns = ("user_id",) + IMPORT_FIELDS[table]
+    insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    if not dedupe:
+        with conn:
+            conn.executemany(insert, ((user_id, *row) for row in encrypt_rows([v for _, v in batch], positions)))
+        return len(batch)
+
+    unique = dict(batch)  # doublons dans le lot lui-même
+    hashes = list(unique)
+    existing = {
+        row[0] for row in conn.execute(
+            f"SELECT hash FROM import_hashes WHERE user_id = ? AND hash IN ({','.join('?' * len(hashes))})",
+            (user_id, *hashes)
+        )
+    }
+    new = [h for h in hashes if h not in existing]
+    if not new:
+        return 0
+    encrypted = dict(zip(new, encrypt_rows([unique[h] for h in new], positions)))
+
+    # La lecture ci-dessus évite de chiffrer les doublons connus, mais un import lancé en même
+    # temps a pu ajouter les mêmes lignes depuis : les empreintes sont réservées dans la
+    # transaction d'écriture et seules les lignes réservées par ce lot sont insérées____________
+    with conn:
+        claimed = {
+            row[0] for row in conn.execute(
+                f"INSERT OR IGNORE INTO import_hashes (user_id, hash, table_name) "
+                f"SELECT ?, column1, ? FROM (VALUES {', '.join(['(?)'] * len(new))}) RETURNING hash",
+                (user_id, table, *new)
+            )
+        }
+        conn.executemany(insert, ((user_id, *encrypted[h]) for h in new if h in claimed))
+    return len(claimed)
+
+
+def import_records(records, table, mapping, scale=MOOD_MAX, batch_size=BATCH_SIZE, progress=None, dedupe=True):
+    """
+    Importe des dictionnaires (voir read_records) dans une table, pour le profil actif.
+    mapping : colonne de l'application -> colonne du fichier ; scale : note max de l'ancien suivi.
+    progress(lues, insérées) est appelé après chaque lot.
+    dedupe=False : insère toutes les lignes, même identiques à une ligne déjà importée (écritures
+    de l'API : deux humeurs identiques le même jour sont légitimes, voir Idempotency-Key).
+    Renvoie un rapport : lues, insérées, doublons, rejetées, secondes, lignes/s.
+    """
+    if table not in IMPORT_FIELDS:
+        raise ValueError(f"Table non importable : {table}")
+    if REQUIRED_FIELDS[table] not in mapping:
+        raise ValueError(f"Colonne obligatoire non associée : {REQUIRED_FIELDS[table]}")
+
+    conn = get_connection()
+    user_id = current_user_id()
+    positions = encrypted_positions(table, IMPORT_FIELDS[table])
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    formats = list(DATE_FORMATS)
+    report = {"table": table, "read": 0, "inserted": 0, "duplicates": 0, "rejected": 0}
+    start = time.perf_counter()
+
+    batch = []
+    for record in records:
+        report["read"] += 1
+        values = normalize_record(record, table, mapping, scale, now, formats)
+        if values is None:
+            report["rejected"] += 1
+            continue
+        batch.append((row_hash(table, values) if dedupe else None, values))
+        if len(batch) >= batch_size:
+            report["inserted"] += _insert_batch(conn, user_id, table, batch, positions, dedupe)
+            batch = []
+            if progress:
+                progress(report["read"], report["inserted"])
+    if batch:
+        report["inserted"] += _insert_batch(conn, user_id, table, batch, positions, dedupe)
+
+    report["duplicates"] = report["read"] - report["rejected"] - report["inserted"]
+    report["seconds"] = time.perf_counter() - start
+    report["rows_per_second"] = report["read"] / report["seconds"] if report["seconds"] else 0.0
+    return report
+
+
+def import_file(source, table, mapping=None, name=None, **options):
+    """Lit un fichier et l'importe ; sans mapping, les colonnes sont devinées (guess_mapping)"""
+    headers, records = read_records(source, name)
+    return import_records(records, table, mapping or guess_mapping(headers, table), **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import en masse dans Help-Desk")
+    parser.add_argument("file", help="fichier CSV, Excel (.xlsx), JSON ou JSONL")
+    parser.add_argument("--table", choices=list(IMPORT_FIELDS), required=True)
+    parser.add_argument("--user", type=int, required=True, help="identifiant du profil qui reçoit les lignes")
+    parser.add_argument("--map", action="append", default=[], metavar="CHAMP=COLONNE",
+                        help="association explicite, ex: created_at=Date (sinon devinée)")
+    parser.add_argument("--scale", type=float, default=MOOD_MAX, help="note max de l'ancien suivi d'humeur")
+    args = parser.parse_args()
+
+    init_db()
+    set_current_user(args.user)
+    headers, records = read_records(args.file)
+    mapping = guess_mapping(headers, args.table)
+    mapping.update(item.split("=", 1) for item in args.map)
+    print(f"Colonnes : {mapping}")
+
+    report = import_records(records, args.table, mapping, scale=args.scale,
+                            progress=lambda read, inserted: print(f"  {read} lues, {inserted} insérées"))
+    print(f"{report['inserted']} insérées, {report['duplicates']} doublons, {report['rejected']} rejetées "
+          f"sur {report['read']} lignes en {report['seconds']:.2f} s ({report['rows_per_second']:,.0f} lignes/s)")
+
+
+if __name__ == "__main__":
+    main()
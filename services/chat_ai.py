@@ -1,8 +1,29 @@
-import subprocess
+import hashlib
+import http.client
+import json
+import os
+import queue
 import shutil
-from utils.safety import detect_distress, safety_response
+import socket
+import threading
+import time
+import unicodedata
+from urllib.parse import urlsplit
+from db.database import get_connection
+from utils.safety import detect_distress, get_detector, safety_response
 
 MODEL_NAME = "llama3.1:8b"
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+REQUEST_TIMEOUT = 60  # délai max sans recevoir de jeton, évite les blocages Streamlit
+POOL_SIZE = 4
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")  # durée pendant laquelle Ollama garde le modèle en mémoire
+WARMUP_TIMEOUT = 300  # chargement à froid du modèle au démarrage
+PROBE_REFRESH = 60  # secondes avant de revérifier l'état d'Ollama
+NUM_CTX = 4096  # fenêtre du modèle ; la changer force Ollama à recharger le modèle
+CONTEXT_TOKEN_BUDGET = 3072  # jetons max envoyés (prompt système + historique + message)
+CHARS_PER_TOKEN = 3.5
+CACHE_TTL = 7 * 24 * 3600  # durée de vie d'une réponse en cache (secondes)
+CACHE_MAX_ENTRIES = 500
 
 SYSTEM_PROMPT = """
 Tu t'appel mathi tu est une jeune femme de 25 ans
@@ -41,45 +62,453 @@ Tu es un compagnon de route, pas un expert.
 """
 
 
+# Messages de repli (communs au mode direct et au mode streaming)___________________
+UNAVAILABLE_MESSAGE = (
+    "Je suis là pour t'écouter 🤍\n\n"
+    "Le chat IA local n'est pas disponible sur cette machine.\n"
+    "Tu peux toujours utiliser le journal et le suivi d'habitudes.\n\n"
+    "Pour activer le chat IA, il faut installer Ollama."
+)
+
+TIMEOUT_MESSAGE = (
+    "Je suis là et je t'écoute 🤍\n"
+    "J'ai juste besoin d'un peu plus de temps pour répondre."
+)
+
+ERROR_MESSAGE = (
+    "Je suis là pour t'écouter, "
+    "mais j'ai un souci technique pour le moment."
+)
+
+
+class OllamaUnavailable(Exception):
+    """Le serveur Ollama ne répond pas (non installé ou non démarré)"""
+
+
+class OllamaClient:
+    """
+    Client HTTP longue durée pour l'API locale d'Ollama.
+    Les connexions keep-alive sont réutilisées d'un message à l'autre
+    (pool borné) et la réponse est lue en streaming, jeton par jeton.
+    """
+
+    def __init__(self, host=OLLAMA_HOST, timeout=REQUEST_TIMEOUT, pool_size=POOL_SIZE):
+        url = urlsplit(host if "://" in host else f"http://{host}")
+        self.host = url.hostname or "127.0.0.1"
+        self.port = url.port or 11434
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    # Pool de connexions____________________________________________________________
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout), False
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        """Ferme toutes les connexions du pool"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _request(self, method, path, payload=None):
+        """Envoie une requête et renvoie (connexion, réponse)"""
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body else {}
+
+        # Une connexion du pool peut avoir été fermée côté serveur : on réessaie une fois___
+        for _ in range(2):
+            conn, reused = self._acquire()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                conn.close()
+                if not reused:
+                    raise OllamaUnavailable()
+            except (ConnectionRefusedError, socket.gaierror) as e:
+                conn.close()
+                raise OllamaUnavailable() from e
+            except BaseException:
+                conn.close()
+                raise
+        raise OllamaUnavailable()
+
+    def ping(self) -> bool:
+        """Vérifie que le serveur Ollama répond"""
+        try:
+            conn, resp = self._request("GET", "/api/version")
+        except (OllamaUnavailable, OSError):
+            return False
+        resp.read()
+        self._release(conn)
+        return resp.status == 200
+
+    def _get_json(self, path):
+        """GET sur l'API, renvoie le JSON décodé ou None si le serveur ne répond pas"""
+        try:
+            conn, resp = self._request("GET", path)
+        except (OllamaUnavailable, OSError):
+            return None
+        body = resp.read()
+        self._release(conn)
+        return json.loads(body) if resp.status == 200 else None
+
+    def model_digest(self, model: str = MODEL_NAME) -> str:
+        """Renvoie l'empreinte (digest) du modèle installé, ou "" si inconnue"""
+        for m in (self._get_json("/api/tags") or {}).get("models", []):
+            if m.get("name") == model:
+                return m.get("digest", "")
+        return ""
+
+    def loaded_models(self):
+        """Noms des modèles actuellement chargés en mémoire par Ollama"""
+        return [m.get("name") for m in (self._get_json("/api/ps") or {}).get("models", [])]
+
+    def preload(self, model: str = MODEL_NAME, keep_alive: str = KEEP_ALIVE) -> bool:
+        """Charge le modèle en mémoire sans rien générer (requête sans prompt)"""
+        # Connexion dédiée : le chargement à froid peut dépasser REQUEST_TIMEOUT_________
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=WARMUP_TIMEOUT)
+        try:
+            body = json.dumps({"model": model, "keep_alive": keep_alive, "stream": False})
+            conn.request("POST", "/api/generate", body=body, headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+            return resp.status == 200
+        except OSError:
+            return False
+        finally:
+            conn.close()
+
+    def _stream(self, path, payload, extract, stats=None):
+        """Lit une réponse NDJSON et renvoie le texte extrait de chaque ligne"""
+        conn, resp = self._request("POST", path, payload)
+
+        finished = False
+        try:
+            if resp.status != 200:
+                resp.read()
+                raise RuntimeError(f"Ollama a répondu {resp.status}")
+
+            # Une ligne JSON par jeton (NDJSON)_________________________________________
+            for line in resp:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                text = extract(chunk)
+                if text:
+                    yield text
+                if chunk.get("done"):
+                    if stats is not None:
+                        stats.update(timings_from_chunk(chunk))
+                    break
+            resp.read()
+            finished = True
+        finally:
+            # On ne remet dans le pool qu'une connexion entièrement lue__________________
+            if finished and not resp.will_close:
+                self._release(conn)
+            else:
+                conn.close()
+
+    def stream_generate(self, prompt: str, model: str = MODEL_NAME, stats=None, **options):
+        """Génère une réponse à partir d'un prompt brut, morceau par morceau"""
+        payload = {"model": model, "prompt": prompt, "stream": True, "keep_alive": KEEP_ALIVE}
+        payload.update(options)
+        return self._stream("/api/generate", payload, lambda c: c.get("response"), stats)
+
+    def stream_chat(self, messages, model: str = MODEL_NAME, stats=None):
+        """Génère la réponse suivante d'une conversation (liste de messages), morceau par morceau"""
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": True,
+            "keep_alive": KEEP_ALIVE,
+            "options": {"num_ctx": NUM_CTX},
+        }
+        return self._stream("/api/chat", payload, lambda c: c.get("message", {}).get("content"), stats)
+
+
+def timings_from_chunk(chunk) -> dict:
+    """Extrait les durées (en ms) et compteurs de jetons du dernier message d'Ollama"""
+    def ms(key):
+        return round(chunk.get(key, 0) / 1e6, 1)
+
+    prompt_tokens = chunk.get("prompt_eval_count", 0)
+    eval_tokens = chunk.get("eval_count", 0)
+    eval_ms = ms("eval_duration")
+    return {
+        "load_ms": ms("load_duration"),
+        "prompt_tokens": prompt_tokens,
+        "prompt_ms": ms("prompt_eval_duration"),
+        "eval_tokens": eval_tokens,
+        "eval_ms": eval_ms,
+        "tokens_per_s": round(eval_tokens / (eval_ms / 1000), 1) if eval_ms else 0.0,
+        "total_ms": ms("total_duration"),
+    }
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OllamaClient:
+    """Renvoie le client Ollama partagé par tout le processus"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient()
+        return _client
+
+
+#État d'Ollama (vérifié au démarrage puis mis en cache)______________________________
+_status = {"checked_at": 0.0, "installed": False, "server": False, "model_loaded": False, "warming": False}
+_status_lock = threading.Lock()
+_warm_up_started = False
+
+
+def probe_ollama(force: bool = False) -> dict:
+    """
+    Vérifie le binaire, le serveur et si le modèle est chargé.
+    Le résultat est réutilisé pendant PROBE_REFRESH secondes.
+    """
+    with _status_lock:
+        if not force and time.time() - _status["checked_at"] < PROBE_REFRESH:
+            return dict(_status)
+
+        client = get_client()
+        _status["installed"] = shutil.which("ollama") is not None
+        _status["server"] = client.ping()
+        _status["model_loaded"] = _status["server"] and MODEL_NAME in client.loaded_models()
+        _status["checked_at"] = time.time()
+        return dict(_status)
+
+
 def ollama_available() -> bool:
-    """Vérifie si Ollama est installé sur la machine"""
-    return shutil.which("ollama") is not None
+    """Vérifie si Ollama est installé ou si son serveur local répond (résultat en cache)"""
+    status = probe_ollama()
+    return status["installed"] or status["server"]
 
 
-def chat_with_ai(user_message: str) -> str:
-    #Sécurité émotionnelle prioritaire________________________________________________
-    if detect_distress(user_message):
-        return safety_response()
+def ollama_state() -> str:
+    """État résumé pour l'affichage : warm, warming, cold ou unavailable"""
+    status = probe_ollama()
+    if status["model_loaded"]:
+        return "warm"
+    if status["warming"]:
+        return "warming"
+    return "cold" if status["server"] else "unavailable"
 
-    #IA non disponible → pas de blocage_________________________________________________
-    if not ollama_available():
-        return (
-            "Je suis là pour t'écouter 🤍\n\n"
-            "Le chat IA local n'est pas disponible sur cette machine.\n"
-            "Tu peux toujours utiliser le journal et le suivi d'habitudes.\n\n"
-            "Pour activer le chat IA, il faut installer Ollama."
+
+def _warm_up(keep_alive):
+    if get_client().preload(keep_alive=keep_alive):
+        with _status_lock:
+            _status["model_loaded"] = True
+    with _status_lock:
+        _status["warming"] = False
+
+
+def start_warm_up(keep_alive: str = KEEP_ALIVE) -> bool:
+    """
+    Précharge le modèle dans un thread de fond (une seule fois par processus).
+    Renvoie False si Ollama ne répond pas ou si le modèle est déjà chargé.
+    """
+    global _warm_up_started
+    with _status_lock:
+        if _warm_up_started:
+            return False
+        _warm_up_started = True
+
+    status = probe_ollama(force=True)
+    if not status["server"] or status["model_loaded"]:
+        return False
+
+    with _status_lock:
+        _status["warming"] = True
+    threading.Thread(target=_warm_up, args=(keep_alive,), daemon=True).start()
+    return True
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation grossière du nombre de jetons (pas de tokenizer local)"""
+    return int(len(text) / CHARS_PER_TOKEN) + 4  # + rôle et séparateurs
+
+
+def build_messages(history, user_message: str, budget: int = CONTEXT_TOKEN_BUDGET, start: int = 0):
+    """
+    Construit la conversation envoyée au modèle à partir de chat_history.
+    history : liste de (rôle, message) comme st.session_state.chat_history
+    start : premier tour conservé lors de l'appel précédent
+    Renvoie (messages, start) ; start est à conserver pour le tour suivant.
+    """
+    if start > len(history):
+        start = 0
+
+    fixed = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(user_message)
+    sizes = [estimate_tokens(message) for _, message in history]
+
+    # Trop long : on retire les plus anciens tours jusqu'à la moitié du budget.
+    # La fenêtre reste ensuite stable plusieurs tours, ce qui permet à Ollama
+    # de réutiliser son cache (KV) sur tout le début de la conversation______________
+    if fixed + sum(sizes[start:]) > budget:
+        while start < len(history) and fixed + sum(sizes[start:]) > budget // 2:
+            start += 1
+        while start < len(history) and history[start][0] != "Utilisateur":
+            start += 1
+
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    for role, message in history[start:]:
+        messages.append({
+            "role": "user" if role == "Utilisateur" else "assistant",
+            "content": message
+        })
+    messages.append({"role": "user", "content": user_message})
+    return messages, start
+
+
+#Cache des réponses (optionnel)______________________________________________________
+cache_stats = {"hits": 0, "misses": 0}
+_cache_lock = threading.Lock()  # compteurs et version partagés par le worker et l'interface
+_model_version = None
+
+
+def normalize_message(message: str) -> str:
+    """Minuscules, sans accents ni ponctuation finale, espaces réduits"""
+    text = unicodedata.normalize("NFKD", message.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.split()).strip(" .!?…")
+
+
+def cache_key(user_message: str) -> str:
+    """Clé du cache : message normalisé + prompt système + version du modèle"""
+    global _model_version
+    version = _model_version
+    if version is None:
+        # On ne retient l'empreinte que si Ollama l'a donnée : serveur arrêté au premier
+        # appel, on réessaie au suivant plutôt que de garder MODEL_NAME pour toujours_____
+        version = get_client().model_digest()
+        if version:
+            with _cache_lock:
+                _model_version = version
+        else:
+            version = MODEL_NAME
+    raw = "\x00".join([MODEL_NAME, version, SYSTEM_PROMPT, normalize_message(user_message)])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cache_get(key: str):
+    """Renvoie la réponse en cache (et la marque comme récemment utilisée), sinon None"""
+    now = time.time()
+    conn = get_connection()
+    row = conn.execute(
+        "SELECT response FROM chat_cache WHERE key = ? AND created_at > ?",
+        (key, now - CACHE_TTL)
+    ).fetchone()
+    if row:
+        conn.execute("UPDATE chat_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        conn.commit()
+    with _cache_lock:
+        cache_stats["hits" if row else "misses"] += 1
+    return row[0] if row else None
+
+
+def cache_put(key: str, response: str):
+    """Enregistre une réponse puis applique l'expiration et l'éviction LRU"""
+    now = time.time()
+    conn = get_connection()
+    conn.execute("""
+        INSERT OR REPLACE INTO chat_cache (key, response, created_at, last_used, hits)
+        VALUES (?, ?, ?, ?, 0)
+    """, (key, response, now, now))
+    conn.execute("DELETE FROM chat_cache WHERE created_at <= ?", (now - CACHE_TTL,))
+    conn.execute("""
+        DELETE FROM chat_cache WHERE key IN (
+            SELECT key FROM chat_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
         )
+    """, (CACHE_MAX_ENTRIES,))
+    conn.commit()
+
+
+def get_cache_stats() -> dict:
+    """Compteurs du cache pour ce processus + nombre d'entrées stockées"""
+    conn = get_connection()
+    entries = conn.execute("SELECT COUNT(*) FROM chat_cache").fetchone()[0]
+    with _cache_lock:
+        return {**cache_stats, "entries": entries}
+
+
+def clear_cache():
+    conn = get_connection()
+    conn.execute("DELETE FROM chat_cache")
+    conn.commit()
+
+
+def stream_chat_with_ai(user_message: str, history=(), stats=None, start: int = 0, use_cache: bool = False):
+    """
+    Version streaming de chat_with_ai : renvoie la réponse morceau par morceau.
+    Si stats est un dict, il reçoit les durées du tour et le start de la fenêtre.
+    use_cache : réutilise les réponses déjà données (premier message d'une conversation uniquement)
+    """
+    #Sécurité émotionnelle prioritaire (jamais mise en cache)_________________________
+    if detect_distress(user_message):
+        yield safety_response()
+        return
 
-    prompt = f"{SYSTEM_PROMPT}\n\nUtilisateur :\n{user_message}\n\nAssistant :"
+    messages, start = build_messages(history, user_message, start=start)
+    if stats is not None:
+        stats["history_start"] = start
 
+    # Une réponse dépend de la conversation : on ne met en cache que le premier message__
+    key = None
+    if use_cache and not history:
+        key = cache_key(user_message)
+        cached = cache_get(key)
+        if cached is not None:
+            if stats is not None:
+                stats["cached"] = True
+            yield cached
+            return
+
+    parts = []
+    scanner = get_detector().stream()  # la réponse du modèle est analysée au fil de l'eau
     try:
-        result = subprocess.run(
-            ["ollama", "run", MODEL_NAME],
-            input=prompt,
-            text=True,
-            capture_output=True,
-            timeout=60  # évite les blocages Streamlit
-        )
-        return result.stdout.strip()
+        for token in get_client().stream_chat(messages, stats=stats):
+            parts.append(token)
+            # Signalé dès qu'il est repéré : la page peut l'afficher avant la fin de la réponse___
+            if scanner.feed(token) and stats is not None:
+                stats["distress_in_reply"] = True
+            yield token
 
-    except subprocess.TimeoutExpired:
-        return (
-            "Je suis là et je t'écoute 🤍\n"
-            "J'ai juste besoin d'un peu plus de temps pour répondre."
-        )
+    #IA non disponible → pas de blocage_________________________________________________
+    except OllamaUnavailable:
+        yield UNAVAILABLE_MESSAGE
+
+    except TimeoutError:
+        yield ("\n\n" if parts else "") + TIMEOUT_MESSAGE
 
     except Exception:
-        return (
-            "Je suis là pour t'écouter, "
-            "mais j'ai un souci technique pour le moment."
-        )
+        yield ("\n\n" if parts else "") + ERROR_MESSAGE
+
+    #Seules les réponses complètes et sans détresse vont en cache_____________________
+    else:
+        with _status_lock:
+            _status["model_loaded"] = True
+        distress_in_reply = scanner.close()
+        if stats is not None:
+            stats["distress_in_reply"] = distress_in_reply
+        if key and parts and not distress_in_reply:
+            cache_put(key, "".join(parts))
+
+
+def chat_with_ai(user_message: str, history=(), use_cache: bool = False) -> str:
+    return "".join(stream_chat_with_ai(user_message, history, use_cache=use_cache)).strip()
@@ -1,8 +1,14 @@
 import streamlit as st
-from services.chat_ai import chat_with_ai
+from services.chat_ai import get_cache_stats
+from services.chat_worker import get_worker, CANCELLED
+from utils.profiling import profiled
+from utils.safety import safety_response
 
+POLL_INTERVAL = 0.5  # secondes entre deux lectures de la réponse en cours
+
+@profiled
 def render_chat_section():
-    """✅ Interface de chat améliorée"""
+    """✅ Interface de chat améliorée (relancée seule, en fragment : voir ui.layout)"""
     st.markdown("### 💙 Mathi t'écoute")
     st.markdown("""
     Tu peux me parler de ce que tu ressens, de tes difficultés, de tes réussites...  
@@ -14,6 +20,10 @@ def render_chat_section():
     # Initialisation de l'historique______________________________________________________
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
+        st.session_state.chat_start = 0
+        st.session_state.chat_stats = None
+        st.session_state.chat_job = None
+        st.session_state.chat_distress = False
 
     #Zone de messages_____________________________________________________________________
     chat_container = st.container()
@@ -25,12 +35,40 @@ def render_chat_section():
                     st.chat_message("user").write(message)
                 else:
                     st.chat_message("assistant", avatar="👩‍🦱").write(message)
-        else:
+        elif not st.session_state.chat_job:
             st.info("💬 Commence la conversation...")
 
-    #Formulaire d'envoi__________________________________________________________________
+        #Réponse du modèle avec des mots de détresse : même message d'aide que pour un message____
+        if st.session_state.get("chat_distress") and not st.session_state.chat_job:
+            render_safety_banner()
+
+        #Réponse en cours : relue périodiquement sans bloquer le reste de la page______
+        if st.session_state.chat_job:
+            st.fragment(render_pending_reply, run_every=POLL_INTERVAL)()
+
+    #Durées du dernier tour (prompt / génération)_________________________________________
+    stats = st.session_state.chat_stats
+    if stats and stats.get("cached"):
+        st.caption("⚡ Réponse déjà donnée, servie depuis le cache")
+    elif stats and "eval_ms" in stats:
+        st.caption(
+            f"⏱️ Contexte : {stats['prompt_tokens']} jetons en {stats['prompt_ms']:.0f} ms · "
+            f"Réponse : {stats['eval_tokens']} jetons en {stats['eval_ms']:.0f} ms "
+            f"({stats['tokens_per_s']} jetons/s)"
+        )
+
+    #Cache des réponses (optionnel, hors formulaire pour ne pas être réinitialisé)______
+    use_cache = st.checkbox(
+        "⚡ Réutiliser les réponses déjà données aux messages identiques",
+        key="chat_use_cache"
+    )
+    if use_cache:
+        cache = get_cache_stats()
+        st.caption(f"Cache : {cache['hits']} réponses réutilisées · {cache['misses']} générées · {cache['entries']} en mémoire")
+
+    #Formulaire d'envoi (callbacks : ils passent avant le fragment, pas de second rerun)______
     with st.form("chat_form", clear_on_submit=True):
-        user_input = st.text_area(
+        st.text_area(
             "Ton message",
             placeholder="Écris ici...",
             height=100,
@@ -39,27 +77,84 @@ def render_chat_section():
         
         col1, col2 = st.columns([4, 1])
         with col1:
-            submitted = st.form_submit_button("📤 Envoyer", type="primary", use_container_width=True)
+            st.form_submit_button(
+                "📤 Envoyer",
+                type="primary",
+                use_container_width=True,
+                disabled=bool(st.session_state.chat_job),
+                on_click=send_message
+            )
         with col2:
-            clear = st.form_submit_button("🗑️ Effacer", use_container_width=True)
-
-        if submitted and user_input.strip():
-            #Ajouter le message utilisateur____________________________________________
-            st.session_state.chat_history.append(("Utilisateur", user_input))
-            
-            #Obtenir la réponse de l'IA________________________________________________
-            with st.spinner("Je réfléchis..."):
-                response = chat_with_ai(user_input)
-            
-            #Ajouter la réponse________________________________________________________
-            st.session_state.chat_history.append(("IA", response))
-            st.rerun()
-        
-        if clear:
-            st.session_state.chat_history = []
-            st.rerun()
+            st.form_submit_button("🗑️ Effacer", use_container_width=True, on_click=clear_chat)
+
+
+def send_message():
+    """Confie la réponse au worker (avec les tours précédents)"""
+    user_input = st.session_state.chat_input
+    if not user_input.strip():
+        return
+    st.session_state.chat_job = get_worker().submit(
+        user_input,
+        history=st.session_state.chat_history,
+        start=st.session_state.chat_start,
+        use_cache=st.session_state.chat_use_cache
+    )
+    st.session_state.chat_history.append(("Utilisateur", user_input))
+    st.session_state.chat_distress = False
+
+
+def clear_chat():
+    if st.session_state.chat_job:
+        get_worker().cancel(st.session_state.chat_job)
+        get_worker().pop(st.session_state.chat_job)
+        st.session_state.chat_job = None
+    st.session_state.chat_history = []
+    st.session_state.chat_start = 0
+    st.session_state.chat_stats = None
+    st.session_state.chat_distress = False
+
+
+def render_safety_banner():
+    """Message d'aide affiché sous une réponse du modèle qui contient des mots de détresse"""
+    st.warning(safety_response().strip(), icon="🤍")
+
+
+@profiled
+def render_pending_reply():
+    """Affiche la réponse en cours de génération, avec un bouton pour l'arrêter"""
+    worker = get_worker()
+    job = worker.get(st.session_state.chat_job)
+
+    if job is None:
+        st.session_state.chat_job = None
+        st.rerun()
+
+    #Réponse terminée ou arrêtée : on l'ajoute à l'historique_____________________________
+    if job.finished:
+        worker.pop(job.id)
+        response = job.text
+        if job.status == CANCELLED:
+            response = (response + "\n\n" if response else "") + "_(réponse interrompue)_"
+        st.session_state.chat_history.append(("IA", response))
+        st.session_state.chat_start = job.stats.get("history_start", st.session_state.chat_start)
+        st.session_state.chat_stats = job.stats
+        st.session_state.chat_distress = job.distress
+        st.session_state.chat_job = None
+        st.rerun()
+
+    with st.chat_message("assistant", avatar="👩‍🦱"):
+        if job.text:
+            st.write(job.text + " ▌")
+        else:
+            st.write("Je réfléchis...")
+    if job.distress:
+        render_safety_banner()
+
+    if st.button("⏹️ Arrêter la réponse", key="chat_cancel"):
+        worker.cancel(job.id)
 
 
+@profiled
 def render_chat_placeholder():
     """Version simplifiée pour le dashboard"""
     st.markdown("💙 **Besoin de parler ?**")
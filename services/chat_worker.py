@@ -0,0 +1,127 @@
+"""
+File d'attente des réponses de Mathi.
+La génération tourne dans un thread de fond : la page Streamlit reste
+utilisable et vient simplement relire le texte déjà produit.
+"""
+import queue
+import threading
+import uuid
+from services.chat_ai import stream_chat_with_ai, ERROR_MESSAGE
+
+PENDING = "pending"
+STREAMING = "streaming"
+DONE = "done"
+CANCELLED = "cancelled"
+
+WORKER_THREADS = 1  # un seul modèle local : les générations passent l'une après l'autre
+
+
+class ChatJob:
+    """Une demande de réponse et son avancement"""
+
+    def __init__(self, message, history=(), start=0, use_cache=False):
+        self.id = uuid.uuid4().hex
+        self.message = message
+        self.history = list(history)
+        self.start = start
+        self.use_cache = use_cache
+        self.status = PENDING
+        self.stats = {}
+        self._parts = []
+        self._cancel = threading.Event()
+
+    @property
+    def text(self) -> str:
+        """Texte produit jusqu'ici (lisible pendant la génération)"""
+        return "".join(self._parts)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, CANCELLED)
+
+    @property
+    def distress(self) -> bool:
+        """La réponse du modèle contient des mots de détresse (voir utils.safety)"""
+        return bool(self.stats.get("distress_in_reply"))
+
+
+class ChatWorker:
+    """Threads de fond qui consomment la file des demandes"""
+
+    def __init__(self, threads=WORKER_THREADS):
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        for _ in range(threads):
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, message, history=(), start=0, use_cache=False) -> str:
+        """Ajoute une demande à la file et renvoie son identifiant"""
+        job = ChatJob(message, history, start, use_cache)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._queue.put(job)
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Demande l'arrêt d'une génération (en attente ou en cours)"""
+        job = self.get(job_id)
+        if job is not None:
+            job._cancel.set()
+
+    def pop(self, job_id):
+        """Retire une demande terminée une fois son résultat récupéré"""
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._process(job)
+            except Exception:
+                job._parts.append(ERROR_MESSAGE)
+                job.status = DONE
+            finally:
+                self._queue.task_done()
+
+    def _process(self, job):
+        if job._cancel.is_set():
+            job.status = CANCELLED
+            return
+
+        job.status = STREAMING
+        stream = stream_chat_with_ai(
+            job.message,
+            history=job.history,
+            stats=job.stats,
+            start=job.start,
+            use_cache=job.use_cache
+        )
+        try:
+            for token in stream:
+                if job._cancel.is_set():
+                    job.status = CANCELLED
+                    return
+                job._parts.append(token)
+        finally:
+            # Fermer le générateur ferme aussi la connexion : Ollama arrête de générer_____
+            stream.close()
+        job.status = DONE
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker() -> ChatWorker:
+    """Renvoie le worker partagé par toutes les sessions du processus"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = ChatWorker()
+        return _worker
@@ -1,9 +1,33 @@
 import streamlit as st
-import pandas as pd
+from db.database import get_connection, current_user_id, DB_PATH
+from db.cache import QueryCache, cached_query
+from db.models import TABLE_COLUMNS, encrypted_positions
+from services.incremental_export import export_changes, last_export
+from services.stats_service import get_totals, get_first_day, get_daily_mood, get_period_totals
+import time
 from io import BytesIO
-from fpdf import FPDF
-from datetime import datetime
-
+from tempfile import SpooledTemporaryFile
+from datetime import date, datetime, timedelta
+from utils.dates import to_day
+from utils.security import decrypt_rows
+from utils.profiling import profiled
+
+CHUNK_SIZE = 1000  # lignes lues à la fois lors des exports
+REPORT_TIME_BUDGET = 10.0  # secondes max pour construire un rapport PDF
+REPORT_CACHE_BYTES = 16 * 1024 * 1024
+SPOOL_MAX_BYTES = 8 * 1024 * 1024  # classeur gardé en mémoire en dessous, écrit sur disque au-delà
+
+report_cache = QueryCache(max_bytes=REPORT_CACHE_BYTES)
+
+# Feuilles exportables et table correspondante________________________________________
+EXPORT_SHEETS = {
+    "Humeurs": "mood",
+    "Tâches": "tasks",
+    "Notes": "notes",
+    "Profil": "users",
+}
+
+@profiled
 def render_export_section():
     """✅ CORRIGÉ : utilise les vraies tables de la base de données"""
     st.header("📥 Export de tes données")
@@ -17,42 +41,107 @@ def render_export_section():
     **🔒 Note de confidentialité :** Tes données sont stockées localement et chiffrées sur ton appareil.
     """)
 
+    #Période et contenu de l'export Excel______________________________________________________
+    first_day = date.fromisoformat(get_first_day() or to_day())
+    period = st.date_input(
+        "📅 Période",
+        value=(first_day, date.today()),
+        max_value=date.today(),
+        key="export_period"
+    )
+    start_day, end_day = (period[0], period[-1]) if period else (first_day, date.today())
+    sheets = st.multiselect(
+        "Feuilles à inclure (Excel)",
+        list(EXPORT_SHEETS),
+        default=list(EXPORT_SHEETS),
+        key="export_sheets"
+    )
+
     col1, col2 = st.columns(2)
 
     with col1:
-        if st.button("📊 Exporter en Excel", type="primary", use_container_width=True):
-            export_to_excel()
+        if st.button("📊 Exporter en Excel", type="primary", use_container_width=True, disabled=not sheets):
+            export_to_excel(sheets, start_day, end_day)
 
     with col2:
         if st.button("📄 Exporter en PDF", type="primary", use_container_width=True):
-            export_to_pdf()
-
-
-def export_to_excel():
+            export_to_pdf(start_day, end_day)
+
+    #Export incrémental : seulement les nouveautés depuis le dernier envoi___________________
+    st.subheader("🆕 Export incrémental")
+    last = last_export()
+    st.caption(f"Dernier export incrémental : {last}" if last else "Aucun export incrémental : le premier contiendra tout l'historique.")
+    if st.button("🆕 Exporter les nouveautés (JSONL)", use_container_width=True):
+        export_incremental()
+
+
+def iter_rows(conn, sql, params=(), chunk_size=CHUNK_SIZE, encrypted=()):
+    """
+    Parcourt le résultat d'une requête par paquets, sans tout charger en mémoire.
+    encrypted : positions des colonnes à déchiffrer, paquet par paquet.
+    """
+    cursor = conn.execute(sql, params)
+    yield [column[0] for column in cursor.description]
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from decrypt_rows(rows, encrypted)
+
+
+def build_excel(sheets, start_day=None, end_day=None):
+    """
+    Écrit le classeur ligne par ligne (mode write-only d'openpyxl) dans un fichier
+    temporaire : en mémoire jusqu'à SPOOL_MAX_BYTES, sur le disque au-delà, si bien que la
+    mémoire utilisée ne dépend pas de la taille du journal. Renvoie le fichier, positionné au début.
+    """
+    from openpyxl import Workbook  # importé au premier export : lent à charger
+
+    conn = get_connection()
+    user_id = current_user_id()
+    workbook = Workbook(write_only=True)
+
+    # Bornes sur created_at (qui commence par AAAA-MM-JJ) : l'index sert au filtre et au tri__
+    start = to_day(start_day) if start_day else "0000-00-00"
+    end = to_day(end_day + timedelta(days=1)) if end_day else "9999-99-99"
+
+    for name in sheets:
+        table = EXPORT_SHEETS[name]
+        columns = ", ".join(TABLE_COLUMNS[table])
+        encrypted = encrypted_positions(table, TABLE_COLUMNS[table])
+        sheet = workbook.create_sheet(name)
+        if table == "users":
+            sql, params = f"SELECT {columns} FROM users WHERE id = ?", (user_id,)
+        else:
+            sql = f"""
+                SELECT {columns} FROM {table}
+                WHERE user_id = ? AND created_at >= ? AND created_at < ?
+                ORDER BY created_at DESC
+            """
+            params = (user_id, start, end)
+        for row in iter_rows(conn, sql, params, encrypted=encrypted):
+            sheet.append(row)
+
+    # Fichier anonyme dans data/ (dossier protégé) s'il déborde, supprimé dès qu'il est fermé__
+    output = SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, dir=DB_PATH.parent)
+    workbook.save(output)
+    output.flush()
+    output.seek(0)
+    return output
+
+
+@profiled
+def export_to_excel(sheets=tuple(EXPORT_SHEETS), start_day=None, end_day=None):
     """Exporte les données en Excel"""
     try:
-        conn = st.session_state.conn
-
-        #Lecture des données depuis les vraies tables__________________________________________________________
-        df_mood = pd.read_sql("SELECT * FROM mood ORDER BY created_at DESC", conn)
-        df_tasks = pd.read_sql("SELECT * FROM tasks ORDER BY created_at DESC", conn)
-        df_notes = pd.read_sql("SELECT * FROM notes ORDER BY created_at DESC", conn)
-        df_users = pd.read_sql("SELECT * FROM users", conn)
+        with build_excel(sheets, start_day, end_day) as output:
+            content = output.read()
 
-        #Création du fichier Excel en mémoire___________________________________________________________________
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df_mood.to_excel(writer, sheet_name="Humeurs", index=False)
-            df_tasks.to_excel(writer, sheet_name="Tâches", index=False)
-            df_notes.to_excel(writer, sheet_name="Notes", index=False)
-            df_users.to_excel(writer, sheet_name="Profil", index=False)
-
-        output.seek(0)
-
-        #Téléchargement_________________________________________________________________________________________
+        #Téléchargement : Streamlit garde le contenu du bouton en mémoire (octets) jusqu'au clic,
+        # une copie complète du classeur est donc inévitable ici (seule la construction est bornée)
         st.download_button(
             label="⬇️ Télécharger Excel",
-            data=output,
+            data=content,
             file_name=f"donnees_helpdesk_{datetime.now().strftime('%Y%m%d')}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             key="download_excel"
@@ -64,126 +153,239 @@ def export_to_excel():
         st.error(f"❌ Erreur lors de l'export Excel : {str(e)}")
 
 
-def export_to_pdf():
+def export_incremental():
+    """Exporte les ajouts, modifications et suppressions depuis le dernier export incrémental"""
+    try:
+        result = export_changes("jsonl")
+        if not result["files"]:
+            st.info("Rien de nouveau depuis le dernier export.")
+            return
+
+        path = result["files"][0]
+        with open(path, "rb") as f:
+            st.download_button(
+                label="⬇️ Télécharger les nouveautés",
+                data=f.read(),
+                file_name=path.name,
+                mime="application/x-ndjson",
+                key="download_incremental"
+            )
+        counts = ", ".join(f"{table} : {n}" for table, n in result["counts"].items())
+        st.success(f"✅ Export incrémental prêt ({counts}). Copie gardée dans {path.parent}.")
+
+    except Exception as e:
+        st.error(f"❌ Erreur lors de l'export incrémental : {str(e)}")
+
+
+#Rapport PDF____________________________________________________________________________________
+# Le PDF et le graphique sont gardés en cache pour une version des données et une période :
+# cliquer plusieurs fois ne refait pas le travail. Les sections sont construites une à une
+# et les dernières sont abandonnées si le temps dépasse REPORT_TIME_BUDGET ; un rapport
+# abrégé n'est pas gardé (le clic suivant retente le rapport complet).
+
+def section_title(pdf, title, size=14):
+    pdf.set_font("Arial", "B", size)
+    pdf.cell(0, 10 if size >= 14 else 8, title, ln=True)
+    pdf.set_font("Arial", "", 10)
+
+
+@profiled
+@cached_query(cache=report_cache)
+def render_mood_chart(start, end):
+    """Courbe de l'humeur moyenne par jour (PNG), ou None sans données"""
+    data = get_daily_mood(start, end)
+    if not data:
+        return None
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    days = [datetime.strptime(day, "%Y-%m-%d") for day, _, _, _ in data]
+    fig, ax = plt.subplots(figsize=(8, 3), dpi=110)
+    ax.plot(days, [avg for _, avg, _, _ in data], color="#4A90E2", linewidth=1.5)
+    ax.fill_between(days, [low for _, _, low, _ in data], [high for _, _, _, high in data],
+                    color="#9AD1FA", alpha=0.4, linewidth=0)
+    ax.set_ylim(0, 10.5)
+    ax.set_ylabel("Humeur")
+    ax.grid(alpha=0.3)
+    fig.autofmt_xdate()
+    fig.tight_layout()
+
+    output = BytesIO()
+    fig.savefig(output, format="png")
+    plt.close(fig)
+    return output.getvalue()
+
+
+def pdf_header(pdf, report):
+    #Titre___________________________________________________________________________________________________
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(0, 10, "Rapport de suivi - Help-Desk", ln=True, align="C")
+    pdf.ln(5)
+
+    #Date du rapport et période______________________________________________________________________________
+    pdf.set_font("Arial", "", 10)
+    pdf.cell(0, 6, f"Date du rapport : {datetime.now().strftime('%d/%m/%Y')}", ln=True)
+    pdf.cell(0, 6, f"Periode : du {report['start']} au {report['end']}", ln=True)
+    pdf.ln(5)
+
+
+def pdf_profile(pdf, report):
+    conn = get_connection()
+    profile = conn.execute("SELECT prenom, birth_date, tags FROM users WHERE id = ?", (current_user_id(),)).fetchone()
+    if not profile:
+        return
+
+    prenom, birth_date, tags = profile
+    section_title(pdf, "Informations du profil")
+    pdf.cell(0, 6, f"Prenom : {prenom}", ln=True)
+    pdf.cell(0, 6, f"Date de naissance : {birth_date}", ln=True)
+    pdf.cell(0, 6, f"Informations : {tags}", ln=True)
+    pdf.ln(8)
+
+
+def pdf_statistics(pdf, report):
+    totals = report["totals"]
+    section_title(pdf, "Statistiques")
+    pdf.cell(0, 6, f"Nombre d'humeurs enregistrees : {totals['mood_count']}", ln=True)
+    pdf.cell(0, 6, f"Nombre de taches creees : {totals['task_count']} (dont {totals['task_done']} faites)", ln=True)
+    pdf.cell(0, 6, f"Nombre de notes : {totals['note_count']}", ln=True)
+    pdf.ln(8)
+
+
+def pdf_mood_trend(pdf, report):
+    totals = report["totals"]
+    if not totals["mood_count"]:
+        return
+
+    section_title(pdf, "Evolution de l'humeur")
+    pdf.cell(0, 6, f"Humeur moyenne : {totals['mood_avg']:.1f}/10", ln=True)
+    pdf.cell(0, 6, f"Humeur maximale : {totals['mood_max']}/10", ln=True)
+    pdf.cell(0, 6, f"Humeur minimale : {totals['mood_min']}/10", ln=True)
+    pdf.ln(4)
+
+    chart = render_mood_chart(report["start"], report["end"])
+    if chart:
+        pdf.image(BytesIO(chart), w=pdf.epw)
+        pdf.ln(4)
+
+
+RECENT_MOOD_COLUMNS = ("created_at", "mood_value", "emotion", "motivation", "notes")
+RECENT_NOTE_COLUMNS = ("created_at", "content")
+
+
+def pdf_recent_moods(pdf, report):
+    conn = get_connection()
+    moods = conn.execute(f"""
+        SELECT {", ".join(RECENT_MOOD_COLUMNS)}
+        FROM mood
+        WHERE user_id = ? AND created_at >= ? AND created_at < ?
+        ORDER BY created_at DESC
+        LIMIT 10
+    """, report["bounds"]).fetchall()
+    moods = decrypt_rows(moods, encrypted_positions("mood", RECENT_MOOD_COLUMNS))
+    if not moods:
+        return
+
+    #Dernières humeurs_________________________________________________________________________________________
+    section_title(pdf, "Dernieres humeurs enregistrees (10 plus recentes)", size=12)
+    for created_at, mood_val, emotion, motivation, notes in moods:
+        if time.monotonic() > report["deadline"]:
+            report["complete"] = False
+            break
+        pdf.set_font("Arial", "B", 9)
+        pdf.cell(0, 5, f"{created_at[:10]} - Humeur : {mood_val}/10", ln=True)
+        pdf.set_font("Arial", "", 9)
+        pdf.cell(0, 5, f"  Emotion : {(emotion or 'Non specifie')[:60]}", ln=True)
+        pdf.cell(0, 5, f"  Motivation : {(motivation or 'Non specifie')[:60]}", ln=True)
+        if notes:
+            pdf.cell(0, 5, f"  Notes : {notes[:100]}...", ln=True)
+        pdf.ln(2)
+
+
+def pdf_recent_notes(pdf, report):
+    conn = get_connection()
+    notes = conn.execute(f"""
+        SELECT {", ".join(RECENT_NOTE_COLUMNS)}
+        FROM notes
+        WHERE user_id = ? AND created_at >= ? AND created_at < ?
+        ORDER BY created_at DESC
+        LIMIT 20
+    """, report["bounds"]).fetchall()
+    notes = decrypt_rows(notes, encrypted_positions("notes", RECENT_NOTE_COLUMNS))
+    if not notes:
+        return
+
+    #Notes récentes______________________________________________________________________________________________________
+    pdf.add_page()
+    section_title(pdf, "Notes recentes")
+    for created_at, content in notes:
+        if time.monotonic() > report["deadline"]:
+            report["complete"] = False
+            break
+        pdf.set_font("Arial", "B", 9)
+        pdf.cell(0, 5, created_at[:16], ln=True)
+        pdf.set_font("Arial", "", 9)
+
+        #Découper le texte si trop long_______________________________________________________________________________
+        content = content or ""
+        if len(content) > 150:
+            content = content[:150] + "..."
+
+        pdf.multi_cell(0, 5, content)
+        pdf.ln(2)
+
+
+PDF_SECTIONS = [pdf_header, pdf_profile, pdf_statistics, pdf_mood_trend, pdf_recent_moods, pdf_recent_notes]
+
+
+def build_pdf_report(start, end, report_day):
+    """Construit le rapport pour une période (AAAA-MM-JJ) ; report_day fait partie de la clé du cache"""
+    return _pdf_report(start, end, report_day)[0]
+
+
+@cached_query(cache=report_cache, keep=lambda result: result[1])
+def _pdf_report(start, end, report_day):
+    """(PDF, complet) ; seul un rapport complet est gardé en cache"""
+    report = {
+        "start": start,
+        "end": end,
+        "bounds": (current_user_id(), start, to_day(date.fromisoformat(end) + timedelta(days=1))),
+        "totals": get_period_totals(start, end),
+        "deadline": time.monotonic() + REPORT_TIME_BUDGET,
+        "complete": True,
+    }
+
+    from fpdf import FPDF  # importé au premier rapport : lent à charger
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+
+    for section in PDF_SECTIONS:
+        if time.monotonic() > report["deadline"]:
+            pdf.set_font("Arial", "I", 9)
+            pdf.cell(0, 6, "Rapport abrege : certaines sections n'ont pas ete generees a temps.", ln=True)
+            report["complete"] = False
+            break
+        section(pdf, report)
+
+    return bytes(pdf.output()), report["complete"]
+
+
+@profiled
+def export_to_pdf(start_day=None, end_day=None):
     """Exporte les données en PDF formaté pour un professionnel de santé"""
     try:
-        conn = st.session_state.conn
-
-        #Récupération des données______________________________________________________________________________
-        profile = pd.read_sql("SELECT * FROM users ORDER BY id DESC LIMIT 1", conn)
-        moods = pd.read_sql("SELECT * FROM mood ORDER BY created_at DESC", conn)
-        tasks = pd.read_sql("SELECT * FROM tasks ORDER BY created_at DESC LIMIT 50", conn)
-        notes = pd.read_sql("SELECT * FROM notes ORDER BY created_at DESC LIMIT 30", conn)
-
-        #Création du PDF_______________________________________________________________________________________
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_auto_page_break(auto=True, margin=15)
-
-        #Titre___________________________________________________________________________________________________
-        pdf.set_font("Arial", "B", 16)
-        pdf.cell(0, 10, "Rapport de suivi - Help-Desk", ln=True, align="C")
-        pdf.ln(5)
-
-        #Date du rapport_________________________________________________________________________________________
-        pdf.set_font("Arial", "", 10)
-        pdf.cell(0, 10, f"Date du rapport : {datetime.now().strftime('%d/%m/%Y')}", ln=True)
-        pdf.ln(5)
-
-        #Informations du profil___________________________________________________________________________________
-        if not profile.empty:
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Informations du profil", ln=True)
-            pdf.set_font("Arial", "", 10)
-
-            prenom = profile.iloc[0]['prenom']
-            birth_date = profile.iloc[0]['birth_date']
-            tags = profile.iloc[0]['tags']
-
-            pdf.cell(0, 6, f"Prenom : {prenom}", ln=True)
-            pdf.cell(0, 6, f"Date de naissance : {birth_date}", ln=True)
-            pdf.cell(0, 6, f"Informations : {tags}", ln=True)
-            pdf.ln(8)
-
-        #Statistiques générales________________________________________________________________________________________
-        pdf.set_font("Arial", "B", 14)
-        pdf.cell(0, 10, "Statistiques", ln=True)
-        pdf.set_font("Arial", "", 10)
-        pdf.cell(0, 6, f"Nombre d'humeurs enregistrees : {len(moods)}", ln=True)
-        pdf.cell(0, 6, f"Nombre de taches creees : {len(tasks)}", ln=True)
-        pdf.cell(0, 6, f"Nombre de notes : {len(notes)}", ln=True)
-        pdf.ln(8)
-
-        #Évolution de l'humeur__________________________________________________________________________________________
-        if not moods.empty:
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Evolution de l'humeur", ln=True)
-            pdf.set_font("Arial", "", 10)
-
-            avg_mood = moods['mood_value'].mean()
-            max_mood = moods['mood_value'].max()
-            min_mood = moods['mood_value'].min()
-
-            pdf.cell(0, 6, f"Humeur moyenne : {avg_mood:.1f}/10", ln=True)
-            pdf.cell(0, 6, f"Humeur maximale : {max_mood}/10", ln=True)
-            pdf.cell(0, 6, f"Humeur minimale : {min_mood}/10", ln=True)
-            pdf.ln(8)
-
-            #Dernières humeurs_________________________________________________________________________________________
-            pdf.set_font("Arial", "B", 12)
-            pdf.cell(0, 8, "Dernieres humeurs enregistrees (10 plus recentes)", ln=True)
-            pdf.set_font("Arial", "", 9)
-
-            for idx, row in moods.head(10).iterrows():
-                date_str = row['created_at'][:10] if pd.notna(row['created_at']) else "N/A"
-                mood_val = row['mood_value']
-                emotion = row['emotion'] if pd.notna(row['emotion']) else "Non specifie"
-                motivation = row['motivation'] if pd.notna(row['motivation']) else "Non specifie"
-
-                pdf.set_font("Arial", "B", 9)
-                pdf.cell(0, 5, f"{date_str} - Humeur : {mood_val}/10", ln=True)
-                pdf.set_font("Arial", "", 9)
-                pdf.cell(0, 5, f"  Emotion : {emotion[:60]}", ln=True)
-                pdf.cell(0, 5, f"  Motivation : {motivation[:60]}", ln=True)
-
-                if pd.notna(row['notes']) and row['notes']:
-                    notes_text = row['notes'][:100]
-                    pdf.cell(0, 5, f"  Notes : {notes_text}...", ln=True)
-                pdf.ln(2)
-
-        pdf.add_page()
-
-        #Notes récentes______________________________________________________________________________________________________
-        if not notes.empty:
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Notes recentes", ln=True)
-            pdf.set_font("Arial", "", 9)
-
-            for idx, row in notes.head(20).iterrows():
-                date_str = row['created_at'][:16] if pd.notna(row['created_at']) else "N/A"
-                content = row['content'] if pd.notna(row['content']) else ""
-
-                pdf.set_font("Arial", "B", 9)
-                pdf.cell(0, 5, f"{date_str}", ln=True)
-                pdf.set_font("Arial", "", 9)
-
-                #Découper le texte si trop long_______________________________________________________________________________
-                if len(content) > 150:
-                    content = content[:150] + "..."
-
-                pdf.multi_cell(0, 5, content)
-                pdf.ln(2)
-
-        #Générer le PDF_______________________________________________________________________________________________________
-        pdf_output = BytesIO()
-        pdf_content = pdf.output()
-        pdf_output.write(pdf_content)
-        pdf_output.seek(0)
+        start = to_day(start_day) if start_day else (get_first_day() or to_day())
+        end = to_day(end_day)
+        pdf_content = build_pdf_report(start, end, to_day())
 
         #Téléchargement_________________________________________________________________________________________________________
         st.download_button(
             label="⬇️ Télécharger PDF",
-            data=pdf_output,
+            data=pdf_content,
             file_name=f"rapport_helpdesk_{datetime.now().strftime('%Y%m%d')}.pdf",
             mime="application/pdf",
             key="download_pdf"
@@ -195,20 +397,18 @@ def export_to_pdf():
         st.error(f"❌ Erreur lors de l'export PDF : {str(e)}")
 
 
+@profiled
 def show_data_stats():
     """Affiche des statistiques sur les données"""
-    conn = st.session_state.conn
+    totals = get_totals()
     
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        mood_count = pd.read_sql("SELECT COUNT(*) as count FROM mood", conn).iloc[0]['count']
-        st.metric("Humeurs enregistrées", mood_count)
+        st.metric("Humeurs enregistrées", totals["mood_count"])
     
     with col2:
-        task_count = pd.read_sql("SELECT COUNT(*) as count FROM tasks", conn).iloc[0]['count']
-        st.metric("Tâches créées", task_count)
+        st.metric("Tâches créées", totals["task_count"])
     
     with col3:
-        note_count = pd.read_sql("SELECT COUNT(*) as count FROM notes", conn).iloc[0]['count']
-        st.metric("Notes prises", note_count)
\ No newline at end of file
+        st.metric("Notes prises", totals["note_count"])
\ No newline at end of file
@@ -1,48 +1,332 @@
-import streamlit as st
-from datetime import datetime, date 
+from datetime import date, timedelta
+from db.cache import cached_query
+from db.database import get_connection, current_user_id
+from utils.dates import to_day
+
+HISTORY_PAGE_SIZE = 20
+
+# Rythme d'une habitude : tous les `interval` jours depuis start_day, ou certains jours de la
+# semaine (`weekdays`, un bit par jour, lundi = bit 0). Les deux ne se combinent pas.
+ALL_DAYS = 0b1111111
+WEEKDAYS = 0b0011111
+DAY_NAMES = ("lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche")
+
 
 def get_today_tasks(task_date=None):
     """Récupère les tâches pour une date donnée"""
-    if task_date is None:
-        task_date = date.today()
-    
-    conn = st.session_state.conn
+    return get_tasks_of_day(to_day(task_date))
+
+
+@cached_query
+def get_tasks_of_day(day):
+    """
+    Tâches du jour [(id, title, done, created_at, habit_id)], occurrences des habitudes comprises
+    si elles ont été créées (voir expand_habits). Lecture seule.
+    """
+    conn = get_connection()
+    user_id = current_user_id()
     cur = conn.cursor()
     cur.execute(
-        "SELECT id, title, done, created_at FROM tasks WHERE DATE(created_at)=?",
-        (task_date.strftime("%Y-%m-%d"),)
+        "SELECT id, title, done, created_at, habit_id FROM tasks WHERE user_id = ? AND day = ?",
+        (user_id, day)
     )
     return cur.fetchall()
 
 
+@cached_query
+def get_task_history(limit=HISTORY_PAGE_SIZE, before=None):
+    """
+    Tâches de la plus récente à la plus ancienne [(id, title, done, created_at)], par pages.
+    before : curseur (created_at, id) de la dernière tâche déjà affichée ; la page reprend
+    juste après dans l'index idx_tasks_user_created_at, quelle que soit la profondeur.
+    """
+    conn = get_connection()
+    seek, params = "", (current_user_id(), limit)
+    if before is not None:
+        seek, params = "AND (created_at, id) < (?, ?)", (current_user_id(), *before, limit)
+    return conn.execute(f"""
+        SELECT id, title, done, created_at
+        FROM tasks
+        WHERE user_id = ? {seek}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    """, params).fetchall()
+
+
 def add_task(title, task_date=None):
     """Ajoute une nouvelle tâche"""
-    if task_date is None:
-        task_date = date.today()
-    
-    conn = st.session_state.conn
+    conn = get_connection()
     cur = conn.cursor()
     cur.execute(
-        "INSERT INTO tasks(title, created_at) VALUES (?, ?)",
-        (title, task_date.strftime("%Y-%m-%d"))
+        "INSERT INTO tasks(user_id, title, created_at) VALUES (?, ?, ?)",
+        (current_user_id(), title, to_day(task_date))
     )
     conn.commit()
 
 
 def toggle_task(task_id, done):
-    """Change l'état d'une tâche (fait/pas fait)"""
-    conn = st.session_state.conn
+    """
+    Change l'état d'une tâche (fait/pas fait) ; False si elle n'existe pas.
+    Pour une occurrence d'habitude, ses séries sont mises à jour dans la même transaction.
+    """
+    conn = get_connection()
+    user_id = current_user_id()
+    done = 1 if done else 0
+    rows = conn.execute(
+        "UPDATE tasks SET done=? WHERE id=? AND user_id=? AND done IS NOT ? RETURNING habit_id, day",
+        (done, task_id, user_id, done)
+    ).fetchall()
+    if not rows:
+        # Déjà dans cet état (rien à écrire) ou tâche inexistante__________________________
+        return conn.execute("SELECT 1 FROM tasks WHERE id=? AND user_id=?", (task_id, user_id)).fetchone() is not None
+
+    habit_id, day = rows[0]
+    if habit_id is not None:
+        update_streaks(conn, habit_id, date.fromisoformat(day), done)
+    conn.commit()
+    return True
+
+
+def delete_task(task_id):
+    """
+    Supprime une tâche ; False si elle n'existe pas. Les occurrences d'habitude ne se
+    suppriment pas (elles reviendraient à la lecture du jour) : archiver l'habitude.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM tasks WHERE id=? AND user_id=? AND habit_id IS NULL", (task_id, current_user_id()))
+    conn.commit()
+    return cur.rowcount > 0
+
+
+#Habitudes récurrentes______________________________________________________________________
+def add_habit(title, interval=1, weekdays=ALL_DAYS, start=None):
+    """Crée une habitude ; ses occurrences apparaissent dans les tâches à partir de start (aujourd'hui)"""
+    if interval < 1 or not 0 < weekdays <= ALL_DAYS or (interval > 1 and weekdays != ALL_DAYS):
+        raise ValueError("Rythme invalide : tous les N jours, ou certains jours de la semaine")
+    conn = get_connection()
     cur = conn.cursor()
     cur.execute(
-        "UPDATE tasks SET done=? WHERE id=?",
-        (1 if done else 0, task_id)
+        "INSERT INTO habits (user_id, title, interval, weekdays, start_day) VALUES (?, ?, ?, ?, ?)",
+        (current_user_id(), title, interval, weekdays, to_day(start))
     )
     conn.commit()
+    return cur.lastrowid
 
 
-def delete_task(task_id):
-    """Supprime une tâche"""
-    conn = st.session_state.conn
-    cur = conn.cursor()
-    cur.execute("DELETE FROM tasks WHERE id=?", (task_id,))
-    conn.commit()
\ No newline at end of file
+def archive_habit(habit_id):
+    """
+    Arrête une habitude après aujourd'hui : occurrences passées et séries sont gardées,
+    celles des jours suivants pas encore faites sont supprimées. False si elle n'existe pas.
+    """
+    conn = get_connection()
+    user_id = current_user_id()
+    tomorrow = to_day(date.today() + timedelta(days=1))
+    cur = conn.execute(
+        "UPDATE habits SET end_day = ? WHERE id = ? AND user_id = ? AND end_day IS NULL",
+        (tomorrow, habit_id, user_id)
+    )
+    archived = cur.rowcount > 0
+    conn.execute(
+        "DELETE FROM tasks WHERE habit_id = ? AND user_id = ? AND day >= ? AND done = 0",
+        (habit_id, user_id, tomorrow)
+    )
+    conn.commit()
+    return archived
+
+
+def get_habits():
+    """Habitudes actives et leurs séries au jour d'aujourd'hui (voir get_habit_summaries)"""
+    return get_habit_summaries(to_day())
+
+
+@cached_query
+def get_habit_summaries(day):
+    """
+    Habitudes non archivées [(id, title, rythme, série en cours, meilleure série, taux de réussite)].
+    Tout vient de la table habits, tenue à jour par toggle_task : aucun parcours de l'historique.
+    Le taux est None tant qu'aucune occurrence n'est passée ou faite.
+    """
+    today = date.fromisoformat(day)
+    conn = get_connection()
+    rows = conn.execute("""
+        SELECT id, title, interval, weekdays, start_day, done_count, streak_end, streak_len, older_best
+        FROM habits
+        WHERE user_id = ? AND end_day IS NULL
+        ORDER BY id
+    """, (current_user_id(),)).fetchall()
+
+    summaries = []
+    for habit_id, title, interval, weekdays, start_day, done_count, streak_end, streak_len, older_best in rows:
+        rule = (date.fromisoformat(start_day), interval, weekdays)
+        # La série tient tant que la prochaine occurrence après sa fin n'est pas passée________
+        alive = streak_end is not None and next_due(rule, date.fromisoformat(streak_end)) >= today
+        # Aujourd'hui ne compte qu'une fois fait : la journée n'est pas finie_______________
+        last = today if streak_end is not None and streak_end >= day else prev_due(rule, today)
+        due = due_count(rule, rule[0], last) if last else 0
+        rate = min(1.0, done_count / due) if due else None
+        summaries.append((habit_id, title, describe_rule(interval, weekdays), streak_len if alive else 0,
+                          max(older_best, streak_len), rate))
+    return summaries
+
+
+def expand_habits(task_date=None):
+    """
+    Crée les occurrences du jour (aujourd'hui par défaut) des habitudes actives qui n'en ont
+    pas encore ; renvoie le nombre créées. Appelée explicitement avant d'afficher un jour
+    (dashboard) ou une fois par jour (API) : rien n'est généré à l'avance. Tant que rien ne
+    manque, ne coûte qu'une lecture du cache (missing_occurrences).
+    """
+    day = to_day(task_date)
+    due = missing_occurrences(day)
+    if not due:
+        return 0
+    conn = get_connection()
+    user_id = current_user_id()
+    # Index unique (habit_id, day) : une occurrence créée entre-temps est ignorée____________
+    conn.executemany(
+        "INSERT OR IGNORE INTO tasks (user_id, title, created_at, habit_id) VALUES (?, ?, ?, ?)",
+        ((user_id, title, day, habit_id) for habit_id, title in due)
+    )
+    conn.commit()
+    return len(due)
+
+
+@cached_query
+def missing_occurrences(day):
+    """Habitudes actives dues ce jour-là sans occurrence [(id, title)] (lecture seule)"""
+    habits = get_connection().execute("""
+        SELECT id, title, start_day, interval, weekdays FROM habits
+        WHERE user_id = ?1 AND start_day <= ?2 AND (end_day IS NULL OR end_day > ?2)
+          AND NOT EXISTS (SELECT 1 FROM tasks WHERE tasks.habit_id = habits.id AND tasks.day = ?2)
+    """, (current_user_id(), day)).fetchall()
+    when = date.fromisoformat(day)
+    return [
+        (habit_id, title)
+        for habit_id, title, start_day, interval, weekdays in habits
+        if is_due((date.fromisoformat(start_day), interval, weekdays), when)
+    ]
+
+
+#Séries______________________________________________________________________________________
+# Une série est une suite d'occurrences consécutives toutes faites. habits garde la plus
+# récente (streak_start, streak_end, streak_len) et la meilleure des précédentes (older_best) :
+# le record est max(older_best, streak_len).
+
+def update_streaks(conn, habit_id, day, done):
+    """Met à jour les séries d'une habitude après avoir coché (done) ou décoché son occurrence de day"""
+    start_day, interval, weekdays, done_count, start, end, length, older_best = conn.execute("""
+        SELECT start_day, interval, weekdays, done_count, streak_start, streak_end, streak_len, older_best
+        FROM habits WHERE id = ?
+    """, (habit_id,)).fetchone()
+    rule = (date.fromisoformat(start_day), interval, weekdays)
+    start = start and date.fromisoformat(start)
+    end = end and date.fromisoformat(end)
+
+    streaks = next_streaks(rule, day, done, start, end, length, older_best)
+    if streaks is None:
+        streaks = scan_streaks(conn, rule, habit_id)
+    start, end, length, older_best = streaks
+    conn.execute("""
+        UPDATE habits SET done_count = ?, streak_start = ?, streak_end = ?, streak_len = ?, older_best = ?
+        WHERE id = ?
+    """, (done_count + (1 if done else -1), start and to_day(start), end and to_day(end), length, older_best, habit_id))
+
+
+def next_streaks(rule, day, done, start, end, length, older_best):
+    """
+    Séries après avoir coché ou décoché day, en temps constant : (début, fin, longueur) de la
+    série la plus récente et meilleure des précédentes. None quand day touche une série plus
+    ancienne, dont on ne garde pas les bornes (retouche de l'historique) : voir scan_streaks.
+    """
+    if done:
+        if end is None or day > next_due(rule, end):
+            return day, day, 1, max(older_best, length)  # nouvelle série, la précédente passe derrière
+        if day == next_due(rule, end):
+            return start, day, length + 1, older_best
+        return None  # jour plus ancien : il peut relier deux séries passées
+
+    # Décoché : seule la série la plus récente se traite sans relire l'historique___________
+    if end is None or not start <= day <= end:
+        return None
+    if length == 1:
+        return None  # elle disparaît : la plus récente devient une série plus ancienne
+    if day == end:
+        end = prev_due(rule, day)
+    elif day == start:
+        start = next_due(rule, day)
+    else:
+        # Coupée en deux : le début devient une série précédente_____________________________
+        older_best = max(older_best, due_count(rule, start, prev_due(rule, day)))
+        start = next_due(rule, day)
+    return start, end, due_count(rule, start, end), older_best
+
+
+def scan_streaks(conn, rule, habit_id):
+    """Séries recalculées depuis les occurrences faites de l'habitude (index habit_id, day)"""
+    start = end = None
+    length = older_best = 0
+    for (day,) in conn.execute("SELECT day FROM tasks WHERE habit_id = ? AND done = 1 ORDER BY day", (habit_id,)):
+        day = date.fromisoformat(day)
+        if end is not None and day == next_due(rule, end):
+            length += 1
+        else:
+            start, length, older_best = day, 1, max(older_best, length)
+        end = day
+    return start, end, length, older_best
+
+
+#Calendrier d'une habitude (rule = (start_day, interval, weekdays), en dates)_____________________
+def is_due(rule, day):
+    start, interval, weekdays = rule
+    return day >= start and (day - start).days % interval == 0 and weekdays >> day.weekday() & 1
+
+
+def next_due(rule, day):
+    """Première occurrence après day"""
+    start, interval, weekdays = rule
+    if day < start:
+        day = start - timedelta(days=1)
+    if interval > 1:
+        return start + timedelta(days=((day - start).days // interval + 1) * interval)
+    day += timedelta(days=1)
+    while not weekdays >> day.weekday() & 1:
+        day += timedelta(days=1)
+    return day
+
+
+def prev_due(rule, day):
+    """Dernière occurrence avant day ; None s'il n'y en a pas"""
+    start, interval, weekdays = rule
+    if interval > 1:
+        steps = ((day - start).days - 1) // interval
+        return start + timedelta(days=steps * interval) if steps >= 0 else None
+    day -= timedelta(days=1)
+    while day >= start and not weekdays >> day.weekday() & 1:
+        day -= timedelta(days=1)
+    return day if day >= start else None
+
+
+def due_count(rule, first, last):
+    """Nombre d'occurrences entre first et last inclus, sans les énumérer"""
+    start, interval, weekdays = rule
+    first = max(first, start)
+    if last < first:
+        return 0
+    if interval > 1:
+        first_step = -(-(first - start).days // interval)  # arrondi au-dessus
+        return (last - start).days // interval - first_step + 1
+    weeks, rest = divmod((last - first).days + 1, 7)
+    return weeks * bin(weekdays).count("1") + sum(
+        weekdays >> ((first.weekday() + i) % 7) & 1 for i in range(rest)
+    )
+
+
+def describe_rule(interval, weekdays):
+    if interval > 1:
+        return f"tous les {interval} jours"
+    if weekdays == ALL_DAYS:
+        return "tous les jours"
+    if weekdays == WEEKDAYS:
+        return "en semaine"
+    return "le " + ", ".join(name for i, name in enumerate(DAY_NAMES) if weekdays >> i & 1)
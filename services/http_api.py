@@ -0,0 +1,492 @@
+"""
+API HTTP JSON sans interface : humeurs, tâches, notes, statistiques, recherche et exports.
+
+Pour les scripts et les raccourcis mobiles qui veulent noter une humeur ou ajouter une tâche
+sans passer par le dashboard. Serveur de la bibliothèque standard, un thread par requête ;
+chaque requête prend une connexion du pool (db.database) et la rend à la fin.
+
+Lancement :
+    python -m services.http_api                                  # http://127.0.0.1:8765
+    HELPDESK_API_TOKEN=secret python -m services.http_api --host 0.0.0.0
+
+Le profil est donné par l'en-tête X-Profil (ou ?profil=) ; si HELPDESK_API_TOKEN est défini,
+chaque requête doit envoyer « Authorization: Bearer <jeton> » (obligatoire hors de la machine).
+
+    GET    /profils
+    GET    /moods?start=&end=          humeur moyenne par jour
+    GET    /moods/today
+    POST   /moods                      un objet ou une liste (mêmes champs que bulk_import)
+    GET    /tasks?day=                 (lecture seule ; occurrences d'habitude : voir expand_daily)
+    GET    /tasks/history?limit=&before=CREATED_AT,ID
+    POST   /tasks
+    PATCH  /tasks/<id>                 {"done": true}
+    DELETE /tasks/<id>                 (pas les occurrences d'habitude)
+    GET    /habits                     séries et taux de réussite
+    GET    /notes?limit=&before=CREATED_AT,ID
+    POST   /notes
+    GET    /stats?start=&end=
+    GET    /search?q=&start=&end=&order=recent|relevance
+    GET    /export/excel?start=&end=&sheets=Humeurs,Notes
+    GET    /export/pdf?start=&end=
+
+Les lectures renvoient un ETag (version des données du profil et jour courant) : avec
+If-None-Match, une réponse inchangée revient en 304 sans corps et sans refaire la requête.
+Les écritures passent par services.bulk_import (un lot par transaction) et insèrent toutes
+leurs lignes, même identiques à des lignes existantes. Pour pouvoir renvoyer une écriture
+après une coupure réseau sans doublons, envoyer un en-tête « Idempotency-Key: <clé unique> » :
+la même clé renvoie la réponse de la première requête sans rien réinsérer (clés gardées
+IDEMPOTENCY_TTL_HOURS heures ; 409 si la première est encore en cours, 422 si le corps diffère).
+"""
+import argparse
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from datetime import date
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from db.cache import data_version
+from db.database import get_connection, current_user_id, release_connection, set_current_user
+from db.models import init_db, list_profiles
+from services import export_service, habit_service, mood_service, search_service, stats_service
+from services.bulk_import import IMPORT_FIELDS, import_records
+from utils.dates import to_day
+
+HOST = "127.0.0.1"
+PORT = 8765
+TOKEN = os.environ.get("HELPDESK_API_TOKEN")
+MAX_BODY_BYTES = 5 * 1024 * 1024  # lots de plusieurs milliers de lignes
+MAX_PAGE = 200  # lignes max par page d'historique
+EXPAND_EVERY = 15 * 60  # secondes entre deux vérifications des occurrences d'habitude du jour
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_TTL_HOURS = 24
+MAX_KEY_LENGTH = 255
+COPY_CHUNK_BYTES = 64 * 1024  # fichiers envoyés par morceaux (export Excel)
+
+
+class ApiError(Exception):
+    """Erreur renvoyée au client : {"error": message} avec le statut HTTP"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+#Paramètres de requête________________________________________________________________________
+def _day(params, name, default=None):
+    value = params.get(name)
+    if not value:
+        return default
+    try:
+        return to_day(date.fromisoformat(value))
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} : date AAAA-MM-JJ attendue")
+
+
+def _limit(params, default):
+    try:
+        return max(1, min(MAX_PAGE, int(params.get("limit", default))))
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "limit : nombre attendu")
+
+
+def _cursor(params):
+    """Curseur "created_at,id" de la dernière ligne déjà reçue (voir get_task_history)"""
+    value = params.get("before")
+    if not value:
+        return None
+    created_at, _, row_id = value.rpartition(",")
+    if not created_at or not row_id.isdigit():
+        raise ApiError(HTTPStatus.BAD_REQUEST, "before : CREATED_AT,ID attendu")
+    return created_at, int(row_id)
+
+
+def _page(rows, columns, limit):
+    """Page d'historique et curseur de la suivante (None s'il n'y en a plus)"""
+    items = [dict(zip(columns, row)) for row in rows]
+    following = f"{rows[-1][-1]},{rows[-1][0]}" if len(rows) == limit else None
+    return {"items": items, "next": following}
+
+
+def _records(body):
+    """Corps JSON -> liste de dictionnaires (un objet seul ou une liste)"""
+    records = [body] if isinstance(body, dict) else body
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "objet ou liste d'objets JSON attendu")
+    return records
+
+
+def _import(table, body, key=None):
+    """Écriture d'un lot ; avec une Idempotency-Key, une requête déjà traitée est rejouée (_idempotent)"""
+    def run():
+        records = _records(body)
+        report = import_records(records, table, {field: field for field in IMPORT_FIELDS[table]}, dedupe=False)
+        return HTTPStatus.CREATED if report["inserted"] else HTTPStatus.OK, report
+
+    if key is None:
+        return run()
+    return _idempotent(key, json.dumps([table, body], sort_keys=True).encode(), run)
+
+
+def _idempotent(key, request, run):
+    """
+    Exécute run() une seule fois par clé et par profil, et garde sa réponse pour les
+    renvois. La clé est réservée avant l'écriture (transaction courte) : une requête avec la
+    même clé arrivée pendant celle-ci reçoit 409 ; une requête différente avec la même clé, 422.
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{IDEMPOTENCY_HEADER} : 1 à {MAX_KEY_LENGTH} caractères")
+    conn = get_connection()
+    user_id = current_user_id()
+    fingerprint = hashlib.sha256(request).digest()
+    with conn:
+        conn.execute("DELETE FROM api_requests WHERE created_at < datetime('now', ?)",
+                     (f"-{IDEMPOTENCY_TTL_HOURS} hours",))
+        reserved = conn.execute(
+            "INSERT OR IGNORE INTO api_requests (user_id, key, fingerprint) VALUES (?, ?, ?)",
+            (user_id, key, fingerprint)
+        ).rowcount
+
+    if not reserved:
+        row = conn.execute("SELECT fingerprint, status, response FROM api_requests WHERE user_id = ? AND key = ?",
+                           (user_id, key)).fetchone()
+        if row is None or row[1] is None:
+            raise ApiError(HTTPStatus.CONFLICT, f"requête {key} en cours de traitement")
+        if row[0] != fingerprint:
+            raise ApiError(HTTPStatus.UNPROCESSABLE_ENTITY,
+                           f"{IDEMPOTENCY_HEADER} {key} déjà utilisée pour une autre requête")
+        return HTTPStatus(row[1]), json.loads(row[2])
+
+    try:
+        status, payload = run()
+    except BaseException:
+        with conn:  # la requête pourra être renvoyée avec la même clé
+            conn.execute("DELETE FROM api_requests WHERE user_id = ? AND key = ?", (user_id, key))
+        raise
+    with conn:
+        conn.execute("UPDATE api_requests SET status = ?, response = ? WHERE user_id = ? AND key = ?",
+                     (int(status), json.dumps(payload, ensure_ascii=False), user_id, key))
+    return status, payload
+
+
+#Points d'entrée______________________________________________________________________________
+# Chaque fonction reçoit (paramètres, corps JSON, identifiant dans le chemin) et renvoie
+# (statut, objet JSON) ou (statut, (type MIME, octets, nom du fichier)).
+def get_profiles(params, body, _):
+    return HTTPStatus.OK, [{"id": user_id, "prenom": prenom} for user_id, prenom in list_profiles()]
+
+
+def get_moods(params, body, _):
+    rows = stats_service.get_daily_mood(_day(params, "start"), _day(params, "end"))
+    return HTTPStatus.OK, [dict(zip(("day", "avg", "min", "max"), row)) for row in rows]
+
+
+def get_today_mood(params, body, _):
+    mood = mood_service.get_today_mood()
+    return HTTPStatus.OK, {
+        "logged": mood is not None,
+        "mood": dict(zip(("mood_value", "emotion", "motivation"), mood)) if mood else None,
+    }
+
+
+def get_tasks(params, body, _):
+    rows = habit_service.get_tasks_of_day(_day(params, "day", to_day()))
+    return HTTPStatus.OK, [dict(zip(("id", "title", "done", "created_at", "habit_id"), row)) for row in rows]
+
+
+def get_task_history(params, body, _):
+    limit = _limit(params, habit_service.HISTORY_PAGE_SIZE)
+    rows = habit_service.get_task_history(limit, _cursor(params))
+    return HTTPStatus.OK, _page(rows, ("id", "title", "done", "created_at"), limit)
+
+
+def patch_task(params, body, task_id):
+    if not isinstance(body, dict) or not isinstance(body.get("done"), bool):
+        raise ApiError(HTTPStatus.BAD_REQUEST, '{"done": true|false} attendu')
+    if not habit_service.toggle_task(task_id, body["done"]):
+        raise ApiError(HTTPStatus.NOT_FOUND, f"tâche {task_id} introuvable")
+    return HTTPStatus.OK, {"id": task_id, "done": body["done"]}
+
+
+def delete_task(params, body, task_id):
+    if not habit_service.delete_task(task_id):
+        raise ApiError(HTTPStatus.NOT_FOUND, f"tâche {task_id} introuvable (une occurrence d'habitude ne se supprime pas)")
+    return HTTPStatus.NO_CONTENT, None
+
+
+def get_habits(params, body, _):
+    return HTTPStatus.OK, [
+        dict(zip(("id", "title", "rhythm", "streak", "best_streak", "completion_rate"), row))
+        for row in habit_service.get_habits()
+    ]
+
+
+def get_notes(params, body, _):
+    limit = _limit(params, mood_service.NOTES_PAGE_SIZE)
+    rows = mood_service.get_notes_history(limit, _cursor(params))
+    return HTTPStatus.OK, _page(rows, ("id", "content", "created_at"), limit)
+
+
+def get_stats(params, body, _):
+    start, end = _day(params, "start"), _day(params, "end")
+    if start is None and end is None:
+        return HTTPStatus.OK, stats_service.get_totals()
+    return HTTPStatus.OK, stats_service.get_period_totals(start or "0000-00-00", end or to_day())
+
+
+def get_search(params, body, _):
+    order = params.get("order", search_service.RECENT)
+    if order not in (search_service.RECENT, search_service.RELEVANCE):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "order : recent ou relevance")
+    results, _ = search_service.search_journal(params.get("q", ""), _day(params, "start"), _day(params, "end"), order)
+    return HTTPStatus.OK, [dict(zip(("type", "id", "created_at", "snippet"), result)) for result in results]
+
+
+def get_excel(params, body, _):
+    sheets = params.get("sheets", ",".join(export_service.EXPORT_SHEETS)).split(",")
+    unknown = [name for name in sheets if name not in export_service.EXPORT_SHEETS]
+    if unknown:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"feuilles inconnues : {', '.join(unknown)}")
+    start, end = _day(params, "start"), _day(params, "end")
+    # Le fichier temporaire est envoyé tel quel, sans copie en mémoire (fermé par _respond)_____
+    f = export_service.build_excel(sheets, start and date.fromisoformat(start), end and date.fromisoformat(end))
+    return HTTPStatus.OK, ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", f,
+                           f"donnees_helpdesk_{date.today():%Y%m%d}.xlsx")
+
+
+def get_pdf(params, body, _):
+    start = _day(params, "start") or stats_service.get_first_day() or to_day()
+    content = export_service.build_pdf_report(start, _day(params, "end", to_day()), to_day())
+    return HTTPStatus.OK, ("application/pdf", content, f"rapport_helpdesk_{date.today():%Y%m%d}.pdf")
+
+
+# (méthode, chemin) -> fonction ; <id> dans le chemin = entier_____________________________________
+ROUTES = {
+    ("GET", "/profils"): get_profiles,
+    ("GET", "/moods"): get_moods,
+    ("GET", "/moods/today"): get_today_mood,
+    ("POST", "/moods"): lambda params, body, _: _import("mood", body, params[IDEMPOTENCY_HEADER]),
+    ("GET", "/tasks"): get_tasks,
+    ("GET", "/tasks/history"): get_task_history,
+    ("POST", "/tasks"): lambda params, body, _: _import("tasks", body, params[IDEMPOTENCY_HEADER]),
+    ("PATCH", "/tasks/<id>"): patch_task,
+    ("DELETE", "/tasks/<id>"): delete_task,
+    ("GET", "/habits"): get_habits,
+    ("GET", "/notes"): get_notes,
+    ("POST", "/notes"): lambda params, body, _: _import("notes", body, params[IDEMPOTENCY_HEADER]),
+    ("GET", "/stats"): get_stats,
+    ("GET", "/search"): get_search,
+    ("GET", "/export/excel"): get_excel,
+    ("GET", "/export/pdf"): get_pdf,
+}
+WITHOUT_PROFILE = {get_profiles}
+ID_SEGMENT = re.compile(r"/(\d+)$")
+
+
+def resolve(method, path):
+    """(fonction, identifiant ou None) ; ApiError 404/405 si la route n'existe pas"""
+    path = path.rstrip("/") or "/"
+    match = ID_SEGMENT.search(path)
+    row_id = int(match.group(1)) if match else None
+    if match:
+        path = path[:match.start()] + "/<id>"
+    if (method, path) in ROUTES:
+        return ROUTES[method, path], row_id
+    if any(route_path == path for _, route_path in ROUTES):
+        raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} non permis sur {path}")
+    raise ApiError(HTTPStatus.NOT_FOUND, f"{path} inconnu")
+
+
+def etag(user_id=None):
+    """Version des données (base, profil) et jour : les réponses « du jour » changent à minuit"""
+    version, user_version = data_version(user_id=user_id)
+    return f'W/"{version}-{user_version}-{to_day()}"'
+
+
+#Serveur______________________________________________________________________________________
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "HelpDeskAPI/1.0"
+    protocol_version = "HTTP/1.1"  # connexions gardées ouvertes entre deux requêtes
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _handle(self, method):
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        params[IDEMPOTENCY_HEADER] = self.headers.get(IDEMPOTENCY_HEADER)  # en-tête seulement, jamais ?Idempotency-Key=
+        try:
+            self._check_token()
+            body = self._read_body()
+            handler, row_id = resolve(method, url.path)
+            user_id = None if handler in WITHOUT_PROFILE else self._profile(params)
+            set_current_user(user_id)
+            if method == "GET":
+                self._respond_cached(user_id, lambda: handler(params, body, row_id))
+            else:
+                self._respond(*handler(params, body, row_id))
+        except ApiError as e:
+            self._respond(e.status, {"error": str(e)})
+        except Exception as e:
+            self.log_error("%s %s : %r", method, url.path, e)
+            self._respond(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "erreur interne"})
+        finally:
+            set_current_user(None)
+            release_connection()  # le thread de la requête se termine : connexion rendue au pool
+
+    def _check_token(self):
+        if TOKEN is None:
+            return
+        if not hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {TOKEN}"):
+            raise ApiError(HTTPStatus.UNAUTHORIZED, "jeton manquant ou invalide")
+
+    def _read_body(self):
+        length = self.headers.get("Content-Length") or "0"
+        if not length.isdigit():
+            self.close_connection = True  # corps non lu : la connexion ne peut pas resservir
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Content-Length : nombre d'octets attendu")
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"corps limité à {MAX_BODY_BYTES} octets")
+        if not length:
+            return None
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "JSON invalide")
+
+    def _profile(self, params):
+        value = self.headers.get("X-Profil") or params.get("profil")
+        if not value or not value.isdigit():
+            raise ApiError(HTTPStatus.BAD_REQUEST, "profil manquant (en-tête X-Profil ou ?profil=)")
+        user_id = int(value)
+        if not get_connection().execute("SELECT 1 FROM users WHERE id = ?", (user_id,)).fetchone():
+            raise ApiError(HTTPStatus.NOT_FOUND, f"profil {user_id} inconnu")
+        return user_id
+
+    def _respond_cached(self, user_id, run):
+        """Lecture : 304 sans rien calculer si le client a déjà cette version"""
+        tag = etag(user_id)
+        sent = {value.strip() for value in self.headers.get("If-None-Match", "").split(",")}
+        if tag in sent or "*" in sent:
+            self._respond(HTTPStatus.NOT_MODIFIED, None, tag)
+            return
+        self._respond(*run(), tag)
+
+    def _respond(self, status, payload, tag=None):
+        """payload : objet JSON, None, ou (type, contenu, nom du fichier) ; contenu = octets ou fichier"""
+        if isinstance(payload, tuple):
+            content_type, content, filename = payload
+        else:
+            content_type = "application/json; charset=utf-8"
+            content = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode()
+            filename = None
+        try:
+            if isinstance(content, bytes):
+                size = len(content)
+            else:
+                content.seek(0, os.SEEK_END)
+                size = content.tell()
+                content.seek(0)
+            self.send_response(status)
+            if tag:
+                self.send_header("ETag", tag)
+                self.send_header("Cache-Control", "private, no-cache")
+            if status not in (HTTPStatus.NO_CONTENT, HTTPStatus.NOT_MODIFIED):
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(size))
+                if filename:
+                    self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
+            self.end_headers()
+            if status not in (HTTPStatus.NO_CONTENT, HTTPStatus.NOT_MODIFIED):
+                if isinstance(content, bytes):
+                    self.wfile.write(content)
+                else:
+                    shutil.copyfileobj(content, self.wfile, COPY_CHUNK_BYTES)
+        finally:
+            if not isinstance(content, bytes):
+                content.close()
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, verbose=False):
+        super().__init__(address, ApiHandler)
+        self.verbose = verbose
+
+
+def expand_daily(every=EXPAND_EVERY):
+    """
+    Thread de fond : crée les occurrences d'habitude du jour de chaque profil (les lectures de
+    l'API n'écrivent rien). Tant que rien ne manque, une vérification ne lit que le cache ;
+    un nouveau jour ou une habitude créée depuis le dashboard est pris en compte à la suivante.
+    """
+    def run():
+        while True:
+            try:
+                for user_id, _ in list_profiles():
+                    set_current_user(user_id)
+                    habit_service.expand_habits()
+            except Exception as e:
+                print(f"Occurrences d'habitude non créées : {e!r}", file=sys.stderr)
+            finally:
+                set_current_user(None)
+            time.sleep(every)
+
+    threading.Thread(target=run, name="habits", daemon=True).start()
+
+
+def _is_local(host):
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP JSON de Help-Desk")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--verbose", action="store_true", help="affiche chaque requête")
+    args = parser.parse_args()
+
+    # Hors de la machine, les données ne sont accessibles qu'avec un jeton____________________
+    if not _is_local(args.host) and TOKEN is None:
+        sys.exit("Définir HELPDESK_API_TOKEN pour écouter ailleurs que sur 127.0.0.1")
+
+    init_db()
+    expand_daily()
+    server = ApiServer((args.host, args.port), args.verbose)
+    print(f"API Help-Desk sur http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
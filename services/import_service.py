@@ -0,0 +1,77 @@
+import streamlit as st
+from services.bulk_import import (
+    IMPORT_FIELDS, REQUIRED_FIELDS, MOOD_MAX, read_records, guess_mapping, import_records
+)
+from utils.profiling import profiled
+
+# Tables proposées à l'import_________________________________________________________________
+IMPORT_TABLES = {
+    "Humeurs": "mood",
+    "Tâches": "tasks",
+    "Notes": "notes",
+}
+NOT_MAPPED = "—"
+
+
+@profiled
+def render_import_section():
+    """Import de l'historique d'un autre journal (voir services/bulk_import.py)"""
+    st.header("📤 Importer un historique")
+    st.markdown("""
+    Tu viens d'une autre application ou d'un bullet journal ? Importe ton historique
+    depuis un fichier CSV, Excel ou JSON. Les lignes déjà importées sont ignorées.
+    """)
+
+    uploaded = st.file_uploader("Fichier à importer", type=["csv", "tsv", "xlsx", "json", "jsonl"], key="import_file")
+    if uploaded is None:
+        return
+
+    label = st.selectbox("Importer dans", list(IMPORT_TABLES), key="import_table")
+    table = IMPORT_TABLES[label]
+    try:
+        headers, _ = read_records(uploaded, uploaded.name)
+    except Exception as e:
+        st.error(f"❌ Fichier illisible : {e}")
+        return
+
+    #Association des colonnes (devinée, modifiable)_____________________________________________
+    guessed = guess_mapping(headers, table)
+    options = [NOT_MAPPED] + list(headers)
+    mapping = {}
+    cols = st.columns(len(IMPORT_FIELDS[table]))
+    for col, field in zip(cols, IMPORT_FIELDS[table]):
+        with col:
+            choice = st.selectbox(
+                field + (" *" if field == REQUIRED_FIELDS[table] else ""),
+                options,
+                index=options.index(guessed[field]) if field in guessed else 0,
+                key=f"import_map_{table}_{field}"
+            )
+            if choice != NOT_MAPPED:
+                mapping[field] = choice
+
+    scale = MOOD_MAX
+    if table == "mood":
+        scale = st.number_input("Note maximale dans l'ancienne application", 2, 100, MOOD_MAX, key="import_scale")
+
+    if st.button("📤 Importer", type="primary", disabled=REQUIRED_FIELDS[table] not in mapping):
+        try:
+            bar = st.progress(0.0, text="Import en cours...")
+            _, records = read_records(uploaded, uploaded.name)
+            report = import_records(
+                records, table, mapping, scale=scale,
+                progress=lambda read, inserted: bar.progress(min(1.0, uploaded.tell() / uploaded.size),
+                                                             text=f"{read} lignes lues...")
+            )
+            bar.empty()
+            st.success(
+                f"✅ {report['inserted']} lignes importées en {report['seconds']:.1f} s "
+                f"({report['rows_per_second']:,.0f} lignes/s)"
+            )
+            if report["duplicates"]:
+                st.info(f"{report['duplicates']} lignes déjà présentes ignorées")
+            if report["rejected"]:
+                st.warning(f"{report['rejected']} lignes sans {REQUIRED_FIELDS[table]} valide "
+                           "ou avec une date illisible ignorées")
+        except Exception as e:
+            st.error(f"❌ Erreur lors de l'import : {str(e)}")
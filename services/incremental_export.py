@@ -0,0 +1,182 @@
+"""
+Export incrémental : seulement ce qui a été ajouté, modifié ou supprimé depuis le dernier export.
+
+Les triggers de la table change_log notent chaque écriture sur mood, tasks et notes ;
+export_watermarks garde, par profil et par table, le dernier numéro déjà exporté.
+Le premier export d'un profil contient tout son historique : avant lui, rien n'est noté
+(migration v13), le journal ne grossit pas pour les profils qui n'exportent jamais.
+
+Lancement sans le dashboard (ex: tâche cron hebdomadaire) :
+    python -m services.incremental_export              # un export par profil, puis fin
+    python -m services.incremental_export --user 2 --every-days 7 --format csv
+"""
+import argparse
+import csv
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from db.database import get_connection, current_user_id, set_current_user, DB_PATH
+from db.models import init_db, list_profiles, TABLE_COLUMNS, encrypted_positions
+from utils.security import decrypt_rows
+
+EXPORT_DIR = DB_PATH.parent / "exports"
+TRACKED_TABLES = ("mood", "tasks", "notes")
+CHUNK_SIZE = 500  # lignes relues à la fois
+FIRST_EXPORT = -1  # last_seq d'un profil inscrit dont le premier export n'est pas encore écrit
+
+
+@contextmanager
+def _snapshot(conn):
+    """
+    Transaction de lecture : tout ce qui est lu à l'intérieur vient de la même version de la base.
+    Une transaction déjà ouverte sur la connexion du thread est validée d'abord (on ne peut pas
+    en ouvrir une seconde) ; la lecture est toujours terminée, même en cas d'erreur.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+
+
+def _changed_ids(conn, user_id, table, since, until):
+    """Identifiants modifiés entre deux numéros ; None = premier export (toutes les lignes du profil)"""
+    if since is None or since == FIRST_EXPORT:
+        return None
+    rows = conn.execute("""
+        SELECT DISTINCT row_id FROM change_log
+        WHERE user_id = ? AND table_name = ? AND seq > ? AND seq <= ?
+    """, (user_id, table, since, until))
+    return [row_id for row_id, in rows]
+
+
+def _iter_changes(conn, user_id, table, ids):
+    """Renvoie (op, ligne) ; une ligne disparue depuis est signalée comme supprimée"""
+    columns = TABLE_COLUMNS[table]
+    encrypted = encrypted_positions(table, columns)
+    select = f"SELECT {', '.join(columns)} FROM {table}"
+
+    if ids is None:
+        cursor = conn.execute(select + " WHERE user_id = ? ORDER BY id", (user_id,))
+        while rows := cursor.fetchmany(CHUNK_SIZE):
+            for row in decrypt_rows(rows, encrypted):
+                yield "upsert", dict(zip(columns, row))
+        return
+
+    for i in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[i:i + CHUNK_SIZE]
+        placeholders = ", ".join("?" * len(chunk))
+        rows = conn.execute(f"{select} WHERE user_id = ? AND id IN ({placeholders})", (user_id, *chunk)).fetchall()
+        found = {row[0]: dict(zip(columns, row)) for row in decrypt_rows(rows, encrypted)}
+        for row_id in chunk:
+            if row_id in found:
+                yield "upsert", found[row_id]
+            else:
+                yield "delete", {"id": row_id}
+
+
+def export_changes(export_format="jsonl", export_dir=None):
+    """
+    Écrit les changements du profil actif depuis son dernier export et avance ses points de reprise.
+    Renvoie {"files": [...], "counts": {table: nombre}} ; aucun fichier s'il n'y a rien de nouveau.
+    """
+    conn = get_connection()
+    user_id = current_user_id()
+    export_dir = Path(export_dir or EXPORT_DIR)
+    export_dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    # Inscription du profil : ses écritures sont notées à partir de maintenant (voir v13)__________
+    with conn:
+        conn.executemany("""
+            INSERT OR IGNORE INTO export_watermarks (user_id, table_name, last_seq, exported_at) VALUES (?, ?, ?, '')
+        """, [(user_id, table, FIRST_EXPORT) for table in TRACKED_TABLES])
+
+    # Lecture cohérente : tout ce qui arrive après `until` partira au prochain export____________
+    # Un fichier n'est créé qu'à sa première ligne : rien de nouveau, aucun fichier________________
+    counts, files, opened = {}, [], []
+
+    def open_output(name, header=None):
+        path = export_dir / name
+        f = open(path, "w", newline="", encoding="utf-8")
+        opened.append(f)
+        files.append(path)
+        if header:
+            csv.writer(f).writerow(header)
+        return f
+
+    jsonl = None
+    try:
+        with _snapshot(conn):
+            until = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+            watermarks = dict(conn.execute("SELECT table_name, last_seq FROM export_watermarks WHERE user_id = ?",
+                                           (user_id,)))
+            for table in TRACKED_TABLES:
+                ids = _changed_ids(conn, user_id, table, watermarks.get(table), until)
+                counts[table] = 0
+                if ids == []:
+                    continue
+
+                writer = None
+                for op, row in _iter_changes(conn, user_id, table, ids):
+                    if export_format == "csv":
+                        if writer is None:
+                            writer = csv.writer(open_output(f"{table}_u{user_id}_{stamp}.csv",
+                                                            ("op",) + TABLE_COLUMNS[table]))
+                        writer.writerow([op] + [row.get(c) for c in TABLE_COLUMNS[table]])
+                    else:
+                        if jsonl is None:
+                            jsonl = open_output(f"journal_u{user_id}_{stamp}.jsonl")
+                        jsonl.write(json.dumps({"table": table, "op": op, "row": row}, ensure_ascii=False) + "\n")
+                    counts[table] += 1
+    finally:
+        for f in opened:
+            f.close()
+
+    # Fichiers écrits : on avance les points de reprise et on purge le journal____________________
+    with conn:
+        now = datetime.now().isoformat(timespec="seconds")
+        conn.executemany("""
+            INSERT INTO export_watermarks (user_id, table_name, last_seq, exported_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, table_name) DO UPDATE SET last_seq = excluded.last_seq, exported_at = excluded.exported_at
+        """, [(user_id, table, until, now) for table in TRACKED_TABLES])
+        conn.execute("DELETE FROM change_log WHERE user_id = ? AND seq <= ?", (user_id, until))
+
+    return {"files": files, "counts": counts}
+
+
+def last_export():
+    """Date du dernier export incrémental du profil actif, ou None"""
+    conn = get_connection()
+    row = conn.execute("SELECT MAX(exported_at) FROM export_watermarks WHERE user_id = ? AND last_seq <> ?",
+                       (current_user_id(), FIRST_EXPORT)).fetchone()
+    return row[0] if row else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export incrémental Help-Desk")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--dir", default=None, help=f"dossier de sortie (défaut : {EXPORT_DIR})")
+    parser.add_argument("--every-days", type=float, default=0, help="relance l'export tous les N jours")
+    parser.add_argument("--user", type=int, default=None, help="identifiant du profil (défaut : tous)")
+    args = parser.parse_args()
+
+    init_db()
+    while True:
+        for user_id in [args.user] if args.user else [user_id for user_id, _ in list_profiles()]:
+            set_current_user(user_id)
+            result = export_changes(args.format, args.dir)
+            print(f"{datetime.now():%Y-%m-%d %H:%M} profil {user_id} : {result['counts']} -> "
+                  f"{[str(f) for f in result['files']]}")
+        if not args.every_days:
+            return
+        time.sleep(args.every_days * 86400)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,77 @@
-import streamlit as st
-from datetime import date
+from db.cache import cached_query
+from db.database import get_connection, current_user_id
+from services.stats_service import get_daily_mood
+from utils.dates import to_day
+from utils.security import encrypt_value, decrypt_value, decrypt_rows
 
-@st.cache_data
+NOTES_PAGE_SIZE = 5
+
+@cached_query
 def get_mood_history():
-    conn = st.session_state.conn
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT created_at, mood_value
-        FROM mood
-        ORDER BY created_at
-    """)
-    return cur.fetchall()
+    """Humeur moyenne par jour [(day, moyenne)], lue dans daily_stats (une ligne par jour)"""
+    return [(day, avg) for day, avg, _, _ in get_daily_mood()]
 
 def check_mood_logged_today():
     """Vérifie si l'humeur a déjà été enregistrée aujourd'hui"""
-    conn = st.session_state.conn
+    return mood_logged_on(to_day())
+
+@cached_query
+def mood_logged_on(day):
+    conn = get_connection()
     cur = conn.cursor()
-    today = date.today().isoformat()
     cur.execute("""
-        SELECT COUNT(*)
+        SELECT EXISTS(SELECT 1 FROM mood WHERE user_id = ? AND day = ?)
+    """, (current_user_id(), day))
+    return bool(cur.fetchone()[0])
+
+def get_today_mood():
+    """Dernière humeur du jour (mood_value, emotion, motivation) ou None"""
+    return get_mood_of_day(to_day())
+
+@cached_query
+def get_mood_of_day(day):
+    conn = get_connection()
+    row = conn.execute("""
+        SELECT mood_value, emotion, motivation
         FROM mood
-        WHERE DATE(created_at) = ?
-    """, (today,))
-    count = cur.fetchone()[0]
-    return count > 0
+        WHERE user_id = ? AND day = ?
+        ORDER BY created_at DESC
+        LIMIT 1
+    """, (current_user_id(), day)).fetchone()
+    return row and (row[0], decrypt_value(row[1]), decrypt_value(row[2]))
+
+@cached_query
+def get_notes_history(limit=NOTES_PAGE_SIZE, before=None):
+    """
+    Notes de la plus récente à la plus ancienne [(id, content, created_at)], par pages.
+    before : curseur (created_at, id) de la dernière note déjà affichée (voir get_task_history).
+    """
+    conn = get_connection()
+    seek, params = "", (current_user_id(), limit)
+    if before is not None:
+        seek, params = "AND (created_at, id) < (?, ?)", (current_user_id(), *before, limit)
+    rows = conn.execute(f"""
+        SELECT id, content, created_at
+        FROM notes
+        WHERE user_id = ? {seek}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    """, params).fetchall()
+    return decrypt_rows(rows, {1})
 
 def save_mood(mood, emotion, motivation, notes):
-    conn = st.session_state.conn
+    conn = get_connection()
     conn.execute("""
-        INSERT INTO mood (mood_value, emotion, motivation, notes)
-        VALUES (?, ?, ?, ?)
-    """, (mood, emotion, motivation, notes))
+        INSERT INTO mood (user_id, mood_value, emotion, motivation, notes)
+        VALUES (?, ?, ?, ?, ?)
+    """, (current_user_id(), mood, encrypt_value(emotion), encrypt_value(motivation), encrypt_value(notes)))
     conn.commit()
-    get_mood_history.clear()
 
 def add_note(content):
     """Ajoute une note rapide dans la table notes"""
-    conn = st.session_state.conn
+    conn = get_connection()
     conn.execute(
-        "INSERT INTO notes(content) VALUES (?)",
-        (content,)
+        "INSERT INTO notes(user_id, content) VALUES (?, ?)",
+        (current_user_id(), encrypt_value(content))
     )
     conn.commit()
\ No newline at end of file
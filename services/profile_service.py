@@ -1,7 +1,9 @@
 import streamlit as st
 from db.database import get_connection
 from datetime import date
+from utils.profiling import profiled
 
+@profiled
 def render_profile_section():
     conn = get_connection()
     c = conn.cursor()
@@ -0,0 +1,29 @@
+import streamlit as st
+from utils.profiling import METRICS_FILE
+
+TOP_SPANS = 30  # lignes affichées dans le panneau
+
+
+def render_profiling_panel(report):
+    """Panneau de la barre latérale : où est passé le temps du rerun (HELPDESK_PROFILE=1)"""
+    if report is None:
+        return
+    import pandas as pd  # seulement avec HELPDESK_PROFILE=1
+
+    spans = report["spans"]
+    sql = [stat for stat in spans.values() if stat["kind"] == "sql"]
+
+    with st.sidebar.expander("⏱️ Profilage du rerun", expanded=False):
+        col1, col2 = st.columns(2)
+        col1.metric("Rerun", f"{report['total_ms']:.0f} ms")
+        col2.metric("SQL", f"{sum(s['ms'] for s in sql):.0f} ms", f"{sum(s['calls'] for s in sql)} requêtes",
+                    delta_color="off")
+        st.dataframe(
+            pd.DataFrame(
+                [(name, s["kind"], s["calls"], round(s["ms"], 2), s["rows"]) for name, s in spans.items()][:TOP_SPANS],
+                columns=["Nom", "Type", "Appels", "ms", "Lignes"],
+            ),
+            hide_index=True,
+            use_container_width=True,
+        )
+        st.caption(f"Historique des reruns : `{METRICS_FILE}`")
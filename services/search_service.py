@@ -0,0 +1,139 @@
+"""
+Recherche plein texte dans les notes et les humeurs (index FTS5 journal_fts, migrations v5 et v6).
+Les résultats sont paginés par curseur : chaque page reprend après le dernier
+résultat affiché, sans OFFSET.
+
+L'index ne contient pas le texte (les champs sont chiffrés), seulement les mots de chaque entrée
+sans leur position (detail = column, migration v11) : pas de recherche de phrase exacte, et seules
+les lignes de la page sont relues et déchiffrées pour construire les extraits. La colonne owner de l'index
+(« u » + id du profil, migration v8) limite la recherche au profil actif.
+"""
+import re
+import unicodedata
+from db.cache import cached_query
+from db.database import get_connection, current_user_id
+from db.models import JOURNAL_DATE_SHIFT, JOURNAL_ID_BITS
+from utils.security import decrypt_value
+
+PAGE_SIZE = 20
+SNIPPET_TOKENS = 12  # mots autour du passage trouvé
+HIGHLIGHT = ("**", "**")  # mise en évidence Markdown des mots trouvés
+
+RELEVANCE = "relevance"
+RECENT = "recent"
+
+# Relecture d'une entrée à partir de son rowid (voir JOURNAL_ROWID) : l'id complet est dans les
+# bits de poids faible, juste avant le type_______________________________________________________
+ENTRY_QUERIES = {
+    "note": "SELECT id, created_at, content FROM notes",
+    "mood": "SELECT id, created_at, notes, emotion, motivation FROM mood",
+}
+ENTRY_FILTER = f" WHERE user_id = ? AND id = (? >> 1) & {(1 << JOURNAL_ID_BITS) - 1}"
+
+
+def _fold(text: str) -> str:
+    """Minuscules sans accents, comme le tokenizer de l'index"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def build_match_query(text: str):
+    """
+    Transforme la saisie en requête FTS5 : chaque mot est cherché comme préfixe,
+    tous les mots doivent être présents. Renvoie None si rien à chercher.
+    """
+    words = re.findall(r"\w+", text or "")
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def make_snippet(text, words, size=SNIPPET_TOKENS):
+    """Extrait de `size` mots autour du premier mot trouvé, mots trouvés mis en évidence ; None si aucun"""
+    prefixes = tuple(_fold(word) for word in words)
+    tokens = re.findall(r"\w+|\W+", text or "")
+    positions = [i for i, token in enumerate(tokens) if re.match(r"\w", token)]
+    hits = {i for i in positions if _fold(tokens[i]).startswith(prefixes)}
+    if not hits:
+        return None
+
+    # Fenêtre de mots qui commence un peu avant le premier mot trouvé________________________
+    first = positions.index(min(hits))
+    start = max(0, min(first - size // 4, len(positions) - size))
+    window = positions[start:start + size]
+
+    parts = [
+        f"{HIGHLIGHT[0]}{tokens[i]}{HIGHLIGHT[1]}" if i in hits else tokens[i]
+        for i in range(window[0], window[-1] + 1)
+    ]
+    return ("…" if start > 0 else "") + "".join(parts) + ("…" if window[-1] < positions[-1] else "")
+
+
+def _load_entry(conn, rowid, words):
+    """(type, id, created_at, extrait) d'une entrée de l'index, ou None si elle a disparu"""
+    kind = "mood" if rowid & 1 else "note"
+    row = conn.execute(ENTRY_QUERIES[kind] + ENTRY_FILTER, (current_user_id(), rowid)).fetchone()
+    if row is None:
+        return None
+
+    entry_id, created_at, *fields = row
+    fields = [decrypt_value(field) for field in fields if field]
+    snippet = next((s for s in (make_snippet(field, words) for field in fields) if s), None)
+    if snippet is None:
+        snippet = " ".join((fields[0] if fields else "").split()[:SNIPPET_TOKENS])
+    return kind, entry_id, created_at, snippet
+
+
+@cached_query
+def search_journal(text, start=None, end=None, order=RECENT, after=None, limit=PAGE_SIZE):
+    """
+    Cherche dans les notes et les humeurs.
+    start / end : jours AAAA-MM-JJ (bornes incluses) ; after : curseur renvoyé par la page précédente.
+    Renvoie ([(type, id, created_at, extrait)], curseur suivant ou None).
+
+    RECENT suit l'ordre des rowid (chronologique, voir JOURNAL_ROWID) : seule la page est lue.
+    RELEVANCE doit noter toutes les correspondances : plus lent pour un mot très fréquent.
+    """
+    match = build_match_query(text)
+    if match is None:
+        return [], None
+
+    # Profil actif puis période = intervalle de rowid___________________________________________
+    match = f'owner : "u{current_user_id()}" AND {{content emotion motivation}} : ({match})'
+    where, params = ["journal_fts MATCH ?"], [match]
+    if start:
+        where.append(f"rowid >= (unixepoch(?) << {JOURNAL_DATE_SHIFT})")
+        params.append(start)
+    if end:
+        where.append(f"rowid < (unixepoch(?, '+1 day') << {JOURNAL_DATE_SHIFT})")
+        params.append(end)
+
+    if order == RELEVANCE:
+        if after:
+            where.append("(rank, rowid) > (?, ?)")
+            params.extend(after)
+        order_by, rank = "rank, rowid", "rank"
+    else:
+        if after:
+            where.append("rowid < ?")
+            params.append(after[-1])
+        order_by, rank = "rowid DESC", "NULL"  # rank calculerait bm25 pour rien
+
+    conn = get_connection()
+    rows = conn.execute(f"""
+        SELECT rowid, {rank}
+        FROM journal_fts
+        WHERE {" AND ".join(where)}
+        ORDER BY {order_by}
+        LIMIT ?
+    """, (*params, limit + 1)).fetchall()
+
+    # Une ligne de plus que demandé : indique s'il reste une page____________________________
+    page = rows[:limit]
+    words = re.findall(r"\w+", text)
+    results = [entry for entry in (_load_entry(conn, rowid, words) for rowid, _ in page) if entry]
+    if len(rows) <= limit:
+        return results, None
+
+    rowid, rank = page[-1]
+    return results, (rank, rowid) if order == RELEVANCE else (rowid,)
@@ -0,0 +1,58 @@
+from db.cache import cached_query
+from db.database import get_connection, current_user_id
+
+STAT_FIELDS = ("mood_count", "mood_sum", "mood_min", "mood_max", "task_count", "task_done", "note_count")
+
+
+def _as_totals(row):
+    totals = dict(zip(STAT_FIELDS, row or (None,) * len(STAT_FIELDS)))
+    for field in STAT_FIELDS:
+        if totals[field] is None and field not in ("mood_min", "mood_max"):
+            totals[field] = 0
+    totals["mood_avg"] = totals["mood_sum"] / totals["mood_count"] if totals["mood_count"] else None
+    return totals
+
+
+@cached_query
+def get_totals():
+    """Statistiques globales du profil (une seule ligne, tenue à jour par des triggers)"""
+    conn = get_connection()
+    row = conn.execute(f"SELECT {', '.join(STAT_FIELDS)} FROM stats_totals WHERE user_id = ?",
+                       (current_user_id(),)).fetchone()
+    return _as_totals(row)
+
+
+@cached_query
+def get_period_totals(start, end):
+    """Mêmes statistiques sur une période (AAAA-MM-JJ, bornes incluses), une ligne lue par jour"""
+    conn = get_connection()
+    row = conn.execute("""
+        SELECT SUM(mood_count), SUM(mood_sum), MIN(mood_min), MAX(mood_max),
+               SUM(task_count), SUM(task_done), SUM(note_count)
+        FROM daily_stats
+        WHERE user_id = ? AND day BETWEEN ? AND ?
+    """, (current_user_id(), start, end)).fetchone()
+    return _as_totals(row)
+
+
+@cached_query
+def get_daily_mood(start=None, end=None):
+    """Humeur moyenne par jour : [(day, moyenne, min, max)], bornes incluses (AAAA-MM-JJ)"""
+    conn = get_connection()
+    return conn.execute("""
+        SELECT day, CAST(mood_sum AS REAL) / mood_count, mood_min, mood_max
+        FROM daily_stats
+        WHERE user_id = ? AND day BETWEEN ? AND ? AND mood_count > 0
+        ORDER BY day
+    """, (current_user_id(), start or "0000-00-00", end or "9999-99-99")).fetchall()
+
+
+@cached_query
+def get_first_day():
+    """Premier jour contenant des données (AAAA-MM-JJ) ou None"""
+    conn = get_connection()
+    row = conn.execute("""
+        SELECT MIN(day) FROM daily_stats
+        WHERE user_id = ? AND (mood_count > 0 OR task_count > 0 OR note_count > 0)
+    """, (current_user_id(),)).fetchone()
+    return row[0] if row else None
@@ -0,0 +1,36 @@
+"""
+Fixtures communes : chaque test travaille sur sa propre base et sa propre clé,
+dans un dossier temporaire (comme les benchmarks, via database.DB_PATH).
+
+Lancement : python -m pytest -q (depuis la racine du projet)
+"""
+import pytest
+from db import database
+from db.cache import query_cache
+from db.database import set_current_user
+from db.models import init_db, save_profile_to_db
+from utils import security
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Chemin d'une base vide et clé de chiffrement propres au test"""
+    path = tmp_path / "journal.db"
+    monkeypatch.setattr(database, "DB_PATH", path)
+    monkeypatch.setattr(security, "KEY_FILE", tmp_path / "secret.key")
+    monkeypatch.setattr(security, "_cipher", None)
+    monkeypatch.setattr(security, "_fresh", {})
+    query_cache.clear()
+    yield path
+    set_current_user(None)
+    database.get_pool(path).release()
+    database.get_pool(path).close()
+    query_cache.clear()
+
+
+@pytest.fixture
+def conn(db_path):
+    """Base initialisée, avec un profil actif ; renvoie la connexion du thread"""
+    init_db()
+    set_current_user(save_profile_to_db("Test", "2000-01-01", []))
+    return database.get_connection()
@@ -0,0 +1,126 @@
+"""
+Faux serveur Ollama local, pour tester le chat sans télécharger de modèle.
+
+Lancement : python -m tests.fake_ollama --port 11434
+Il imite les routes /api/version, /api/tags, /api/ps, /api/generate et /api/chat (streaming NDJSON).
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "Je suis là pour t'écouter. Qu'est-ce qui te pèse le plus aujourd'hui ?"
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, comme le vrai serveur
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send_json(200, {"version": "0.0.0-fake"})
+        elif self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": self.server.model, "digest": "fake"}]})
+        elif self.path == "/api/ps":
+            loaded = [{"name": self.server.model}] if self.server.loaded else []
+            self._send_json(200, {"models": loaded})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        self.server.requests.append((self.path, payload))
+
+        if self.path not in ("/api/generate", "/api/chat"):
+            self._send_json(404, {"error": "not found"})
+            return
+
+        # Requête sans prompt ni messages : simple chargement du modèle____________________
+        self.server.loaded = True
+        if not payload.get("prompt") and not payload.get("messages"):
+            time.sleep(self.server.delay * 10)
+            self._send_json(200, {"model": payload.get("model"), "response": "", "done": True})
+            return
+
+        # Réponse découpée en jetons, envoyée en chunked comme Ollama_______________________
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        started = time.perf_counter()
+        words = self.server.reply.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.server.delay)
+            token = word if i == 0 else " " + word
+            try:
+                self._write_chunk(self._line(payload, token, done=False))
+            except (BrokenPipeError, ConnectionResetError):
+                # Le client a coupé la connexion (réponse annulée) : on arrête de générer___
+                self.close_connection = True
+                return
+
+        # Dernier message : compteurs et durées (en nanosecondes) comme Ollama_____________
+        prompt = payload.get("prompt") or " ".join(m["content"] for m in payload.get("messages", []))
+        elapsed = int((time.perf_counter() - started) * 1e9)
+        last = json.loads(self._line(payload, "", done=True))
+        last.update({
+            "prompt_eval_count": len(prompt) // 4,
+            "prompt_eval_duration": 1_000_000,
+            "eval_count": len(words),
+            "eval_duration": elapsed,
+            "total_duration": elapsed + 1_000_000,
+        })
+        self._write_chunk(json.dumps(last).encode() + b"\n")
+        self._write_chunk(b"")
+
+    def _line(self, payload, token, done):
+        line = {"model": payload.get("model"), "done": done}
+        if self.path == "/api/chat":
+            line["message"] = {"role": "assistant", "content": token}
+        else:
+            line["response"] = token
+        return json.dumps(line).encode() + b"\n"
+
+
+def start_fake_server(port=0, reply=DEFAULT_REPLY, delay=0.0, model="llama3.1:8b"):
+    """Démarre le faux serveur dans un thread et le renvoie (server.server_port donne le port)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeOllamaHandler)
+    server.daemon_threads = True
+    server.reply = reply
+    server.delay = delay
+    server.model = model
+    server.requests = []
+    server.loaded = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Faux serveur Ollama pour Help-Desk")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--delay", type=float, default=0.05, help="pause entre deux jetons (s)")
+    args = parser.parse_args()
+
+    server = start_fake_server(port=args.port, delay=args.delay)
+    print(f"Faux Ollama sur http://127.0.0.1:{server.server_port} (Ctrl+C pour arrêter)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
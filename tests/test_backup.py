@@ -0,0 +1,101 @@
+import gzip
+import sqlite3
+import threading
+from contextlib import contextmanager
+import pytest
+from db import backup
+from db.database import release_connection, set_current_user
+from services import mood_service
+from utils.security import decrypt_value, get_cipher
+
+
+@pytest.mark.parametrize("encrypt", [True, False])
+def test_backup_round_trip(conn, tmp_path, monkeypatch, encrypt):
+    monkeypatch.setattr(backup, "CHUNK_BYTES", 1024)  # plusieurs blocs chiffrés
+    for i in range(50):
+        mood_service.add_note(f"note {i}")
+    path = backup.create_backup(tmp_path / "backups", encrypt=encrypt, pause=0)
+    if encrypt:
+        assert path.read_bytes().count(b"\n") > 1
+
+    backup.verify_backup(path)
+    mood_service.add_note("après la sauvegarde")
+    backup.restore_backup(path)
+    assert conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0] == 50
+
+
+def test_restore_single_token_backup(conn, tmp_path):
+    """Sauvegarde chiffrée d'un seul bloc, sans fin de ligne (format des premières versions)"""
+    mood_service.add_note("ancienne")
+    plain = backup.create_backup(tmp_path / "backups", encrypt=False, pause=0)
+    old = tmp_path / "old.db.gz.enc"
+    old.write_bytes(get_cipher().encrypt(plain.read_bytes()))
+
+    mood_service.add_note("nouvelle")
+    backup.restore_backup(old)
+    assert conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0] == 1
+
+
+def test_corrupted_backup_is_rejected(conn, tmp_path):
+    broken = tmp_path / "broken.db.gz"
+    with gzip.open(broken, "wb") as f:
+        f.write(b"pas une base SQLite" * 100)
+    with pytest.raises(Exception):
+        backup.verify_backup(broken)
+
+
+@contextmanager
+def writing():
+    """Ajoute des notes sans arrêt depuis un autre thread ; renvoie la liste des erreurs"""
+    stop, errors = threading.Event(), []
+
+    def run():
+        set_current_user(1)
+        try:
+            while not stop.is_set():
+                mood_service.add_note("pendant")
+        except Exception as e:
+            errors.append(e)
+        finally:
+            release_connection()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    try:
+        yield errors
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_backup_finishes_under_concurrent_writes(conn, tmp_path):
+    """Les écritures pendant la copie ne la font pas recommencer : elle finit, à l'image du début"""
+    with conn:
+        conn.executemany("INSERT INTO notes (user_id, content) VALUES (1, hex(randomblob(500)))", [()] * 5000)
+    done = []
+    with writing() as errors:
+        thread = threading.Thread(target=lambda: done.append(backup.create_backup(
+            tmp_path / "backups", encrypt=False, pages=1, pause=0.001)))
+        thread.start()
+        thread.join(timeout=30)
+        assert done, "sauvegarde jamais terminée"
+    assert errors == []
+
+    (tmp_path / "copie").mkdir()
+    restored = backup._extract(done[0], tmp_path / "copie")
+    with sqlite3.connect(restored) as copy:
+        assert copy.execute("SELECT COUNT(*) FROM notes").fetchone()[0] >= 5000
+
+
+def test_restore_under_concurrent_writes(conn, tmp_path):
+    for i in range(50):
+        mood_service.add_note(f"note {i}")
+    path = backup.create_backup(tmp_path / "backups", encrypt=False, pause=0)
+    mood_service.add_note("après la sauvegarde")
+
+    with writing() as errors:
+        backup.restore_backup(path)
+    assert errors == []
+    assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    notes = {decrypt_value(content) for (content,) in conn.execute("SELECT content FROM notes")}
+    assert notes - {"pendant"} == {f"note {i}" for i in range(50)}
@@ -0,0 +1,70 @@
+import threading
+import pytest
+from db import database
+from db.database import set_current_user
+from services import bulk_import
+from services.bulk_import import MOOD_MAX, _parse_mood, import_records
+from utils.security import encrypt_rows
+
+MAPPING = {"mood_value": "mood", "created_at": "date"}
+
+
+@pytest.mark.parametrize("value", ["nan", "NaN", "inf", "-inf", "Infinity", float("nan"), float("inf"), "sept"])
+def test_unreadable_mood(value):
+    assert _parse_mood(value, MOOD_MAX) is None
+
+
+@pytest.mark.parametrize("value, scale, expected", [("7", 10, 7), ("4,5", 5, 9), (0, 10, 1), ("1e6", 10, 10)])
+def test_mood_scale(value, scale, expected):
+    assert _parse_mood(value, scale) == expected
+
+
+def test_non_finite_rows_are_rejected(conn):
+    records = [
+        {"mood": "7", "date": "2024-01-01"},
+        {"mood": "nan", "date": "2024-01-02"},
+        {"mood": "inf", "date": "2024-01-03"},
+        {"mood": float("-inf"), "date": "2024-01-04"},
+        {"mood": "5", "date": float("nan")},
+        {"mood": "5", "date": float("inf")},
+        {"mood": "6", "date": 1704326400},
+    ]
+    report = import_records(records, "mood", MAPPING)
+
+    assert (report["read"], report["inserted"], report["rejected"]) == (7, 2, 5)
+    assert conn.execute("SELECT mood_value, day FROM mood ORDER BY day").fetchall() == [
+        (7, "2024-01-01"), (6, "2024-01-04")
+    ]
+
+
+def test_concurrent_imports_of_the_same_file(conn, monkeypatch):
+    """Deux imports du même fichier en même temps : chaque ligne est insérée une seule fois"""
+    records = [{"mood": str(1 + i % 10), "date": f"2024-01-{1 + i:02d}"} for i in range(20)]
+    barrier = threading.Barrier(2, timeout=10)
+
+    def encrypt_after_both_checked(rows, positions):
+        barrier.wait()  # les deux imports ont lu les empreintes avant d'écrire
+        return encrypt_rows(rows, positions)
+
+    monkeypatch.setattr(bulk_import, "encrypt_rows", encrypt_after_both_checked)
+    reports, errors = [], []
+
+    def run():
+        set_current_user(1)
+        try:
+            reports.append(import_records(records, "mood", MAPPING))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            database.get_pool().release()
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(report["inserted"] for report in reports) == [0, 20]
+    assert sorted(report["duplicates"] for report in reports) == [0, 20]
+    assert conn.execute("SELECT COUNT(*), COUNT(DISTINCT day) FROM mood").fetchone() == (20, 20)
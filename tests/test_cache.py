@@ -0,0 +1,68 @@
+"""
+Cache de lecture (db.cache) : un résultat ne sert que tant que la version des données
+de son profil n'a pas changé, quelle que soit la connexion ou le processus qui écrit.
+"""
+from contextlib import closing
+from db.cache import QueryCache, cached_query, data_version, query_cache
+from db.database import open_connection, set_current_user
+from db.models import save_profile_to_db
+from services import mood_service, stats_service
+
+
+def hits():
+    return query_cache.stats()["hits"]
+
+
+def test_read_served_from_cache_until_a_write(conn):
+    assert not mood_service.mood_logged_on("2024-03-01")
+    before = hits()
+    assert not mood_service.mood_logged_on("2024-03-01")
+    assert hits() == before + 1
+
+    conn.execute("INSERT INTO mood (user_id, mood_value, created_at) VALUES (1, 5, '2024-03-01 10:00:00')")
+    conn.commit()
+    assert mood_service.mood_logged_on("2024-03-01")
+    assert hits() == before + 1
+
+
+def test_write_from_another_connection_invalidates(db_path, conn):
+    assert stats_service.get_totals()["note_count"] == 0
+
+    # Autre connexion, comme un autre processus (API, import) : aucun appel au cache________
+    with closing(open_connection(db_path)) as other, other:
+        other.execute("INSERT INTO notes (user_id, content) VALUES (1, 'ailleurs')")
+    assert stats_service.get_totals()["note_count"] == 1
+
+
+def test_other_profile_writes_keep_cache(conn):
+    alice = 1
+    bob = save_profile_to_db("Bob", "2001-01-01", [])
+    mood_service.save_mood(5, "", "", "")
+    alice_totals = stats_service.get_totals()
+    alice_version = data_version(user_id=alice)
+
+    set_current_user(bob)
+    assert stats_service.get_totals()["mood_count"] == 0  # pas le résultat d'Alice
+    mood_service.save_mood(3, "", "", "")
+    assert stats_service.get_totals()["mood_count"] == 1
+
+    set_current_user(alice)
+    assert data_version(user_id=alice) == alice_version
+    before = hits()
+    assert stats_service.get_totals() is alice_totals
+    assert hits() == before + 1
+
+
+def test_keep_rejects_result(conn):
+    cache = QueryCache()
+    calls = []
+
+    @cached_query(cache=cache, keep=lambda result: result > 1)
+    def counted():
+        calls.append(1)
+        return len(calls)
+
+    assert counted() == 1  # refusé par keep : relu au prochain appel
+    assert counted() == 2
+    assert counted() == 2
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,184 @@
+"""
+Chat avec Mathi contre le faux serveur Ollama (tests.fake_ollama) : aucun modèle téléchargé.
+"""
+import socket
+import threading
+import time
+import pytest
+from streamlit.testing.v1 import AppTest
+from services import chat_ai
+from services.chat_ai import OllamaClient
+from services.chat_worker import CANCELLED, ChatWorker
+from tests.fake_ollama import start_fake_server
+from utils.safety import safety_response
+
+
+def free_port():
+    """Port local sur lequel rien n'écoute (serveur Ollama arrêté)"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def ollama():
+    server = start_fake_server(reply="Je suis là pour toi")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def use_client(monkeypatch):
+    """Remplace le client partagé par un client vers le port donné"""
+    clients = []
+
+    def use(port):
+        client = OllamaClient(host=f"http://127.0.0.1:{port}", timeout=5)
+        monkeypatch.setattr(chat_ai, "_client", client)
+        clients.append(client)
+        return client
+
+    monkeypatch.setattr(chat_ai, "_model_version", None)
+    yield use
+    for client in clients:
+        client.close()
+
+
+def test_model_version_not_memoized_while_ollama_is_down(ollama, use_client):
+    use_client(free_port())
+    down = chat_ai.cache_key("Bonjour")
+    assert chat_ai._model_version is None
+
+    use_client(ollama.server_port)
+    up = chat_ai.cache_key("Bonjour")
+    assert chat_ai._model_version == "fake"
+    assert up != down
+
+    use_client(free_port())
+    assert chat_ai.cache_key("Bonjour") == up  # empreinte connue : plus de requête
+
+
+def test_cache_stats_counted_from_several_threads(conn, monkeypatch):
+    monkeypatch.setattr(chat_ai, "cache_stats", {"hits": 0, "misses": 0})
+    chat_ai.cache_put("connue", "réponse")
+
+    def lookups():
+        for i in range(200):
+            chat_ai.cache_get("connue" if i % 2 else "inconnue")
+
+    threads = [threading.Thread(target=lookups) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = chat_ai.get_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (400, 400, 1)
+
+
+def test_stream_chat_token_by_token(ollama, use_client):
+    client = use_client(ollama.server_port)
+    stats = {}
+    tokens = list(client.stream_chat([{"role": "user", "content": "Salut"}], stats=stats))
+
+    assert tokens == ["Je", " suis", " là", " pour", " toi"]
+    assert stats["eval_tokens"] == 5
+    path, payload = ollama.requests[-1]
+    assert path == "/api/chat" and payload["stream"] and payload["keep_alive"] == chat_ai.KEEP_ALIVE
+
+
+def test_keep_alive_connection_reused(ollama, use_client):
+    """Une connexion entièrement lue retourne au pool et sert au message suivant"""
+    client = use_client(ollama.server_port)
+    list(client.stream_chat([{"role": "user", "content": "Un"}]))
+    conn = client._pool.get_nowait()
+    sock = conn.sock
+    client._release(conn)
+
+    list(client.stream_chat([{"role": "user", "content": "Deux"}]))
+    assert client.ping()
+    assert client._pool.qsize() == 1
+    assert client._pool.get_nowait().sock is sock
+
+
+def test_pooled_connection_closed_by_server_is_retried(ollama, use_client):
+    client = use_client(ollama.server_port)
+    assert client.ping()
+    # Le serveur voit la fin de la connexion et la ferme, comme un keep-alive expiré______
+    client._pool.queue[0].sock.shutdown(socket.SHUT_WR)
+    time.sleep(0.1)
+
+    assert "".join(client.stream_chat([{"role": "user", "content": "Encore"}])) == "Je suis là pour toi"
+
+
+def test_fallback_when_ollama_is_down(conn, use_client):
+    use_client(free_port())
+    assert chat_ai.chat_with_ai("Bonjour") == chat_ai.UNAVAILABLE_MESSAGE.strip()
+    assert not chat_ai.get_client().ping()
+
+
+def test_answer_cached_only_once_complete(conn, ollama, use_client, monkeypatch):
+    use_client(ollama.server_port)
+    monkeypatch.setattr(chat_ai, "cache_stats", {"hits": 0, "misses": 0})
+
+    assert chat_ai.chat_with_ai("Bonjour", use_cache=True) == "Je suis là pour toi"
+    ollama.reply = "Autre réponse"
+    assert chat_ai.chat_with_ai("bonjour !", use_cache=True) == "Je suis là pour toi"
+    assert chat_ai.get_cache_stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_cancel_closes_the_stream(conn, use_client):
+    """Une réponse annulée coupe la connexion : Ollama arrête de générer"""
+    server = start_fake_server(reply=" ".join(["mot"] * 200), delay=0.01)
+    try:
+        client = use_client(server.server_port)
+        worker = ChatWorker()
+        job_id = worker.submit("Raconte-moi une histoire")
+        job = worker.get(job_id)
+        deadline = time.monotonic() + 5
+        while not job.text and time.monotonic() < deadline:
+            time.sleep(0.01)
+        worker.cancel(job_id)
+        while not job.finished and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert job.status == CANCELLED
+        assert 0 < len(job.text.split()) < 200
+        assert client._pool.qsize() == 0  # connexion à moitié lue : fermée, pas réutilisée
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def chat_page():
+    """Script AppTest : l'onglet du chat seul"""
+    from services.chat_service import render_chat_section
+
+    render_chat_section()
+
+
+def test_distress_in_reply_shows_help(conn, use_client):
+    """Une réponse du modèle avec des mots de détresse affiche le même message d'aide"""
+    server = start_fake_server(reply="Tu dis que parfois je veux mourir et ça compte")
+    try:
+        use_client(server.server_port)
+        at = AppTest.from_function(chat_page, default_timeout=10)
+        at.run()
+        at.text_area(key="chat_input").input("Ça ne va pas fort")
+        at.button[0].click().run()
+
+        deadline = time.monotonic() + 5
+        while at.session_state["chat_job"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+            at.run()
+
+        assert at.session_state["chat_distress"]
+        assert [w.value for w in at.warning] == [safety_response().strip()]
+        assert chat_ai.get_cache_stats()["entries"] == 0
+
+        at.text_area(key="chat_input").input("Merci")
+        at.button[0].click().run()
+        assert not at.session_state["chat_distress"]
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,70 @@
+"""
+Colonne day (AAAA-MM-JJ) de mood, tasks et notes : reprise des anciennes lignes
+par la migration, index (user_id, day) et lectures par jour ou par période.
+"""
+from contextlib import closing
+from datetime import date
+from db import database, models
+from db.database import open_connection, set_current_user
+from db.models import MIGRATIONS, init_db
+from services import habit_service, mood_service, stats_service
+
+
+def build_v0(path, monkeypatch):
+    """Base d'avant la colonne day : dates en texte, avec ou sans heure"""
+    with monkeypatch.context() as patch:
+        patch.setattr(models, "MIGRATIONS", MIGRATIONS[:0])
+        patch.setattr(models, "SCHEMA_VERSION", 0)
+        models._init_tables()
+
+    with closing(open_connection(path)) as conn, conn:
+        conn.execute("INSERT INTO users (prenom, birth_date, tags) VALUES ('Alice', '1990-01-01', '')")
+        conn.executemany("INSERT INTO mood (mood_value, created_at) VALUES (?, ?)",
+                         [(4, "2024-02-29 23:59:59"), (6, "2024-03-01 00:00:00"), (8, "2024-03-01 21:30:00"),
+                          (2, "2024-03-03 08:00:00")])
+        conn.executemany("INSERT INTO tasks (title, done, created_at) VALUES (?, ?, ?)",
+                         [("Lire", 1, "2024-03-01"), ("Courir", 0, "2024-03-01"), ("Appeler", 1, "2024-03-02")])
+        conn.execute("INSERT INTO notes (content, created_at) VALUES ('idée', '2024-03-02 12:00:00')")
+    return path
+
+
+def test_migration_fills_day_and_indexes_it(db_path, monkeypatch):
+    build_v0(db_path, monkeypatch)
+    init_db()
+    conn = database.get_connection()
+
+    assert conn.execute("SELECT day FROM mood ORDER BY id").fetchall() == [
+        ("2024-02-29",), ("2024-03-01",), ("2024-03-01",), ("2024-03-03",)]
+    assert conn.execute("SELECT DISTINCT day FROM tasks ORDER BY day").fetchall() == [("2024-03-01",), ("2024-03-02",)]
+    for table in models.USER_TABLES:
+        plan = " ".join(row[3] for row in conn.execute(
+            f"EXPLAIN QUERY PLAN SELECT * FROM {table} WHERE user_id = 1 AND day BETWEEN '2024-03-01' AND '2024-03-02'"))
+        assert f"idx_{table}_user_day" in plan
+
+
+def test_reads_by_day_and_range(db_path, monkeypatch):
+    build_v0(db_path, monkeypatch)
+    init_db()
+    set_current_user(1)
+
+    assert mood_service.mood_logged_on("2024-03-01") and not mood_service.mood_logged_on("2024-03-02")
+    assert mood_service.get_mood_of_day("2024-03-01")[0] == 8
+    assert [title for _, title, *_ in habit_service.get_tasks_of_day("2024-03-01")] == ["Lire", "Courir"]
+
+    # Bornes incluses, au jour près (23:59:59 la veille ne compte pas)__________________________
+    totals = stats_service.get_period_totals("2024-03-01", "2024-03-02")
+    assert (totals["mood_count"], totals["mood_min"], totals["mood_max"]) == (2, 6, 8)
+    assert (totals["task_count"], totals["task_done"], totals["note_count"]) == (3, 2, 1)
+    assert stats_service.get_daily_mood("2024-03-01", "2024-03-03") == [
+        ("2024-03-01", 7.0, 6, 8), ("2024-03-03", 2.0, 2, 2)]
+    assert stats_service.get_first_day() == "2024-02-29"
+
+
+def test_new_rows_get_their_day(conn):
+    mood_service.save_mood(5, "calme", "", "")
+    habit_service.add_task("Ranger", task_date=date(2024, 5, 10))
+
+    day = conn.execute("SELECT day FROM mood").fetchone()[0]
+    assert mood_service.mood_logged_on(day)
+    assert [title for _, title, *_ in habit_service.get_tasks_of_day("2024-05-10")] == ["Ranger"]
+    assert stats_service.get_period_totals("2024-05-10", "2024-05-10")["task_count"] == 1
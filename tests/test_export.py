@@ -0,0 +1,71 @@
+from openpyxl import load_workbook
+from db.database import current_user_id
+from services import export_service, mood_service
+from utils.dates import to_day
+
+
+def test_build_excel(conn):
+    mood_service.save_mood(7, "calme", "", "balade")
+    mood_service.add_note("rendez-vous")
+
+    with export_service.build_excel(["Humeurs", "Notes"]) as output:
+        workbook = load_workbook(output, read_only=True)
+        moods = list(workbook["Humeurs"].values)
+        notes = list(workbook["Notes"].values)
+
+    assert len(moods) == 2 and moods[1][2:6] == ("calme", None, None, "balade")
+    assert [row[1] for row in notes[1:]] == ["rendez-vous"]
+
+
+def test_large_excel_spills_to_disk(conn, db_path, monkeypatch):
+    monkeypatch.setattr(export_service, "DB_PATH", db_path)
+    monkeypatch.setattr(export_service, "SPOOL_MAX_BYTES", 1024)
+    for i in range(200):
+        mood_service.add_note(f"note {i}")
+
+    with export_service.build_excel(["Notes"]) as output:
+        assert output._rolled
+        assert len(list(load_workbook(output, read_only=True)["Notes"].values)) == 201
+
+
+def test_truncated_pdf_is_not_cached(conn, monkeypatch):
+    mood_service.save_mood(6, "calme", "", "")
+    export_service.report_cache.clear()
+    monkeypatch.setattr(export_service, "REPORT_TIME_BUDGET", -1.0)
+    day = to_day()
+    export_service.build_pdf_report(day, day, day)
+    assert export_service.report_cache.stats()["entries"] == 0
+
+    monkeypatch.setattr(export_service, "REPORT_TIME_BUDGET", 10.0)
+    first = export_service.build_pdf_report(day, day, day)
+    assert export_service.report_cache.stats()["entries"] >= 1
+    hits = export_service.report_cache.hits
+    assert export_service.build_pdf_report(day, day, day) == first
+    assert export_service.report_cache.hits == hits + 1
+
+
+class Cells:
+    """Remplace FPDF : garde le texte écrit"""
+
+    def __init__(self):
+        self.lines = []
+
+    def cell(self, w, h, text="", **kwargs):
+        self.lines.append(text)
+
+    def set_font(self, *args):
+        pass
+
+    def ln(self, *args):
+        pass
+
+
+def test_recent_moods_are_decrypted(conn):
+    mood_service.save_mood(8, "joie", "forte", "concert")
+    day = to_day()
+    pdf = Cells()
+    report = {"bounds": (current_user_id(), day, "9999-99-99"), "deadline": float("inf"), "complete": True}
+    export_service.pdf_recent_moods(pdf, report)
+
+    assert "  Emotion : joie" in pdf.lines and "  Motivation : forte" in pdf.lines
+    assert "  Notes : concert..." in pdf.lines
@@ -0,0 +1,54 @@
+from datetime import date, timedelta
+from db.cache import query_cache
+from services import habit_service
+from utils.dates import to_day
+
+
+def test_reading_tasks_does_not_create_occurrences(conn):
+    habit_service.add_habit("Méditer")
+    total_changes = conn.total_changes
+
+    assert habit_service.get_tasks_of_day(to_day()) == []
+    assert habit_service.get_tasks_of_day(to_day()) == []
+    assert conn.total_changes == total_changes
+
+
+def test_expand_habits_once(conn):
+    habit_id = habit_service.add_habit("Méditer")
+    habit_service.add_habit("Courir", interval=2, start=date.today() + timedelta(days=1))
+
+    assert habit_service.expand_habits() == 1
+    total_changes = conn.total_changes
+    assert habit_service.expand_habits() == 0
+    assert conn.total_changes == total_changes
+
+    tasks = habit_service.get_tasks_of_day(to_day())
+    assert [(title, habit) for _, title, _, _, habit in tasks] == [("Méditer", habit_id)]
+    hits = query_cache.hits
+    assert habit_service.get_tasks_of_day(to_day()) == tasks
+    assert query_cache.hits == hits + 1
+
+
+def test_new_habit_is_expanded_the_same_day(conn):
+    habit_service.add_habit("Méditer")
+    habit_service.expand_habits()
+    habit_service.add_habit("Lire")
+
+    assert habit_service.expand_habits() == 1
+    assert len(habit_service.get_tasks_of_day(to_day())) == 2
+
+
+def test_rate_does_not_count_today_before_it_is_done(conn):
+    yesterday = date.today() - timedelta(days=1)
+    habit_id = habit_service.add_habit("Méditer", start=yesterday)
+    habit_service.add_habit("Lire")
+    for day in (yesterday, date.today()):
+        habit_service.expand_habits(day)
+    tasks = {(habit, day): task_id for task_id, habit, day in conn.execute("SELECT id, habit_id, day FROM tasks")}
+    habit_service.toggle_task(tasks[(habit_id, to_day(yesterday))], True)
+
+    rates = {title: rate for _, title, _, _, _, rate in habit_service.get_habits()}
+    assert rates == {"Méditer": 1.0, "Lire": None}
+
+    habit_service.toggle_task(tasks[(habit_id, to_day())], True)
+    assert habit_service.get_habits()[0][5] == 1.0
@@ -0,0 +1,108 @@
+import http.client
+import json
+import threading
+import time
+from io import BytesIO
+import pytest
+from openpyxl import load_workbook
+from services import export_service, http_api
+from services.http_api import ApiServer
+
+
+@pytest.fixture
+def api(conn):
+    """Serveur de l'API sur un port libre ; renvoie call(méthode, chemin, corps, en-têtes)"""
+    server = ApiServer(("127.0.0.1", 0))
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    user_id = conn.execute("SELECT MAX(id) FROM users").fetchone()[0]
+
+    def call(method, path, body=None, headers=None, raw=None):
+        client = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=10)
+        data = raw if raw is not None else (None if body is None else json.dumps(body).encode())
+        client.request(method, path, body=data, headers={"X-Profil": str(user_id), **(headers or {})})
+        response = client.getresponse()
+        content = response.read()
+        client.close()
+        if not response.getheader("Content-Type", "").startswith("application/json"):
+            return response.status, content or None
+        return response.status, json.loads(content) if content else None
+
+    yield call
+    server.shutdown()
+    server.server_close()
+
+
+def test_identical_writes_are_all_inserted(api, conn):
+    """Deux humeurs identiques le même jour sont légitimes : pas de dédoublonnage par contenu"""
+    mood = {"mood_value": 6, "emotion": "calme", "created_at": "2024-05-01 08:00:00"}
+    assert api("POST", "/moods", mood)[0] == 201
+    status, report = api("POST", "/moods", mood)
+    assert (status, report["inserted"]) == (201, 1)
+    assert conn.execute("SELECT COUNT(*) FROM mood").fetchone()[0] == 2
+
+
+def test_idempotency_key_replays_the_response(api, conn):
+    tasks = [{"title": "Lire"}, {"title": "Lire"}]
+    key = {"Idempotency-Key": "a1b2"}
+    first = api("POST", "/tasks", tasks, key)
+    assert first[0] == 201 and first[1]["inserted"] == 2
+
+    assert api("POST", "/tasks", tasks, key) == first
+    assert conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 2
+
+    assert api("POST", "/tasks", [{"title": "Autre"}], key)[0] == 422
+    assert api("POST", "/tasks", tasks, {"Idempotency-Key": "c3d4"})[0] == 201
+    assert conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 4
+
+
+def test_failed_write_releases_the_key(api, conn):
+    key = {"Idempotency-Key": "e5f6"}
+    assert api("POST", "/notes", ["pas un objet"], key)[0] == 400
+    assert api("POST", "/notes", {"content": "bonjour"}, key)[0] == 201
+
+
+def test_key_of_a_request_in_progress(api, conn):
+    user_id = conn.execute("SELECT MAX(id) FROM users").fetchone()[0]
+    with conn:
+        conn.execute("INSERT INTO api_requests (user_id, key, fingerprint) VALUES (?, 'g7', x'00')", (user_id,))
+    assert api("POST", "/notes", {"content": "x"}, {"Idempotency-Key": "g7"})[0] == 409
+
+
+@pytest.mark.parametrize("length", ["abc", "-5", "1e3"])
+def test_invalid_content_length(api, length):
+    client_headers = {"Content-Length": length}
+    status, body = api("POST", "/notes", headers=client_headers, raw=b"")
+    assert status == 400 and "Content-Length" in body["error"]
+
+
+def test_non_finite_mood_is_rejected(api, conn):
+    status, report = api("POST", "/moods", [{"mood_value": "nan"}, {"mood_value": "inf"}, {"mood_value": 5}])
+    assert status == 201 and (report["inserted"], report["rejected"]) == (1, 2)
+
+
+def test_excel_sent_from_the_spooled_file(api, conn, db_path, monkeypatch):
+    """Le classeur part du fichier temporaire (sur disque ici), qui est fermé après l'envoi"""
+    monkeypatch.setattr(export_service, "DB_PATH", db_path)
+    monkeypatch.setattr(export_service, "SPOOL_MAX_BYTES", 1024)
+    monkeypatch.setattr(http_api, "COPY_CHUNK_BYTES", 1024)
+    built, reads, build_excel = [], [], export_service.build_excel
+
+    def spy(*args):
+        f = build_excel(*args)
+        read = f.read
+        f.read = lambda size=-1: reads.append(size) or read(size)
+        built.append(f)
+        return f
+
+    monkeypatch.setattr(export_service, "build_excel", spy)
+    api("POST", "/notes", [{"content": f"note {i}", "created_at": "2024-05-01 08:00:00"} for i in range(50)])
+
+    status, content = api("GET", "/export/excel?sheets=Notes")
+    assert status == 200 and built[0]._rolled
+    assert len(reads) > 2 and set(reads) == {1024}  # par morceaux, jamais tout le fichier
+    deadline = time.monotonic() + 5  # fermé par le thread de la requête, juste après l'envoi
+    while not built[0].closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert built[0].closed
+    rows = list(load_workbook(BytesIO(content), read_only=True)["Notes"].values)
+    assert len(rows) == 51
@@ -0,0 +1,93 @@
+"""
+Export incrémental (services.incremental_export) : journal des changements, points de reprise
+par profil, fichiers écrits.
+"""
+import json
+from contextlib import closing
+import pytest
+from db import models
+from db.database import open_connection
+from services import incremental_export, mood_service
+from services.incremental_export import FIRST_EXPORT, export_changes
+
+
+def log_size(conn):
+    return conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0]
+
+
+def exported_rows(result):
+    return [json.loads(line) for path in result["files"] for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_nothing_to_export_writes_no_file(conn, tmp_path):
+    tmp_path = tmp_path / "exports"
+    for export_format in ("csv", "jsonl"):
+        assert export_changes(export_format, tmp_path)["files"] == []
+    mood_service.add_note("une note")
+
+    result = export_changes("csv", tmp_path)
+    assert [path.name.split("_")[0] for path in result["files"]] == ["notes"]
+    assert result["counts"] == {"mood": 0, "tasks": 0, "notes": 1}
+    assert export_changes("csv", tmp_path)["files"] == []
+    assert sorted(path.name.split("_")[0] for path in tmp_path.iterdir()) == ["notes"]
+
+
+def test_export_with_a_transaction_already_open(conn, tmp_path):
+    conn.execute("INSERT INTO notes (user_id, content) VALUES (1, 'pas encore validée')")
+    assert conn.in_transaction
+
+    result = export_changes("jsonl", tmp_path)
+    assert [row["row"]["content"] for row in exported_rows(result)] == ["pas encore validée"]
+    assert not conn.in_transaction
+
+
+def test_failed_export_ends_the_snapshot(conn, tmp_path, monkeypatch):
+    mood_service.add_note("une note")
+
+    def broken(*args):
+        raise OSError("disque plein")
+        yield
+
+    with monkeypatch.context() as patch, pytest.raises(OSError):
+        patch.setattr(incremental_export, "_iter_changes", broken)
+        export_changes("jsonl", tmp_path)
+    assert not conn.in_transaction
+    assert {seq for _, seq in conn.execute("SELECT table_name, last_seq FROM export_watermarks")} == {FIRST_EXPORT}
+    assert incremental_export.last_export() is None
+
+    assert export_changes("jsonl", tmp_path)["counts"]["notes"] == 1
+
+
+def test_change_log_only_for_exporting_profiles(conn, tmp_path):
+    mood_service.add_note("avant le premier export")
+    assert log_size(conn) == 0
+
+    export_changes("jsonl", tmp_path)
+    mood_service.add_note("après")
+    conn.execute("DELETE FROM notes WHERE id = 1")
+    conn.commit()
+    assert log_size(conn) == 2
+
+    rows = exported_rows(export_changes("jsonl", tmp_path))
+    assert sorted((row["op"], row["row"]["id"]) for row in rows) == [("delete", 1), ("upsert", 2)]
+    assert log_size(conn) == 0
+
+
+def test_migration_purges_log_of_profiles_without_export(db_path, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(models, "MIGRATIONS", models.MIGRATIONS[:12])
+        patch.setattr(models, "SCHEMA_VERSION", 12)
+        models._init_tables()
+    with closing(open_connection(db_path)) as old, old:
+        old.execute("INSERT INTO users (prenom, tags) VALUES ('Alice', ''), ('Bob', '')")
+        old.execute("""
+            INSERT INTO export_watermarks (user_id, table_name, last_seq, exported_at)
+            VALUES (1, 'notes', 0, '2024-03-01T09:00:00')
+        """)
+        old.executemany("INSERT INTO notes (user_id, content) VALUES (?, 'x')", [(1,), (2,)])
+        old.execute("INSERT INTO tasks (user_id, title) VALUES (1, 't')")
+        assert log_size(old) == 3
+
+    models.init_db()
+    with closing(open_connection(db_path)) as conn:
+        assert conn.execute("SELECT user_id, table_name FROM change_log").fetchall() == [(1, "notes")]
@@ -0,0 +1,69 @@
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+from db import models
+from db.database import open_connection
+from db.models import MIGRATIONS, SCHEMA_VERSION, init_db, migrate
+
+ROOT = Path(__file__).resolve().parent.parent
+PROCESSES = 6
+
+
+def user_version(path):
+    conn = open_connection(path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_init_db_creates_latest_schema(db_path):
+    init_db()
+    assert user_version(db_path) == SCHEMA_VERSION
+
+
+def test_concurrent_init_db(db_path):
+    """Plusieurs processus qui démarrent ensemble sur une base neuve : une seule migration"""
+    script = (
+        "import sys; from pathlib import Path; from unittest import mock; from db import database;"
+        "from db.models import init_db;"
+        "mock.patch.object(database, 'DB_PATH', Path(sys.argv[1])).start(); init_db()"
+    )
+    workers = [subprocess.Popen([sys.executable, "-c", script, str(db_path)], cwd=ROOT, stderr=subprocess.PIPE)
+               for _ in range(PROCESSES)]
+    errors = [worker.communicate(timeout=60)[1].decode() for worker in workers]
+
+    assert [worker.returncode for worker in workers] == [0] * PROCESSES, errors
+    assert user_version(db_path) == SCHEMA_VERSION
+
+
+def test_failed_migration_is_rolled_back(db_path, monkeypatch):
+    """Une migration qui échoue n'applique rien, pas même ses CREATE / ALTER"""
+    def broken(cursor):
+        cursor.execute("ALTER TABLE notes ADD COLUMN broken TEXT")
+        raise RuntimeError("migration interrompue")
+
+    monkeypatch.setattr(models, "MIGRATIONS", MIGRATIONS[:1] + [broken])
+    monkeypatch.setattr(models, "SCHEMA_VERSION", 2)
+    with pytest.raises(RuntimeError):
+        init_db()
+
+    conn = open_connection(db_path)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 1
+        columns = [row[1] for row in conn.execute("PRAGMA table_xinfo(notes)")]
+        assert "day" in columns and "broken" not in columns
+        assert not conn.in_transaction
+    finally:
+        conn.close()
+
+
+def test_migrate_is_idempotent(db_path):
+    init_db()
+    conn = open_connection(db_path)
+    try:
+        migrate(conn)
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    finally:
+        conn.close()
@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+import pytest
+from streamlit.testing.v1 import AppTest
+from db import backup, encryption
+from services import chat_ai
+from utils import profiling
+
+MAIN = Path(__file__).resolve().parent.parent / "main.py"
+
+
+@pytest.fixture
+def metrics(tmp_path, monkeypatch):
+    """Profilage activé, mesures écrites dans un fichier du test"""
+    monkeypatch.setattr(profiling, "ENABLED", True)
+    monkeypatch.setattr(profiling, "METRICS_FILE", tmp_path / "metrics.jsonl")
+    yield lambda: [json.loads(line) for line in profiling.METRICS_FILE.read_text().splitlines()]
+    profiling._local.rerun = None
+
+
+def test_begin_rerun_drops_stale_measure(metrics):
+    profiling.begin_rerun()
+    profiling.record("oubliée", "sql", 1.0)
+    profiling.begin_rerun()
+    assert profiling.end_rerun()["spans"] == {}
+
+
+def test_interrupted_fragment_is_recorded(metrics):
+    with pytest.raises(RuntimeError):
+        with profiling.fragment_rerun("liste"):
+            raise RuntimeError
+    assert metrics()[-1]["interrupted"] == "RuntimeError"
+    assert isinstance(profiling.fragment_rerun("liste"), profiling._FragmentRerun)
+
+
+def test_rerun_ended_by_st_rerun_is_recorded(conn, metrics, monkeypatch):
+    # Pas de threads de fond pendant le test (main.py les importe à chaque exécution)_________
+    for module, name in ((backup, "start_backup_scheduler"), (encryption, "start_background_encryption"),
+                         (chat_ai, "start_warm_up")):
+        monkeypatch.setattr(module, name, lambda: None)
+    monkeypatch.setattr(chat_ai, "ollama_state", lambda: "down")
+
+    at = AppTest.from_file(str(MAIN), default_timeout=30)  # un seul profil (fixture conn) : ouvert d'office
+    at.run()
+    assert not at.exception
+    runs = len(metrics())
+
+    at.sidebar.button[0].click().run()  # 🔄 Recommencer : st.rerun()
+    assert not at.exception
+    reports = metrics()[runs:]
+    assert [report.get("interrupted") for report in reports] == ["RerunException", None]
@@ -0,0 +1,70 @@
+"""
+Recherche dans le journal (index journal_fts) : rowid construit à partir de la date et de l'id
+(voir db.models.JOURNAL_ROWID), relecture des entrées trouvées.
+"""
+import sqlite3
+from contextlib import closing
+import pytest
+from db import models
+from db.database import open_connection
+from db.models import JOURNAL_ID_BITS
+from services import search_service
+from utils.security import encrypt_value
+
+
+def add_note(conn, text, created_at, note_id=None):
+    conn.execute("INSERT INTO notes (id, user_id, content, created_at) VALUES (?, 1, ?, ?)",
+                 (note_id, encrypt_value(text), created_at))
+    conn.commit()
+
+
+def found(text, **period):
+    return [(kind, entry_id) for kind, entry_id, *_ in search_service.search_journal(text, **period)[0]]
+
+
+def test_same_second_ids_far_apart(conn):
+    """Les ids ne sont plus tronqués à 20 bits : pas de rowid en double"""
+    add_note(conn, "premier café", "2024-03-01 09:00:00", note_id=1)
+    add_note(conn, "second café", "2024-03-01 09:00:00", note_id=1 + 2 ** 20)
+
+    assert found("cafe") == [("note", 1 + 2 ** 20), ("note", 1)]
+    assert found("second") == [("note", 1 + 2 ** 20)]
+
+
+def test_unreadable_time_falls_back_to_day(conn):
+    add_note(conn, "séance de yoga", "2024-03-01 vers 18h")
+
+    assert found("yoga") == [("note", 1)]
+    assert found("yoga", start="2024-03-01", end="2024-03-01") == [("note", 1)]
+    assert found("yoga", start="2024-03-02") == []
+
+
+@pytest.mark.parametrize("created_at", [None, "hier soir"])
+def test_entry_without_usable_date_is_rejected(conn, created_at):
+    with pytest.raises(sqlite3.IntegrityError, match="date illisible"):
+        add_note(conn, "sans date", created_at)
+    conn.rollback()
+    assert conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0] == 0
+
+
+def test_id_too_large_is_rejected(conn):
+    with pytest.raises(sqlite3.IntegrityError, match="id trop grand"):
+        add_note(conn, "trop loin", "2024-03-01 09:00:00", note_id=2 ** JOURNAL_ID_BITS)
+
+
+def test_migration_stops_on_entry_without_date(db_path, monkeypatch):
+    """v12 : une entrée impossible à indexer arrête la migration, la base reste en v11"""
+    with monkeypatch.context() as patch:
+        patch.setattr(models, "MIGRATIONS", models.MIGRATIONS[:11])
+        patch.setattr(models, "SCHEMA_VERSION", 11)
+        models._init_tables()
+    with closing(open_connection(db_path)) as old, old:
+        old.execute("INSERT INTO users (prenom, tags) VALUES ('Alice', '')")
+        old.execute("INSERT INTO notes (user_id, content, created_at) VALUES (1, 'a', '2024-03-01 09:00:00')")
+        old.execute("DROP TRIGGER trg_notes_insert_fts")  # comme une base d'avant v12 : pas de refus
+        old.execute("INSERT INTO notes (user_id, content, created_at) VALUES (1, 'b', NULL)")
+
+    with pytest.raises(ValueError, match=r"notes : created_at illisible .*\(id 2\)"):
+        models.init_db()
+    with closing(open_connection(db_path)) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 11
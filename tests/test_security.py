@@ -0,0 +1,101 @@
+from contextlib import closing
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+from db import database, encryption, models
+from db.database import open_connection, set_current_user
+from services import mood_service, search_service
+from utils import security
+from utils.security import decrypt_value, encrypt_value, is_encrypted
+
+LOOKALIKES = ("fernet:", "fernet: ma note", "fernet:gAAAAA", "fernet:" + "A" * 120, "fernet:€")
+
+
+@pytest.mark.parametrize("text", LOOKALIKES)
+def test_prefixed_input_is_encrypted(db_path, text):
+    token = encrypt_value(text)
+    assert token != text and is_encrypted(token)
+    security._fresh.clear()
+    assert decrypt_value(token) == text
+
+
+@pytest.mark.parametrize("text", LOOKALIKES)
+def test_prefixed_plaintext_is_read_as_is(db_path, text):
+    assert not is_encrypted(text)
+    assert decrypt_value(text) == text
+
+
+def test_token_from_another_key_is_an_error(db_path):
+    token = security.ENCRYPTED_PREFIX + Fernet(Fernet.generate_key()).encrypt(b"secret").decode()
+    with pytest.raises(InvalidToken):
+        decrypt_value(token)
+
+
+def test_add_note_starting_with_prefix(conn):
+    """Le trigger de l'index de recherche relit la note : elle doit être chiffrée"""
+    mood_service.add_note("fernet: penser à appeler le dentiste")
+    security._fresh.clear()
+
+    stored = conn.execute("SELECT content FROM notes").fetchone()[0]
+    assert is_encrypted(stored)
+    assert mood_service.get_notes_history()[0][1] == "fernet: penser à appeler le dentiste"
+    assert len(search_service.search_journal("dentiste")[0]) == 1
+
+
+def test_background_encryption_of_prefixed_plaintext(conn):
+    """Une ancienne note en clair qui commence par le préfixe est chiffrée comme les autres"""
+    user_id = conn.execute("SELECT MAX(id) FROM users").fetchone()[0]
+    with conn:
+        conn.executemany("INSERT INTO notes (user_id, content) VALUES (?, ?)",
+                         [(user_id, "fernet: ancienne note"), (user_id, "note ordinaire"),
+                          (user_id, encrypt_value("déjà chiffrée"))])
+        conn.execute("INSERT INTO mood (user_id, mood_value, emotion, notes) VALUES (?, 5, ?, 'en clair')",
+                     (user_id, encrypt_value("calme")))
+    assert encryption.pending_rows(conn) == {"mood": 1, "notes": 2}
+
+    assert encryption.encrypt_existing_rows(pause=0) == {"mood": 1, "notes": 2}
+    assert encryption.pending_rows(conn) == {"mood": 0, "notes": 0}
+    security._fresh.clear()
+    contents = [decrypt_value(row[0]) for row in conn.execute("SELECT content FROM notes ORDER BY id")]
+    assert contents == ["fernet: ancienne note", "note ordinaire", "déjà chiffrée"]
+    assert [decrypt_value(v) for v in conn.execute("SELECT emotion, notes FROM mood").fetchone()] == ["calme", "en clair"]
+
+
+def word_positions(conn):
+    """Mots de l'index et leur position (None si l'index ne la garde pas)"""
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.journal_vocab USING fts5vocab(main, journal_fts, instance)")
+    return conn.execute("SELECT term, offset FROM temp.journal_vocab WHERE col = 'content'").fetchall()
+
+
+def test_search_index_keeps_no_word_positions(conn):
+    mood_service.add_note("rendez-vous chez le dentiste")
+
+    assert sorted(word_positions(conn)) == [("chez", None), ("dentiste", None), ("le", None),
+                                            ("rendez", None), ("vous", None)]
+    assert conn.execute("PRAGMA secure_delete").fetchone()[0] == 1
+    assert len(search_service.search_journal("dentiste rendez")[0]) == 1
+
+
+def test_migration_rebuilds_index_without_positions(db_path, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(models, "MIGRATIONS", models.MIGRATIONS[:10])
+        patch.setattr(models, "SCHEMA_VERSION", 10)
+        models._init_tables()
+    with closing(open_connection(db_path)) as old, old:
+        old.execute("INSERT INTO users (prenom, tags) VALUES ('Alice', '')")
+        old.execute("INSERT INTO notes (user_id, content) VALUES (1, ?)", (encrypt_value("appeler maman"),))
+        assert word_positions(old)[0][1] is not None
+
+    models.init_db()
+    set_current_user(1)
+    conn = database.get_connection()
+    assert sorted(word_positions(conn)) == [("appeler", None), ("maman", None)]
+    assert len(search_service.search_journal("maman")[0]) == 1
+
+
+def test_fresh_plaintexts_expire(db_path, monkeypatch):
+    monkeypatch.setattr(security, "FRESH_SECONDS", 0)
+    first = encrypt_value("premier")
+    second = encrypt_value("second")
+
+    assert first not in security._fresh  # oublié dès le chiffrement suivant
+    assert decrypt_value(first) == "premier" and decrypt_value(second) == "second"
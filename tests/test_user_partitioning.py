@@ -0,0 +1,78 @@
+from contextlib import closing
+import pytest
+from db import database, models
+from db.database import open_connection, set_current_user
+from db.models import MIGRATIONS, SCHEMA_VERSION, init_db
+from services import mood_service, search_service
+from utils.security import encrypt_value
+
+V7 = 7  # dernière version avant les profils (migration_user_partitioning)
+
+
+def build_v7(path, monkeypatch):
+    """Base d'avant les profils : un profil, des lignes sans user_id"""
+    with monkeypatch.context() as patch:
+        patch.setattr(models, "MIGRATIONS", MIGRATIONS[:V7])
+        patch.setattr(models, "SCHEMA_VERSION", V7)
+        models._init_tables()
+
+    with closing(open_connection(path)) as conn, conn:
+        conn.execute("INSERT INTO users (prenom, birth_date, tags) VALUES ('Alice', '1990-01-01', '')")
+        conn.execute("INSERT INTO mood (mood_value, emotion, notes, created_at) VALUES (?, ?, ?, ?)",
+                     (7, encrypt_value("calme"), encrypt_value("balade en forêt"), "2024-03-01 09:00:00"))
+        conn.execute("INSERT INTO tasks (title, done, created_at) VALUES ('Lire', 1, '2024-03-01')")
+        conn.execute("INSERT INTO notes (content, created_at) VALUES (?, ?)",
+                     (encrypt_value("rendez-vous médecin"), "2024-03-02 18:00:00"))
+    return path
+
+
+def columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")]
+
+
+def test_migrate_v7_to_latest(db_path, monkeypatch):
+    build_v7(db_path, monkeypatch)
+    with closing(open_connection(db_path)) as old:
+        assert "user_id" not in columns(old, "mood")
+
+    init_db()
+    conn = database.get_connection()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    owner = conn.execute("SELECT id FROM users WHERE prenom = 'Alice'").fetchone()[0]
+    for table in models.USER_TABLES:
+        assert conn.execute(f"SELECT DISTINCT user_id FROM {table}").fetchall() == [(owner,)]
+    assert conn.execute("SELECT mood_count, task_count, task_done, note_count FROM stats_totals WHERE user_id = ?",
+                        (owner,)).fetchone() == (1, 1, 1, 1)
+
+    # Les données reprises sont lisibles et cherchables par leur profil seulement____________
+    set_current_user(owner)
+    assert mood_service.get_mood_of_day("2024-03-01") == (7, "calme", None)
+    assert [hit[0] for hit in search_service.search_journal("foret")[0]] == ["mood"]
+    assert [hit[0] for hit in search_service.search_journal("medecin")[0]] == ["note"]
+    set_current_user(owner + 1)
+    assert search_service.search_journal("medecin")[0] == []
+
+    # Schéma v8+ en place : user_id obligatoire, table des habitudes____________________________
+    with pytest.raises(database.sqlite3.IntegrityError):
+        conn.execute("INSERT INTO notes (content, created_at) VALUES ('x', '2024-03-03')")
+    assert "habit_id" in columns(conn, "tasks")
+
+
+def test_failed_partitioning_keeps_v7(db_path, monkeypatch):
+    """Une erreur en fin de migration v8 laisse la base v7 intacte"""
+    build_v7(db_path, monkeypatch)
+
+    def partitioning_then_crash(cursor):
+        models.migration_user_partitioning(cursor)
+        raise RuntimeError("interrompue")
+
+    monkeypatch.setattr(models, "MIGRATIONS", MIGRATIONS[:V7] + [partitioning_then_crash])
+    monkeypatch.setattr(models, "SCHEMA_VERSION", V7 + 1)
+    with pytest.raises(RuntimeError):
+        init_db()
+
+    with closing(open_connection(db_path)) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == V7
+        assert "user_id" not in columns(conn, "mood")
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name LIKE '%_v7'").fetchall() == []
+        assert conn.execute("SELECT COUNT(*) FROM daily_stats").fetchone()[0] == 2
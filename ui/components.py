@@ -1,4 +1,52 @@
+import functools
 import streamlit as st
+from pathlib import Path
+from db.database import set_current_user
+from utils.profiling import fragment_rerun, span
+
+THEME_FILE = Path("assets/theme.css")
+
+
+@functools.lru_cache(maxsize=1)
+def _theme_css():
+    return THEME_FILE.read_text() if THEME_FILE.exists() else None
+
+
+def apply_theme():
+    """Injecte le thème CSS (optionnel) ; le fichier n'est lu qu'une fois par processus"""
+    css = _theme_css()
+    if css:
+        st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
+
+
+def fragment(content_fn):
+    """
+    Bloc relancé seul quand on interagit avec lui (st.fragment), sans le reste de la page.
+    Un rerun partiel peut tourner dans un autre thread : le profil actif y est refixé.
+    """
+    name = f"{content_fn.__module__}.{content_fn.__qualname__}"
+
+    @functools.wraps(content_fn)
+    def run():
+        set_current_user(st.session_state.get("user_id"))
+        with fragment_rerun(name):
+            content_fn()
+
+    return st.fragment(run)
+
+
+def callback(fn):
+    """
+    Callback de widget (on_click, on_change) : il tourne avant le script et les fragments,
+    le profil actif n'y est pas encore fixé.
+    """
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        set_current_user(st.session_state.get("user_id"))
+        return fn(*args, **kwargs)
+
+    return run
+
 
 def card(title, content_fn, height=None):
     """
@@ -20,7 +68,8 @@ def card(title, content_fn, height=None):
     """
     
     st.markdown(style, unsafe_allow_html=True)
-    content_fn()  # Affiche ton contenu_________________________________
+    with span(f"carte : {title}", "render"):
+        content_fn()  # Affiche ton contenu_________________________________
     st.markdown("</div>", unsafe_allow_html=True)  # Fermeture de la div_
 
 
@@ -1,15 +1,46 @@
 import streamlit as st
-import pandas as pd
 from datetime import date, timedelta
-from ui.components import card
-from services.mood_service import get_mood_history, save_mood, add_note
-from services.habit_service import get_today_tasks, add_task, toggle_task, delete_task
-from services.chat_service import render_chat_section
-from services.export_service import render_export_section, show_data_stats
-from db.models import save_profile_to_db
+from ui.components import callback, card, fragment
+from services.mood_service import get_mood_history, get_today_mood, get_notes_history, save_mood, add_note, NOTES_PAGE_SIZE
+from services.habit_service import (
+    get_today_tasks, get_task_history, add_task, toggle_task, delete_task, HISTORY_PAGE_SIZE,
+    get_habits, add_habit, archive_habit, expand_habits, WEEKDAYS, DAY_NAMES
+)
+from services.stats_service import get_totals
+from services.search_service import search_journal, RELEVANCE, RECENT
+from db.models import save_profile_to_db, load_profile_from_db
+from db.database import set_current_user
+from utils.dates import day_cursor
+from utils.profiling import profiled, span
 
 
 #Profil_____________________________________________________________________________________
+@profiled
+def render_profile_picker(profiles):
+    """Choix du profil quand plusieurs personnes utilisent la même base"""
+    st.header("👋 Qui est là ?")
+    cols = st.columns(min(len(profiles), 4) + 1)
+    for i, (user_id, prenom) in enumerate(profiles):
+        with cols[i % (len(cols) - 1)]:
+            if st.button(f"💙 {prenom}", key=f"profile_pick_{user_id}", use_container_width=True):
+                select_profile(user_id)
+                st.rerun()
+    with cols[-1]:
+        if st.button("➕ Nouveau profil", use_container_width=True):
+            st.session_state.new_profile = True
+            st.rerun()
+
+def select_profile(user_id):
+    """Active un profil existant pour la session"""
+    st.session_state.user_id = user_id
+    st.session_state.profile = load_profile_from_db(user_id)
+    st.session_state.profile_created = True
+    st.session_state.intro_done = True
+    st.session_state.mood_logged_today = False
+    st.query_params["profil"] = str(user_id)
+    set_current_user(user_id)
+
+@profiled
 def render_profile_page():
     st.header("👋 Bienvenue !")
     card("Créons ton profil", profil_form)
@@ -40,13 +71,17 @@ def profil_form():
         st.session_state.profile_created = True
 
         #Enregistrer dans la base_______________________________________________________________
-        save_profile_to_db(prenom, birth_date.isoformat(), tags_list)
+        st.session_state.user_id = save_profile_to_db(prenom, birth_date.isoformat(), tags_list)
+        st.session_state.new_profile = False
+        st.query_params["profil"] = str(st.session_state.user_id)
+        set_current_user(st.session_state.user_id)
 
         st.success("✅ Profil enregistré ! On continue...")
         st.rerun()
 
 
 # Intro_________________________________________________________________________________________
+@profiled
 def render_intro_page():
     st.header(f"💙 Merci {st.session_state.profile['prenom']}")
     card("Comment ça va se passer ?", intro_text)
@@ -71,6 +106,7 @@ def intro_text():
 
 
 #Home / Mood du jour_____________________________________________________________________________________________
+@profiled
 def render_home_page():
     st.header(f"☀️ Bonjour {st.session_state.profile['prenom']} !")
     card("Comment te sens-tu aujourd'hui ?", mood_form)
@@ -96,42 +132,61 @@ def mood_form():
 
 
 #Dashboard__________________________________________________________________________________________________________
+DASHBOARD_TABS = ["🏠 Aujourd'hui", "💬 Mathi", "📈 Historique", "⚙️ Export"]
+
+@profiled
 def render_dashboard():
     st.header(f"📊 Tableau de bord - {date.today().strftime('%d/%m/%Y')}")
     
-    #Menu de navigation_____________________________________________________________________________________________
-    tab1, tab2, tab3, tab4 = st.tabs(["🏠 Aujourd'hui", "💬 Mathi", "📈 Historique", "⚙️ Export"])
+    #Menu de navigation : seul l'onglet ouvert est construit (changer d'onglet relance la page)__
+    today, chat, history, export = st.tabs(DASHBOARD_TABS, key="dashboard_tab", on_change="rerun")
     
-    with tab1:
-        render_today_tab()
+    if today.open:
+        with today:
+            render_today_tab()
     
-    with tab2:
-        render_chat_section()
+    # Chat et exports importés au premier affichage de leur onglet (voir README, démarrage)____
+    if chat.open:
+        with chat:
+            from services.chat_service import render_chat_section
+            fragment(render_chat_section)()
     
-    with tab3:
-        render_history_tab()
+    if history.open:
+        with history:
+            render_history_tab()
     
-    with tab4:
-        show_data_stats()
-        st.divider()
-        render_export_section()
+    if export.open:
+        with export, span("onglet Export", "render"):
+            from services.export_service import render_export_section, show_data_stats
+            from services.import_service import render_import_section
+            from services.backup_service import render_backup_section
+            show_data_stats()
+            st.divider()
+            render_export_section()
+            st.divider()
+            render_import_section()
+            st.divider()
+            render_backup_section()
 
 
+@profiled
 def render_today_tab():
-    """Onglet principal avec tâches et notes"""
+    """Onglet principal avec tâches et notes (tâches et notes relancées seules, en fragments)"""
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        card("✅ Mes tâches", render_task_calendar)
+        card("✅ Mes tâches", fragment(render_task_calendar))
     
     with col2:
-        card("💭 Notes rapides", render_quick_notes)
+        card("💭 Notes rapides", fragment(render_quick_notes))
         card("📊 Humeur d'aujourd'hui", render_today_mood)
 
 
+@profiled
 def render_history_tab():
     """Onglet historique"""
     card("📈 Évolution de ton humeur", render_mood_summary)
+    card("🔎 Rechercher dans ton journal", render_journal_search)
     
     col1, col2 = st.columns(2)
     with col1:
@@ -140,7 +195,38 @@ def render_history_tab():
         card("📝 Dernières notes", render_notes_history)
 
 
+def load_history_pages(key, fetch, page_size):
+    """
+    Historique paginé par curseur : un sélecteur de date pour sauter à un jour,
+    puis les pages déjà affichées, relues depuis le cache. Renvoie (lignes, reste_des_pages).
+    Les lignes commencent par l'id et finissent par created_at.
+    """
+    day = st.date_input("📅 Aller au", value=None, max_value=date.today(), key=f"{key}_day")
+
+    # Premier affichage ou autre jour : on repart d'une seule page__________________________
+    if f"{key}_pages" not in st.session_state or st.session_state[f"{key}_from"] != day:
+        st.session_state[f"{key}_from"] = day
+        st.session_state[f"{key}_pages"] = 1
+
+    rows = []
+    before = day_cursor(day) if day else None
+    for _ in range(st.session_state[f"{key}_pages"]):
+        page = fetch(page_size, before)
+        rows += page
+        if len(page) < page_size:
+            return rows, False
+        before = (page[-1][-1], page[-1][0])
+    return rows, True
+
+
+def load_more_button(key):
+    if st.button("⬇️ Voir plus", key=f"{key}_more"):
+        st.session_state[f"{key}_pages"] += 1
+        st.rerun()
+
+
 #Tâches / Calendrier_________________________________________________________________________
+@profiled
 def render_task_calendar():
     """Affiche les tâches filtrées par date"""
     today = date.today()
@@ -157,56 +243,128 @@ def render_task_calendar():
         )
         st.session_state.selected_day = selected_day
 
-    # Affichage des tâches____________________________________________________
+    # Affichage des tâches (occurrences d'habitudes du jour créées si elles manquent)________
+    expand_habits(selected_day)
     tasks = get_today_tasks(task_date=selected_day)
-    
+    streaks = habit_streaks() if any(task[4] for task in tasks) else {}
+
     if tasks:
-        for task_id, title, done, task_date in tasks:
+        for task_id, title, done, task_date, habit_id in tasks:
             col1, col2 = st.columns([4, 1])
             with col1:
                 checked = st.checkbox(
-                    title, 
+                    f"🔁 {title}" if habit_id else title, 
                     value=bool(done), 
                     key=f"task_{task_id}"
                 )
+                # La case affiche déjà le nouvel état : un UPDATE, pas de rerun____________
                 if checked != bool(done):
                     toggle_task(task_id, checked)
-                    st.rerun()
+                    if habit_id is not None:
+                        streaks = habit_streaks()  # la série vient de changer
             with col2:
-                if st.button("🗑️", key=f"del_{task_id}"):
-                    delete_task(task_id)
-                    st.rerun()
+                if habit_id is None:
+                    st.button("🗑️", key=f"del_{task_id}", on_click=callback(delete_task), args=(task_id,))
+                else:
+                    streak = streaks.get(habit_id, 0)
+                    if streak:
+                        st.caption(f"🔥 {streak}")
     else:
         st.info("Aucune tâche pour cette date 📝")
 
-    # Ajouter une tâche_______________________________________________________________
+    # Ajouter une tâche : le callback passe avant le fragment, pas de second rerun______
     with st.form("new_task_form", clear_on_submit=True):
-        new_task = st.text_input("", placeholder="➕ Ajouter une tâche...")
-        submitted = st.form_submit_button("Ajouter", type="primary")
-        
-        if submitted and new_task.strip():
-            add_task(new_task, task_date=selected_day)
-            st.rerun()
+        st.text_input("", placeholder="➕ Ajouter une tâche...", key="new_task")
+        st.form_submit_button("Ajouter", type="primary", on_click=callback(add_task_from_form), args=(selected_day,))
+
+    # Habitudes dans le même fragment : en créer une l'ajoute aussitôt à la liste__________
+    habits = st.expander("🔁 Mes habitudes", key="habits_open", on_change="rerun")
+    if habits.open:
+        with habits:
+            render_habits()
+
+
+def habit_streaks():
+    """Série en cours de chaque habitude active {id: série}"""
+    return {habit[0]: habit[3] for habit in get_habits()}
+
+
+def add_task_from_form(task_date):
+    title = st.session_state.new_task
+    if title.strip():
+        add_task(title, task_date=task_date)
+
+
+#Habitudes______________________________________________________________________________________
+HABIT_RHYTHMS = ("Tous les jours", "En semaine", "Tous les N jours", "Certains jours")
+
+@profiled
+def render_habits():
+    """Habitudes récurrentes : séries, taux de réussite, création et archivage"""
+    habits = get_habits()
+    for habit_id, title, rhythm, streak, best, rate in habits:
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.markdown(f"**{title}** · {rhythm}")
+            st.caption(f"🔥 Série : {streak} · 🏆 Record : {best}"
+                       + (f" · ✅ {rate:.0%} réussi" if rate is not None else ""))
+        with col2:
+            st.button("📦", key=f"archive_{habit_id}", help="Archiver (l'historique est gardé)",
+                      on_click=callback(archive_habit), args=(habit_id,))
+    if not habits:
+        st.info("Une habitude revient toute seule dans tes tâches, aux jours choisis 🌱")
+
+    if st.session_state.get("habit_error"):
+        st.warning(st.session_state.pop("habit_error"))
+
+    with st.form("new_habit_form", clear_on_submit=True):
+        st.text_input("", placeholder="🔁 Nouvelle habitude...", key="new_habit")
+        st.selectbox("Rythme", HABIT_RHYTHMS, key="new_habit_rhythm")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.number_input("N (tous les N jours)", min_value=2, value=2, key="new_habit_every")
+        with col2:
+            st.multiselect("Jours (certains jours)", DAY_NAMES, key="new_habit_days")
+        st.form_submit_button("Créer l'habitude", on_click=callback(add_habit_from_form))
+
+
+def add_habit_from_form():
+    title = st.session_state.new_habit.strip()
+    rhythm = st.session_state.new_habit_rhythm
+    if not title:
+        return
+    if rhythm == "Tous les N jours":
+        add_habit(title, interval=st.session_state.new_habit_every)
+    elif rhythm == "En semaine":
+        add_habit(title, weekdays=WEEKDAYS)
+    elif rhythm == "Certains jours":
+        if not st.session_state.new_habit_days:
+            st.session_state.habit_error = "⚠️ Choisis au moins un jour."
+            return
+        add_habit(title, weekdays=sum(1 << DAY_NAMES.index(day) for day in st.session_state.new_habit_days))
+    else:
+        add_habit(title)
 
 
+@profiled
 def render_task_history():
-    """Affiche l'historique des tâches"""
-    conn = st.session_state.conn
-    df = pd.read_sql("""
-        SELECT title, done, created_at 
-        FROM tasks 
-        ORDER BY created_at DESC 
-        LIMIT 20
-    """, conn)
+    """Affiche l'historique des tâches, par pages"""
+    import pandas as pd
+
+    rows, has_more = load_history_pages("task_history", get_task_history, HISTORY_PAGE_SIZE)
+    df = pd.DataFrame(rows, columns=["id", "title", "done", "created_at"]).drop(columns="id")
     
     if not df.empty:
         df['done'] = df['done'].map({0: '⬜', 1: '✅'})
         st.dataframe(df, hide_index=True, use_container_width=True)
+        if has_more:
+            load_more_button("task_history")
     else:
         st.info("Pas encore d'historique")
 
 
 #Notes__________________________________________________________________________________________________
+@profiled
 def render_quick_notes():
     """Bloc notes rapide"""
     with st.form("note_form", clear_on_submit=True):
@@ -220,53 +378,89 @@ def render_quick_notes():
         if submitted and note.strip():
             add_note(note)
             st.success("✅ Note sauvegardée !")
-            st.rerun()
 
 
+@profiled
 def render_notes_history():
-    """Affiche les dernières notes"""
-    conn = st.session_state.conn
-    df = pd.read_sql("""
-        SELECT content, created_at 
-        FROM notes 
-        ORDER BY created_at DESC 
-        LIMIT 5
-    """, conn)
+    """Affiche les dernières notes, par pages"""
+    rows, has_more = load_history_pages("notes_history", get_notes_history, NOTES_PAGE_SIZE)
     
-    if not df.empty:
-        for _, row in df.iterrows():
-            st.markdown(f"**{row['created_at'][:10]}**")
-            st.text(row['content'][:100] + ("..." if len(row['content']) > 100 else ""))
+    if rows:
+        for _, content, created_at in rows:
+            st.markdown(f"**{created_at[:10]}**")
+            st.text(content[:100] + ("..." if len(content) > 100 else ""))
             st.divider()
+        if has_more:
+            load_more_button("notes_history")
     else:
         st.info("Pas encore de notes")
 
 
+#Recherche______________________________________________________________________________________________
+SEARCH_ORDERS = {"Plus récents": RECENT, "Pertinence": RELEVANCE}
+
+@profiled
+def render_journal_search():
+    """Recherche dans les notes et les humeurs, par pages de 20"""
+    col1, col2, col3 = st.columns([3, 2, 1])
+    with col1:
+        query = st.text_input("Mots recherchés", placeholder="Ex: sommeil, anxieux, sport...", key="search_query")
+    with col2:
+        period = st.date_input("📅 Période (optionnel)", value=(), max_value=date.today(), key="search_period")
+    with col3:
+        order = st.selectbox("Tri", list(SEARCH_ORDERS), key="search_order")
+
+    if not query.strip():
+        return
+
+    start = period[0].isoformat() if period else None
+    end = period[-1].isoformat() if period else None
+    search = (query, start, end, SEARCH_ORDERS[order])
+
+    # Nouvelle recherche : on repart de la première page____________________________________
+    if st.session_state.get("search_key") != search:
+        st.session_state.search_key = search
+        st.session_state.search_pages = 1
+
+    # Pages relues depuis le cache tant que les données ne changent pas__________________
+    results, cursor = search_journal(*search)
+    for _ in range(st.session_state.search_pages - 1):
+        if cursor is None:
+            break
+        more, cursor = search_journal(*search, after=cursor)
+        results = results + more
+
+    if not results:
+        st.info("Aucun résultat 🔍")
+        return
+
+    for kind, _, created_at, snippet in results:
+        label = "📝 Note" if kind == "note" else "📊 Humeur"
+        st.markdown(f"**{created_at[:10]}** · {label}  \n{snippet}")
+
+    if cursor and st.button("⬇️ Plus de résultats", key="search_more"):
+        st.session_state.search_pages += 1
+        st.rerun()
+
+
 #Humeur______________________________________________________________________________________________
+@profiled
 def render_today_mood():
     """Affiche l'humeur du jour"""
-    conn = st.session_state.conn
-    today = date.today().isoformat()
-    
-    df = pd.read_sql(f"""
-        SELECT mood_value, emotion, motivation 
-        FROM mood 
-        WHERE DATE(created_at) = '{today}'
-        ORDER BY created_at DESC 
-        LIMIT 1
-    """, conn)
+    mood = get_today_mood()
     
-    if not df.empty:
-        mood = df.iloc[0]
-        st.metric("Humeur", f"{mood['mood_value']}/10")
-        if mood['emotion']:
-            st.write(f"💭 {mood['emotion']}")
-        if mood['motivation']:
-            st.write(f"🎯 {mood['motivation']}")
+    if mood:
+        mood_value, emotion, motivation = mood
+        st.metric("Humeur", f"{mood_value}/10")
+        if emotion:
+            st.write(f"💭 {emotion}")
+        if motivation:
+            st.write(f"🎯 {motivation}")
     else:
         st.info("Pas encore d'humeur pour aujourd'hui")
 
 
+@profiled
 def render_mood_summary():
     """Graphique de l'évolution de l'humeur"""
     data = get_mood_history()
@@ -275,17 +469,20 @@ def render_mood_summary():
         st.info("Pas encore d'humeur enregistrée 📊")
         return
 
+    import pandas as pd
+
     df = pd.DataFrame(data, columns=["Date", "Humeur"])
     df["Date"] = pd.to_datetime(df["Date"])
     
     # Graphique__________________________________________________________________________________
     st.line_chart(df.set_index("Date")["Humeur"])
     
-    # Statistiques_______________________________________________________________________________
+    # Statistiques (table stats_totals, pas de parcours de l'historique)_______________________
+    totals = get_totals()
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Moyenne", f"{df['Humeur'].mean():.1f}/10")
+        st.metric("Moyenne", f"{totals['mood_avg']:.1f}/10")
     with col2:
-        st.metric("Maximum", f"{df['Humeur'].max()}/10")
+        st.metric("Maximum", f"{totals['mood_max']}/10")
     with col3:
-        st.metric("Minimum", f"{df['Humeur'].min()}/10")
\ No newline at end of file
+        st.metric("Minimum", f"{totals['mood_min']}/10")
\ No newline at end of file
@@ -0,0 +1,19 @@
+from datetime import date, timedelta
+
+
+def to_day(value=None) -> str:
+    """Date au format de la colonne day (AAAA-MM-JJ) ; aujourd'hui par défaut"""
+    if value is None:
+        value = date.today()
+    return value.strftime("%Y-%m-%d")
+
+
+def day_range(start, end):
+    """Bornes (incluses) pour une requête WHERE day BETWEEN ? AND ?"""
+    return to_day(start), to_day(end)
+
+
+
+def day_cursor(value):
+    """Curseur (created_at, id) d'historique placé juste après ce jour : la page suivante commence à ce jour"""
+    return to_day(value + timedelta(days=1)), 0
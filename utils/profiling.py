@@ -0,0 +1,209 @@
+"""
+Mesure du temps passé dans chaque requête SQL et chaque fonction d'affichage, par rerun.
+
+Activé seulement si la variable d'environnement HELPDESK_PROFILE vaut 1 :
+    HELPDESK_PROFILE=1 streamlit run main.py
+Désactivé, @profiled renvoie la fonction telle quelle, span() ne fait rien et les
+connexions sont des sqlite3.Connection ordinaires : aucun coût à l'exécution.
+
+Chaque rerun ajoute une ligne JSON à METRICS_FILE :
+    {"ts": ..., "total_ms": ..., "spans": {nom: {"kind", "calls", "ms", "rows"}}}
+Les temps des fonctions imbriquées sont inclusifs (render_dashboard contient ses onglets).
+Un fragment relancé seul (voir ui.components.fragment) ajoute sa propre ligne, avec "fragment": nom.
+"""
+import contextlib
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+ENABLED = os.environ.get("HELPDESK_PROFILE") == "1"
+METRICS_FILE = Path("data/metrics.jsonl")
+METRICS_MAX_BYTES = 5 * 1024 * 1024  # au-delà, le fichier passe en .1 et on repart de zéro
+STATEMENT_CHARS = 80  # début de la requête gardé comme nom
+
+_local = threading.local()  # rerun en cours du thread (None hors d'un rerun)
+_write_lock = threading.Lock()
+_NO_SPAN = contextlib.nullcontext()
+
+
+def record(name, kind, seconds, rows=0, calls=1):
+    """Ajoute une mesure au rerun en cours du thread (ignorée hors d'un rerun)"""
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None:
+        return
+    stat = rerun["spans"].get(name)
+    if stat is None:
+        stat = rerun["spans"][name] = {"kind": kind, "calls": 0, "ms": 0.0, "rows": 0}
+    stat["calls"] += calls
+    stat["ms"] += seconds * 1000
+    stat["rows"] += rows
+
+
+def profiled(fn):
+    """Décorateur : temps et nombre d'appels de la fonction à chaque rerun"""
+    if not ENABLED:
+        return fn
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            record(name, "render", time.perf_counter() - start)
+
+    return wrapper
+
+
+class _Span:
+    def __init__(self, name, kind):
+        self.name, self.kind = name, kind
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, self.kind, time.perf_counter() - self.start)
+
+
+def span(name, kind="block"):
+    """Contexte mesuré : with span("carte : Mes tâches"): ..."""
+    return _Span(name, kind) if ENABLED else _NO_SPAN
+
+
+#Requêtes SQL_________________________________________________________________________________
+def _statement(sql):
+    return re.sub(r"\s+", " ", sql).strip()[:STATEMENT_CHARS]
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Curseur qui mesure l'exécution et la lecture des lignes, rattachées à la même requête"""
+    _name = None
+
+    def _timed(self, sql, run):
+        self._name = _statement(sql)
+        start = time.perf_counter()
+        try:
+            return run()
+        finally:
+            record(self._name, "sql", time.perf_counter() - start, max(self.rowcount, 0))
+
+    def execute(self, sql, parameters=()):
+        return self._timed(sql, lambda: super(ProfiledCursor, self).execute(sql, parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(sql, lambda: super(ProfiledCursor, self).executemany(sql, seq_of_parameters))
+
+    def executescript(self, script):
+        return self._timed(script, lambda: super(ProfiledCursor, self).executescript(script))
+
+    def _fetched(self, start, rows):
+        record(self._name, "sql", time.perf_counter() - start, rows, calls=0)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows))
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        row = super().__next__()
+        self._fetched(start, 1)
+        return row
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connexion dont toutes les requêtes passent par ProfiledCursor (voir open_connection)"""
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+
+CONNECTION_FACTORY = ProfiledConnection if ENABLED else sqlite3.Connection
+
+
+#Début et fin d'un rerun______________________________________________________________________
+def begin_rerun():
+    """Commence la mesure d'un rerun du thread ; une mesure restée ouverte est abandonnée"""
+    _local.rerun = {"start": time.perf_counter(), "spans": {}} if ENABLED else None
+
+
+def end_rerun(**fields):
+    """Termine le rerun du thread, l'ajoute à METRICS_FILE et le renvoie (None si désactivé)"""
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None:
+        return None
+    _local.rerun = None
+
+    report = {
+        "ts": time.time(),
+        **fields,
+        "total_ms": round((time.perf_counter() - rerun["start"]) * 1000, 3),
+        "spans": {
+            name: {**stat, "ms": round(stat["ms"], 3)}
+            for name, stat in sorted(rerun["spans"].items(), key=lambda item: -item[1]["ms"])
+        },
+    }
+    line = json.dumps(report, ensure_ascii=False) + "\n"
+    with _write_lock:
+        METRICS_FILE.parent.mkdir(exist_ok=True, mode=0o700)
+        if METRICS_FILE.exists() and METRICS_FILE.stat().st_size > METRICS_MAX_BYTES:
+            METRICS_FILE.replace(METRICS_FILE.with_suffix(".jsonl.1"))
+        with open(METRICS_FILE, "a", encoding="utf-8") as f:
+            f.write(line)
+    return report
+
+
+#Fragments relancés seuls_____________________________________________________________________
+class _FragmentRerun:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        begin_rerun()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            end_rerun(fragment=self.name)
+        else:
+            end_rerun(fragment=self.name, interrupted=exc_type.__name__)
+
+
+def fragment_rerun(name):
+    """
+    Contexte d'un fragment : relancé seul, il est mesuré comme un rerun ;
+    pendant un rerun complet, il en fait partie et n'est pas compté à part.
+    """
+    if not ENABLED or getattr(_local, "rerun", None) is not None:
+        return _NO_SPAN
+    return _FragmentRerun(name)
@@ -1,9 +1,181 @@
+import unicodedata
+from pathlib import Path
+
+LEXICON_FILE = Path("assets/distress_lexicon.txt")
+
+# Lexique minimal si le fichier n'est pas disponible______________________________________
+DEFAULT_LEXICON = ["suicid*", "je veux mourir", "inutile", "je veux en finir", "desespere*"]
+
+# Variantes d'écriture ramenées à une forme unique, mot par mot__________________________
+SPELLING_VARIANTS = {
+    "j": "je",
+    "jveux": "je veux",
+    "jvais": "je vais",
+    "jsuis": "je suis",
+    "chui": "je suis",
+    "chuis": "je suis",
+    "veu": "veux",
+    "veut": "veux",
+    "vx": "veux",
+    "ve": "veux",
+    "mourrir": "mourir",
+    "mourire": "mourir",
+    "finire": "finir",
+    "m": "me",
+    "pu": "plus",
+    "plu": "plus",
+    "ptet": "peut etre",
+}
+
+
+def normalize_text(text: str) -> str:
+    """
+    Minuscules, sans accents, apostrophes et ponctuation remplacées par des espaces,
+    variantes d'écriture corrigées. Le résultat commence et finit par un espace
+    pour que les motifs " mot " respectent les limites de mots.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    chars = [c if c.isalnum() else " " for c in text if not unicodedata.combining(c)]
+    words = [SPELLING_VARIANTS.get(w, w) for w in "".join(chars).split()]
+    return " " + " ".join(words) + " "
+
+
+class DistressDetector:
+    """
+    Automate Aho-Corasick compilé à partir d'un lexique.
+    Tous les motifs sont cherchés en un seul passage sur le texte normalisé :
+    le coût dépend de la longueur du message, pas de la taille du lexique.
+    Un motif terminé par "*" est un préfixe (ex: "suicid*" → suicide, suicidaire).
+    """
+
+    def __init__(self, phrases):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for phrase in phrases:
+            self._add(phrase)
+        self._build_failures()
+
+    def _add(self, phrase):
+        prefix = phrase.endswith("*")
+        pattern = normalize_text(phrase.rstrip("*"))
+        if not pattern.strip():
+            return
+        if prefix:
+            pattern = pattern.rstrip()
+
+        node = 0
+        for c in pattern:
+            if c not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][c] = len(self._goto) - 1
+            node = self._goto[node][c]
+        self._out[node].append(phrase)
+
+    def _build_failures(self):
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for c, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and c not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[child] = self._goto[f].get(c, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def step(self, node, c):
+        """Avance l'automate d'un caractère (texte déjà normalisé)"""
+        while node and c not in self._goto[node]:
+            node = self._fail[node]
+        return self._goto[node].get(c, 0)
+
+    def scan(self, text: str, first_only: bool = False):
+        """Renvoie les entrées du lexique trouvées dans le texte"""
+        found = []
+        node = 0
+        for c in normalize_text(text):
+            node = self.step(node, c)
+            if self._out[node]:
+                found.extend(self._out[node])
+                if first_only:
+                    break
+        return found
+
+    def matches(self, text: str) -> bool:
+        return bool(self.scan(text, first_only=True))
+
+    def stream(self):
+        return DistressStream(self)
+
+
+class DistressStream:
+    """
+    Analyse un texte reçu par morceaux (réponse du modèle en streaming).
+    Le dernier mot, peut-être incomplet, est gardé jusqu'au morceau suivant.
+    """
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.found = []
+        self._node = 0
+        self._pending = ""
+        self._started = False
+
+    def _consume(self, text):
+        normalized = normalize_text(text)
+        if not normalized.strip():
+            return
+        # Les morceaux s'enchaînent : un seul espace entre deux segments___________________
+        if self._started:
+            normalized = normalized[1:]
+        self._started = True
+        for c in normalized:
+            self._node = self.detector.step(self._node, c)
+            self.found.extend(self.detector._out[self._node])
+
+    def feed(self, chunk: str) -> bool:
+        """Ajoute un morceau ; renvoie True dès qu'une détresse a été repérée"""
+        text = self._pending + chunk
+        cut = max(text.rfind(" "), text.rfind("\n"))
+        if cut >= 0:
+            self._consume(text[:cut])
+            self._pending = text[cut + 1:]
+        else:
+            self._pending = text
+        return bool(self.found)
+
+    def close(self) -> bool:
+        if self._pending:
+            self._consume(self._pending)
+            self._pending = ""
+        return bool(self.found)
+
+
+def load_lexicon(path=LEXICON_FILE):
+    """Lit le lexique (une expression par ligne, # pour les commentaires)"""
+    if not path.exists():
+        return list(DEFAULT_LEXICON)
+    lines = (line.split("#", 1)[0].strip() for line in path.read_text(encoding="utf-8").splitlines())
+    return [line for line in lines if line]
+
+
+_detector = None
+
+
+def get_detector() -> DistressDetector:
+    """Automate compilé une seule fois par processus"""
+    global _detector
+    if _detector is None:
+        _detector = DistressDetector(load_lexicon())
+    return _detector
+
+
 def detect_distress(message: str) -> bool:
-    keywords = ["suicide", "je veux mourir", "inutile", "je veux en finir", "désespéré"]
-    msg_lower = message.lower()
-    return any(k in msg_lower for k in keywords)
+    return get_detector().matches(message)
 
 def safety_response():
     return (" Je vois que tu vis un moment difficile."
             " Je suis là pour t'écouter, mais si tu es dans cette détresse parle en à un proche ou un professionnel de santé."
-            " Tu n'es pas seul, crois-moi.")
\ No newline at end of file
+            " Tu n'es pas seul, crois-moi.")
@@ -1,32 +1,137 @@
-from cryptography.fernet import Fernet
+import base64
+import os
+import threading
+import time
+from cryptography.fernet import Fernet, InvalidToken
 from pathlib import Path
 
 KEY_FILE = Path("data/secret.key")
 
-def get_cipher():
+# Les valeurs chiffrées sont stockées en texte avec ce préfixe suivi du jeton Fernet. Le préfixe
+# seul ne prouve rien (un texte saisi peut commencer par "fernet:") : une valeur n'est lue comme
+# chiffrée que si la suite a la forme d'un jeton Fernet (voir _token).
+ENCRYPTED_PREFIX = "fernet:"
+TOKEN_VERSION = 0x80
+TOKEN_OVERHEAD = 57  # version (1) + horodatage (8) + IV (16) + HMAC (32), puis blocs AES de 16 octets
+
+_cipher = None
+_cipher_lock = threading.Lock()
+
+# Valeurs chiffrées récemment par ce processus : les triggers qui relisent la ligne insérée
+# (decrypt_field, index de recherche) évitent un déchiffrement. Ce sont des textes en clair
+# gardés en mémoire : chacun est oublié FRESH_SECONDS après son chiffrement, et tout est vidé
+# au-delà de FRESH_TOKENS.
+FRESH_TOKENS = 10_000
+FRESH_SECONDS = 30
+_fresh = {}  # jeton -> (texte, expiration) dans l'ordre de chiffrement
+_fresh_lock = threading.Lock()
+
+
+def get_cipher() -> Fernet:
     """
-    Génère ou charge une clé de chiffrement pour sécuriser les données sensibles.
-    Note : Pour l'instant, cette fonction n'est pas utilisée dans l'application,
-    mais elle est prête pour une future implémentation de chiffrement.
+    Génère ou charge la clé de chiffrement des données sensibles.
+    La clé est lue une seule fois par processus.
     """
-    # Crée le dossier data s'il n'existe pas__________________________________________
-    KEY_FILE.parent.mkdir(exist_ok=True)
-    
-    # Génère une nouvelle clé si elle n'existe pas____________________________________
-    if not KEY_FILE.exists():
-        KEY_FILE.write_bytes(Fernet.generate_key())
-    
-    # Retourne le cipher______________________________________________________________
-    return Fernet(KEY_FILE.read_bytes())
+    global _cipher
+    with _cipher_lock:
+        if _cipher is None:
+            # Crée le dossier data s'il n'existe pas__________________________________________
+            KEY_FILE.parent.mkdir(exist_ok=True, mode=0o700)
+
+            # Génère une nouvelle clé si elle n'existe pas (lisible par le propriétaire seul)____
+            if not KEY_FILE.exists():
+                fd = os.open(KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(Fernet.generate_key())
+
+            _cipher = Fernet(KEY_FILE.read_bytes())
+        return _cipher
 
 
 def encrypt_data(data: str) -> bytes:
     """Chiffre des données sensibles"""
-    cipher = get_cipher()
-    return cipher.encrypt(data.encode())
+    return get_cipher().encrypt(data.encode())
 
 
 def decrypt_data(encrypted_data: bytes) -> str:
     """Déchiffre des données"""
-    cipher = get_cipher()
-    return cipher.decrypt(encrypted_data).decode()
\ No newline at end of file
+    return get_cipher().decrypt(encrypted_data).decode()
+
+
+#Champs de la base_______________________________________________________________________________
+def _token(value):
+    """Jeton Fernet contenu dans une valeur de colonne, ou None si elle n'en a pas la forme"""
+    if not isinstance(value, str) or not value.startswith(ENCRYPTED_PREFIX):
+        return None
+    try:
+        token = value[len(ENCRYPTED_PREFIX):].encode("ascii")
+        raw = base64.b64decode(token, altchars=b"-_", validate=True)
+    except ValueError:
+        return None
+    size = len(raw) - TOKEN_OVERHEAD
+    if raw[:1] != bytes([TOKEN_VERSION]) or size < 16 or size % 16:
+        return None
+    return token
+
+
+def is_encrypted(value) -> bool:
+    return _token(value) is not None
+
+
+def encrypt_value(value):
+    """
+    Chiffre une valeur de colonne (None et "" restent tels quels).
+    Toujours chiffrée, même si elle ressemble déjà à une valeur chiffrée : c'est une saisie.
+    """
+    if not value:
+        return value
+    token = ENCRYPTED_PREFIX + encrypt_data(value).decode("ascii")
+    now = time.monotonic()
+    with _fresh_lock:
+        if len(_fresh) >= FRESH_TOKENS:
+            _fresh.clear()
+        # Les plus anciens d'abord : on s'arrête au premier encore valable____________________
+        expired = []
+        for old, (_, expires) in _fresh.items():
+            if expires > now:
+                break
+            expired.append(old)
+        for old in expired:
+            del _fresh[old]
+        _fresh[token] = (value, now + FRESH_SECONDS)
+    return token
+
+
+def decrypt_value(value):
+    """
+    Déchiffre une valeur de colonne ; un texte en clair (ligne pas encore migrée) est renvoyé
+    tel quel. Un jeton bien formé que la clé ne déchiffre pas est une erreur (clé changée).
+    """
+    fresh = _fresh.get(value)
+    if fresh is not None and fresh[1] > time.monotonic():
+        return fresh[0]
+    token = _token(value)
+    if token is None:
+        return value
+    try:
+        return get_cipher().decrypt(token).decode()
+    except InvalidToken:
+        raise InvalidToken(f"Impossible de déchiffrer une valeur : la clé {KEY_FILE} a-t-elle changé ?") from None
+
+
+def encrypt_rows(rows, positions):
+    """Chiffre les colonnes aux positions données, pour un lot de lignes (tuples)"""
+    return [
+        tuple(encrypt_value(v) if i in positions else v for i, v in enumerate(row))
+        for row in rows
+    ]
+
+
+def decrypt_rows(rows, positions):
+    """Déchiffre les colonnes aux positions données, pour un lot de lignes (tuples)"""
+    if not positions:
+        return list(rows)
+    return [
+        tuple(decrypt_value(v) if i in positions else v for i, v in enumerate(row))
+        for row in rows
+    ]